@@ -3,12 +3,28 @@ import logging
 
 from prometheus_client.core import REGISTRY
 
+from exporter.async_collector import AsyncCQCollector
+from exporter.cardinality import QueueLimiter
 from exporter.collector import CQCollector
 from exporter.configs import (
     DefaultConfig,
     Settings,
 )
+from exporter.discovery import QueueDiscovery
 from exporter.exporter import Exporter
+from exporter.history import QueueHistory
+from exporter.instrumentation import ExporterMetrics
+from exporter.probe import TargetPool, load_targets
+from exporter.rates import RateEstimator
+from exporter.sampler import AgeSampler, TaskSampler
+from exporter.scheduler import AdaptiveScheduler
+from exporter.sharding import Shard
+from exporter.utils import (
+    parse_buckets,
+    parse_discovery_patterns,
+    parse_priority_steps,
+    parse_separator,
+)
 
 logger = logging.getLogger(__package__)
 
@@ -30,12 +46,231 @@ def get_settings() -> Settings:
         default=DefaultConfig.POLLING_INTERVAL,
         help="Polling interval for collecting metrics",
     )
+    parser.add_argument(
+        "--collect-on-scrape",
+        action="store_true",
+        default=DefaultConfig.COLLECT_ON_SCRAPE,
+        help="Collect when /metrics is scraped instead of on a timer",
+    )
+    parser.add_argument(
+        "--scrape-cache-ttl",
+        type=float,
+        default=DefaultConfig.SCRAPE_CACHE_TTL,
+        help="Seconds a collection made on scrape is reused by later scrapes",
+    )
+    parser.add_argument(
+        "--adaptive-polling",
+        action="store_true",
+        default=DefaultConfig.ADAPTIVE_POLLING,
+        help="Poll each queue on its own interval, following its activity",
+    )
+    parser.add_argument(
+        "--polling-min-interval",
+        type=float,
+        default=DefaultConfig.POLLING_MIN_INTERVAL,
+        help="Shortest polling interval of a queue with adaptive polling",
+    )
+    parser.add_argument(
+        "--polling-max-interval",
+        type=float,
+        default=DefaultConfig.POLLING_MAX_INTERVAL,
+        help="Longest polling interval of a queue with adaptive polling",
+    )
     parser.add_argument(
         "--monitor-queues",
         type=str,
         default=DefaultConfig.MONITOR_QUEUES,
         help="Queues to monitor, e.g. '0:celery;1:tasks'",
     )
+    parser.add_argument(
+        "--priority-steps",
+        type=str,
+        default=DefaultConfig.PRIORITY_STEPS,
+        help="Priority steps of the Celery Redis transport, e.g. '0,3,6,9'",
+    )
+    parser.add_argument(
+        "--priority-separator",
+        type=str,
+        default=DefaultConfig.PRIORITY_SEPARATOR,
+        help="Separator between queue name and priority step in Redis keys",
+    )
+    parser.add_argument(
+        "--task-sample-size",
+        type=int,
+        default=DefaultConfig.TASK_SAMPLE_SIZE,
+        help="Messages sampled per queue for the per-task breakdown, 0 to disable",
+    )
+    parser.add_argument(
+        "--task-sample-byte-budget",
+        type=int,
+        default=DefaultConfig.TASK_SAMPLE_BYTE_BUDGET,
+        help="Maximum bytes of messages sampled per db and cycle",
+    )
+    parser.add_argument(
+        "--age-sample-size",
+        type=int,
+        default=DefaultConfig.AGE_SAMPLE_SIZE,
+        help="Positions read per queue to estimate message ages, 0 to disable",
+    )
+    parser.add_argument(
+        "--age-timestamp-header",
+        type=str,
+        default=DefaultConfig.AGE_TIMESTAMP_HEADER,
+        help="Message header holding the enqueue time; first-seen time if unset",
+    )
+    parser.add_argument(
+        "--unacked-age-buckets",
+        type=str,
+        default=DefaultConfig.UNACKED_AGE_BUCKETS,
+        help="Age buckets in seconds of unacked messages, e.g. '60,300,3600'",
+    )
+    parser.add_argument(
+        "--visibility-timeout",
+        type=float,
+        default=DefaultConfig.VISIBILITY_TIMEOUT,
+        help="Visibility timeout of the Celery Redis transport in seconds",
+    )
+    parser.add_argument(
+        "--discovery-patterns",
+        type=str,
+        default=DefaultConfig.DISCOVERY_PATTERNS,
+        help="Queue globs or 're:' regexes to discover, one per ';'-separated "
+        "entry, e.g. '0:celery*;0:mail*;1:re:^a{1,3}'",
+    )
+    parser.add_argument(
+        "--discovery-use-bindings",
+        action="store_true",
+        default=DefaultConfig.DISCOVERY_USE_BINDINGS,
+        help="Discover queues from kombu's _kombu.binding.* sets",
+    )
+    parser.add_argument(
+        "--discovery-interval",
+        type=float,
+        default=DefaultConfig.DISCOVERY_INTERVAL,
+        help="Seconds between two discovery passes over the keyspace",
+    )
+    parser.add_argument(
+        "--discovery-scan-count",
+        type=int,
+        default=DefaultConfig.DISCOVERY_SCAN_COUNT,
+        help="COUNT of each SCAN step, one step is run per collection cycle",
+    )
+    parser.add_argument(
+        "--discovery-eviction-grace",
+        type=float,
+        default=DefaultConfig.DISCOVERY_EVICTION_GRACE,
+        help="Seconds a discovered queue is still reported, as 0, after its "
+        "key disappears, e.g. once kombu deletes a drained queue",
+    )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=["sync", "async"],
+        default=DefaultConfig.ENGINE,
+        help="Collection engine: thread pool (sync) or asyncio (async)",
+    )
+    parser.add_argument(
+        "--collection-concurrency",
+        type=int,
+        default=DefaultConfig.COLLECTION_CONCURRENCY,
+        help="Number of dbs collected in parallel",
+    )
+    parser.add_argument(
+        "--collection-timeout",
+        type=float,
+        default=DefaultConfig.COLLECTION_TIMEOUT,
+        help="Deadline in seconds for a collection cycle, 0 to wait for every db",
+    )
+    parser.add_argument(
+        "--circuit-failure-threshold",
+        type=int,
+        default=DefaultConfig.CIRCUIT_FAILURE_THRESHOLD,
+        help="Consecutive failed collections after which a db is skipped and "
+        "its last known values are served as stale, 0 to disable",
+    )
+    parser.add_argument(
+        "--circuit-reset-timeout",
+        type=float,
+        default=DefaultConfig.CIRCUIT_RESET_TIMEOUT,
+        help="Seconds a failing db is skipped before it is probed again",
+    )
+    parser.add_argument(
+        "--history-retention",
+        type=int,
+        default=DefaultConfig.HISTORY_RETENTION,
+        help="Collections of queue lengths kept in memory and served from "
+        "/api/history, 0 to disable",
+    )
+    parser.add_argument(
+        "--history-max-queues",
+        type=int,
+        default=DefaultConfig.HISTORY_MAX_QUEUES,
+        help="Maximum number of queues kept in the history",
+    )
+    parser.add_argument(
+        "--rate-window",
+        type=int,
+        default=DefaultConfig.RATE_WINDOW,
+        help="Recent length samples per queue used to estimate its rates "
+        "and time to empty, 0 to disable",
+    )
+    parser.add_argument(
+        "--rate-smoothing",
+        type=float,
+        default=DefaultConfig.RATE_SMOOTHING,
+        help="Weight of the latest sample in the smoothed drain rate",
+    )
+    parser.add_argument(
+        "--queue-limit",
+        type=int,
+        default=DefaultConfig.QUEUE_LIMIT,
+        help="Longest queues per db exported with their own series, the "
+        "others are summed into celery_queue_other_*; 0 for no limit",
+    )
+    parser.add_argument(
+        "--queue-limit-pinned",
+        type=str,
+        default=DefaultConfig.QUEUE_LIMIT_PINNED,
+        help="Comma-separated glob or 're:' patterns of queues always exported",
+    )
+    parser.add_argument(
+        "--queue-limit-hysteresis",
+        type=float,
+        default=DefaultConfig.QUEUE_LIMIT_HYSTERESIS,
+        help="Fraction of --queue-limit ranks within which exported queues "
+        "keep their series",
+    )
+    parser.add_argument(
+        "--shard-index",
+        type=int,
+        default=DefaultConfig.SHARD_INDEX,
+        help="Index of this replica among --shard-count replicas, from 0",
+    )
+    parser.add_argument(
+        "--shard-count",
+        type=int,
+        default=DefaultConfig.SHARD_COUNT,
+        help="Number of replicas splitting the monitored queues between them",
+    )
+    parser.add_argument(
+        "--targets-file",
+        type=str,
+        default=DefaultConfig.TARGETS_FILE,
+        help="JSON file of broker targets; enables /probe?target=<name> and "
+        "ignores the single-broker options",
+    )
+    parser.add_argument(
+        "--probe-max-workers",
+        type=int,
+        default=DefaultConfig.PROBE_MAX_WORKERS,
+        help="Number of db collections run at once over every probe target",
+    )
+    parser.add_argument(
+        "--probe-idle-timeout",
+        type=float,
+        default=DefaultConfig.PROBE_IDLE_TIMEOUT,
+        help="Seconds after its last probe a target's connections are closed",
+    )
     parser.add_argument(
         "--log-level", type=str, default=DefaultConfig.LOG_LEVEL, help="Log level"
     )
@@ -52,13 +287,16 @@ def get_settings() -> Settings:
         "--broker-type",
         type=str,
         default=DefaultConfig.BROKER_TYPE,
-        help="Broker type (redis or rabbitmq)",
+        help="Broker type (redis, redis-cluster or rabbitmq)",
     )
     parser.add_argument(
         "--broker-host", type=str, default=DefaultConfig.BROKER_HOST, help="Broker host"
     )
     parser.add_argument(
-        "--broker-port", type=int, default=DefaultConfig.BROKER_PORT, help="Broker port"
+        "--broker-port",
+        type=int,
+        default=DefaultConfig.BROKER_PORT,
+        help="Broker port; the management API port (15672) for rabbitmq",
     )
     parser.add_argument(
         "--broker-password",
@@ -66,6 +304,24 @@ def get_settings() -> Settings:
         default=DefaultConfig.BROKER_PASSWORD,
         help="Broker password",
     )
+    parser.add_argument(
+        "--broker-username",
+        type=str,
+        default=DefaultConfig.BROKER_USERNAME,
+        help="RabbitMQ management API user",
+    )
+    parser.add_argument(
+        "--broker-vhost",
+        type=str,
+        default=DefaultConfig.BROKER_VHOST,
+        help="RabbitMQ virtual host of the monitored queues",
+    )
+    parser.add_argument(
+        "--broker-use-ssl",
+        action="store_true",
+        default=DefaultConfig.BROKER_USE_SSL,
+        help="Connect to the RabbitMQ management API with HTTPS",
+    )
     parser.add_argument(
         "--broker-socket-timeout",
         type=float,
@@ -75,6 +331,7 @@ def get_settings() -> Settings:
     parser.add_argument(
         "--broker-use-sentinel",
         action="store_true",
+        default=DefaultConfig.BROKER_USE_SENTINEL,
         help="Use Redis Sentinel for broker",
     )
     parser.add_argument(
@@ -95,6 +352,42 @@ def get_settings() -> Settings:
         default=DefaultConfig.BROKER_SENTINEL_PASSWORD,
         help="Redis Sentinel password",
     )
+    parser.add_argument(
+        "--broker-cluster-nodes",
+        type=str,
+        default=DefaultConfig.BROKER_CLUSTER_NODES,
+        help="Redis Cluster startup nodes, e.g. 'host1:port1,host2:port2'",
+    )
+    parser.add_argument(
+        "--broker-cluster-max-workers",
+        type=int,
+        default=DefaultConfig.BROKER_CLUSTER_MAX_WORKERS,
+        help="Maximum number of Redis Cluster nodes queried concurrently",
+    )
+    parser.add_argument(
+        "--broker-pipeline-chunk-size",
+        type=int,
+        default=DefaultConfig.BROKER_PIPELINE_CHUNK_SIZE,
+        help="Maximum number of commands sent to the broker per pipeline",
+    )
+    parser.add_argument(
+        "--broker-shared-pool",
+        action="store_true",
+        default=DefaultConfig.BROKER_SHARED_POOL,
+        help="Share one bounded connection pool across all monitored dbs",
+    )
+    parser.add_argument(
+        "--broker-max-connections",
+        type=int,
+        default=DefaultConfig.BROKER_MAX_CONNECTIONS,
+        help="Maximum number of connections in the shared broker pool",
+    )
+    parser.add_argument(
+        "--broker-use-scripts",
+        action="store_true",
+        default=DefaultConfig.BROKER_USE_SCRIPTS,
+        help="Compute the stats of each db with one server-side Lua script call",
+    )
     args = parser.parse_args()
 
     return Settings(
@@ -111,32 +404,175 @@ def setup_logging(log_level: str, log_format: str, log_datefmt: str) -> None:
     )
 
 
+def run_probe_exporter(settings: Settings) -> None:
+    """Run the exporter for the brokers of a targets file, collected on probe."""
+    targets = TargetPool(
+        load_targets(settings.targets_file),
+        max_workers=settings.probe_max_workers,
+        idle_timeout=settings.probe_idle_timeout,
+        cache_ttl=settings.scrape_cache_ttl,
+        collector_options={
+            "collection_timeout": settings.collection_timeout,
+            "priority_steps": parse_priority_steps(settings.priority_steps),
+            "priority_separator": parse_separator(settings.priority_separator),
+            "circuit_failure_threshold": settings.circuit_failure_threshold,
+            "circuit_reset_timeout": settings.circuit_reset_timeout,
+        },
+        broker_defaults={"socket_timeout": settings.broker_socket_timeout},
+    )
+    logger.info(f"Serving {len(targets.targets)} targets from /probe")
+    Exporter(
+        REGISTRY,
+        settings.polling_interval,
+        instrumentation=ExporterMetrics(REGISTRY),
+        targets=targets,
+    ).serve_metrics(settings.host, settings.port)
+
+
 def run_exporter(settings: Settings) -> None:
     """Run the exporter."""
     setup_logging(settings.log_level, settings.log_format, settings.log_datefmt)
     logger.info("Exporter is starting ...")
 
+    if settings.targets_file:
+        run_probe_exporter(settings)
+        return
+
     broker_config = {
         "host": settings.broker_host,
         "port": settings.broker_port,
         "password": settings.broker_password,
         "socket_timeout": settings.broker_socket_timeout,
-        "use_sentinel": settings.broker_use_sentinel,
-        "sentinel_hosts": settings.broker_sentinel_hosts,
-        "sentinel_master_name": settings.broker_sentinel_master_name,
-        "sentinel_password": settings.broker_sentinel_password,
+        "pipeline_chunk_size": settings.broker_pipeline_chunk_size,
+        "shared_pool": settings.broker_shared_pool,
+        "max_connections": settings.broker_max_connections,
     }
+    if settings.broker_type == "redis-cluster":
+        broker_config.update(
+            {
+                "cluster_nodes": settings.broker_cluster_nodes,
+                "cluster_max_workers": settings.broker_cluster_max_workers,
+            }
+        )
+    elif settings.broker_type == "rabbitmq":
+        broker_config.update(
+            {
+                "username": settings.broker_username,
+                "vhost": settings.broker_vhost,
+                "use_ssl": settings.broker_use_ssl,
+            }
+        )
+    else:
+        broker_config.update(
+            {
+                "use_sentinel": settings.broker_use_sentinel,
+                "sentinel_hosts": settings.broker_sentinel_hosts,
+                "sentinel_master_name": settings.broker_sentinel_master_name,
+                "sentinel_password": settings.broker_sentinel_password,
+                "use_scripts": settings.broker_use_scripts,
+            }
+        )
+
+    discovery = None
+    if settings.discovery_patterns or settings.discovery_use_bindings:
+        discovery = QueueDiscovery(
+            parse_discovery_patterns(settings.discovery_patterns or ""),
+            use_bindings=settings.discovery_use_bindings,
+            refresh_interval=settings.discovery_interval,
+            scan_count=settings.discovery_scan_count,
+            eviction_grace=settings.discovery_eviction_grace,
+        )
+
+    task_sampler = None
+    if settings.task_sample_size > 0:
+        task_sampler = TaskSampler(
+            sample_size=settings.task_sample_size,
+            byte_budget=settings.task_sample_byte_budget,
+        )
+
+    age_sampler = None
+    if settings.age_sample_size > 0:
+        age_sampler = AgeSampler(
+            sample_size=settings.age_sample_size,
+            timestamp_header=settings.age_timestamp_header,
+        )
+
+    scheduler = None
+    if settings.adaptive_polling:
+        scheduler = AdaptiveScheduler(
+            min_interval=settings.polling_min_interval,
+            max_interval=settings.polling_max_interval,
+        )
+
+    shard = None
+    if settings.shard_count > 1:
+        shard = Shard(settings.shard_index, settings.shard_count)
+        logger.info(f"Collecting shard {shard.index} of {shard.count}")
+
+    queue_limiter = None
+    if settings.queue_limit > 0:
+        queue_limiter = QueueLimiter(
+            settings.queue_limit,
+            pinned=[
+                pattern.strip()
+                for pattern in (settings.queue_limit_pinned or "").split(",")
+                if pattern.strip()
+            ],
+            hysteresis=settings.queue_limit_hysteresis,
+        )
+
+    rate_estimator = None
+    if settings.rate_window > 0:
+        rate_estimator = RateEstimator(
+            window=settings.rate_window, smoothing=settings.rate_smoothing
+        )
+
+    history = None
+    if settings.history_retention > 0:
+        history = QueueHistory(
+            retention=settings.history_retention,
+            max_queues=settings.history_max_queues,
+        )
+        logger.info(
+            f"Keeping {history.retention} samples of up to {history.max_queues} "
+            f"queues, at most {history.memory_ceiling} bytes of samples"
+        )
+
+    instrumentation = ExporterMetrics(REGISTRY)
 
+    collector_class = AsyncCQCollector if settings.engine == "async" else CQCollector
     REGISTRY.register(
-        CQCollector(
+        collector_class(
             broker_type=settings.broker_type,
             broker_config=broker_config,
             monitor_queues_config=settings.monitor_queues,
+            collection_concurrency=settings.collection_concurrency,
+            collection_timeout=settings.collection_timeout,
+            discovery=discovery,
+            priority_steps=parse_priority_steps(settings.priority_steps),
+            priority_separator=parse_separator(settings.priority_separator),
+            task_sampler=task_sampler,
+            age_sampler=age_sampler,
+            unacked_buckets=parse_buckets(settings.unacked_age_buckets),
+            visibility_timeout=settings.visibility_timeout,
+            scheduler=scheduler,
+            instrumentation=instrumentation,
+            circuit_failure_threshold=settings.circuit_failure_threshold,
+            circuit_reset_timeout=settings.circuit_reset_timeout,
+            shard=shard,
+            queue_limiter=queue_limiter,
+            rate_estimator=rate_estimator,
         )
     )
     Exporter(
         REGISTRY,
         settings.polling_interval,
+        # The async engine polls every queue each cycle
+        scheduler=scheduler if collector_class is CQCollector else None,
+        collect_on_scrape=settings.collect_on_scrape,
+        scrape_cache_ttl=settings.scrape_cache_ttl,
+        instrumentation=instrumentation,
+        history=history,
     ).serve_metrics(settings.host, settings.port)
 
 
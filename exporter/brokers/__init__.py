@@ -1,14 +1,21 @@
 """Broker implementations for Celery queue exporter."""
 
-from typing import Dict, Type
+from typing import Any, Dict, Optional, Type
 
-from exporter.brokers.base import Broker
+from exporter.brokers.base import AsyncBroker, Broker
+from exporter.brokers.rabbitmq import RabbitMQBroker
 from exporter.brokers.redis import RedisBroker
+from exporter.brokers.redis_async import AsyncRedisBroker
+from exporter.brokers.redis_cluster import RedisClusterBroker
 
 
 __all__ = [
+    "AsyncBroker",
+    "AsyncRedisBroker",
     "Broker",
+    "RabbitMQBroker",
     "RedisBroker",
+    "RedisClusterBroker",
     "BrokerFactory",
 ]
 
@@ -19,8 +26,25 @@ class BrokerFactory:
     # Registry of supported broker types
     _broker_types: Dict[str, Type[Broker]] = {
         "redis": RedisBroker,
+        "redis-cluster": RedisClusterBroker,
+        "rabbitmq": RabbitMQBroker,
+    }
+    # Registry of supported asyncio broker types
+    _async_broker_types: Dict[str, Type[AsyncBroker]] = {
+        "redis": AsyncRedisBroker,
     }
 
+    @classmethod
+    def _get_broker_class(cls, broker_type: str) -> Type[Broker]:
+        """Look up the broker class registered for a broker type."""
+        broker_class = cls._broker_types.get(broker_type.lower())
+        if not broker_class:
+            raise ValueError(
+                f"Unsupported broker type: {broker_type}. "
+                f"Supported types: {list(cls._broker_types.keys())}"
+            )
+        return broker_class
+
     @classmethod
     def create(cls, broker_type: str, **kwargs) -> Broker:
         """Create a new broker instance.
@@ -35,11 +59,76 @@ class BrokerFactory:
         Raises:
             ValueError: If broker_type is not supported
         """
-        broker_class = cls._broker_types.get(broker_type.lower())
+        return cls._get_broker_class(broker_type)(**kwargs)
+
+    @classmethod
+    def supports_discovery(cls, broker_type: str) -> bool:
+        """Check if a broker type can discover queues.
+
+        Args:
+            broker_type: Type of broker
+
+        Returns:
+            True if its brokers can be used with ``QueueDiscovery``
+
+        Raises:
+            ValueError: If broker_type is not supported
+        """
+        return cls._get_broker_class(broker_type).supports_discovery
+
+    @classmethod
+    def create_shared_pool(
+        cls, broker_type: str, max_connections: int, **kwargs
+    ) -> Optional[Any]:
+        """Create a connection pool shared by brokers of several databases.
+
+        Args:
+            broker_type: Type of broker the pool is for
+            max_connections: Maximum number of connections in the pool
+            **kwargs: Configuration parameters for the broker
+
+        Returns:
+            Shared pool, or None if the broker type does not support one
+
+        Raises:
+            ValueError: If broker_type is not supported
+        """
+        return cls._get_broker_class(broker_type).create_shared_pool(
+            max_connections, **kwargs
+        )
+
+    @classmethod
+    def close_shared_pool(cls, broker_type: str, pool: Any) -> None:
+        """Close a pool created by ``create_shared_pool``.
+
+        Args:
+            broker_type: Type of broker the pool is for
+            pool: Pool to close
+
+        Raises:
+            ValueError: If broker_type is not supported
+        """
+        cls._get_broker_class(broker_type).close_shared_pool(pool)
+
+    @classmethod
+    def create_async(cls, broker_type: str, **kwargs) -> AsyncBroker:
+        """Create a new asyncio broker instance.
+
+        Args:
+            broker_type: Type of broker to create
+            **kwargs: Configuration parameters for the broker
+
+        Returns:
+            Configured asyncio broker instance
+
+        Raises:
+            ValueError: If broker_type has no asyncio implementation
+        """
+        broker_class = cls._async_broker_types.get(broker_type.lower())
         if not broker_class:
             raise ValueError(
-                f"Unsupported broker type: {broker_type}. "
-                f"Supported types: {list(cls._broker_types.keys())}"
+                f"Unsupported async broker type: {broker_type}. "
+                f"Supported types: {list(cls._async_broker_types.keys())}"
             )
 
         return broker_class(**kwargs)
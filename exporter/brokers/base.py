@@ -1,12 +1,44 @@
 """Base classes for brokers."""
 
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from exporter.models import Queue, Unacked
+
+logger = logging.getLogger(__name__)
 
 
 class Broker(ABC):
     """Abstract interface for Celery broker implementations."""
 
+    # Whether the broker implements ``scan_keys`` and
+    # ``get_kombu_binding_queues``, used by queue discovery
+    supports_discovery: bool = False
+
+    @classmethod
+    def create_shared_pool(cls, max_connections: int, **kwargs) -> Optional[Any]:
+        """Create a connection pool shared by brokers of several databases.
+
+        Args:
+            max_connections: Maximum number of connections in the pool
+            **kwargs: Configuration parameters for the broker
+
+        Returns:
+            Pool to pass as ``connection_pool`` to each broker, or None if
+            the broker does not support sharing connections
+        """
+        return None
+
+    @classmethod
+    def close_shared_pool(cls, pool: Any) -> None:
+        """Close a pool created by ``create_shared_pool``.
+
+        Args:
+            pool: Pool to close
+        """
+        pool.disconnect()
+
     @abstractmethod
     def connect(self) -> None:
         """Establish connection to the broker."""
@@ -44,3 +76,247 @@ class Broker(ABC):
             Number of messages in the queue
         """
         pass
+
+    @abstractmethod
+    def get_queue_lengths(self, queue_names: List[str]) -> Dict[str, int]:
+        """Get the number of messages in several queues at once.
+
+        Implementations should fetch all lengths in as few round-trips
+        as the broker allows.
+
+        Args:
+            queue_names: Names of the queues to inspect
+
+        Returns:
+            Mapping of queue name to number of messages in the queue
+        """
+        pass
+
+    def connection_counts(self) -> Dict[str, int]:
+        """Get the number of broker connections per state.
+
+        Returns:
+            Mapping of state (e.g. ``in_use``, ``idle``) to number of
+            connections, empty if the broker does not expose them
+        """
+        return {}
+
+    def get_priority_queue_lengths(
+        self, queue_names: List[str], priority_steps: List[int], separator: str
+    ) -> Dict[str, Dict[int, int]]:
+        """Get the number of messages per priority in several queues.
+
+        Brokers that do not split a queue into one key per priority report
+        every message at priority 0.
+
+        Args:
+            queue_names: Names of the queues to inspect
+            priority_steps: Priority steps of the Celery transport
+            separator: Separator between queue name and priority step
+
+        Returns:
+            Mapping of queue name to messages per priority step
+        """
+        return {
+            queue: {0: length}
+            for queue, length in self.get_queue_lengths(queue_names).items()
+        }
+
+    def get_db_stats(
+        self,
+        queue_names: List[str],
+        priority_steps: List[int],
+        separator: str,
+        age_buckets: Optional[List[float]] = None,
+        visibility_timeout: float = 3600.0,
+    ) -> Tuple[Dict[str, Dict[int, int]], Optional[Unacked]]:
+        """Get every per-queue and unacked statistic of a database.
+
+        The default implementation combines ``get_queue_lengths`` (or
+        ``get_priority_queue_lengths`` with priority steps) and
+        ``get_unacked``. Brokers that can compute everything in a single
+        request override it.
+
+        Args:
+            queue_names: Names of the queues to inspect
+            priority_steps: Priority steps of the Celery transport; empty
+                to report every message at priority 0
+            separator: Separator between queue name and priority step
+            age_buckets: Age histogram bounds of unacked messages; None to
+                skip unacked statistics
+            visibility_timeout: Seconds after which a reserved message is
+                redelivered
+
+        Returns:
+            Messages per priority step of each queue, and unacked
+            statistics when requested and available
+        """
+        if priority_steps:
+            priorities = self.get_priority_queue_lengths(
+                queue_names, priority_steps, separator
+            )
+        else:
+            priorities = {
+                queue: {0: length}
+                for queue, length in self.get_queue_lengths(queue_names).items()
+            }
+
+        unacked = None
+        if age_buckets:
+            try:
+                unacked = self.get_unacked(age_buckets, visibility_timeout)
+            except Exception as e:
+                logger.error(f"Error collecting unacked messages: {e}")
+        return priorities, unacked
+
+    def get_queue_details(self, queue_names: List[str]) -> Optional[List[Queue]]:
+        """Get the length, unacked messages and consumers of several queues.
+
+        Brokers that track deliveries and consumers per queue, and can
+        report them for every queue in a single request, override it; the
+        collector then uses it instead of ``get_db_stats``.
+
+        Args:
+            queue_names: Names of the queues to inspect
+
+        Returns:
+            Queues with ``unacked`` and ``consumers`` set, or None if the
+            broker does not report them
+        """
+        return None
+
+    def get_queue_samples(self, windows: Dict[str, int]) -> Dict[str, List[bytes]]:
+        """Read raw messages from the consumer end of several queues.
+
+        Args:
+            windows: Mapping of queue name to number of messages to read
+
+        Returns:
+            Mapping of queue name to raw messages, next to be consumed last,
+            empty if the broker cannot read queued messages
+        """
+        return {}
+
+    def get_queue_messages(
+        self, positions: Dict[str, List[int]]
+    ) -> Dict[str, List[Optional[bytes]]]:
+        """Read raw messages at given positions of several queues.
+
+        Args:
+            positions: Mapping of queue name to positions to read, counted
+                from the consumer end (-1 is the next message consumed)
+
+        Returns:
+            Mapping of queue name to the raw message at each position, None
+            where the position no longer exists; empty if the broker cannot
+            read queued messages
+        """
+        return {}
+
+    def get_unacked(
+        self,
+        age_buckets: List[float],
+        visibility_timeout: float,
+        now: Optional[float] = None,
+    ) -> Optional[Unacked]:
+        """Get statistics of messages reserved by workers but not acked.
+
+        Args:
+            age_buckets: Upper bounds in seconds of the age histogram
+            visibility_timeout: Seconds after which a reserved message is
+                redelivered
+            now: Current time, defaults to ``time.time()``
+
+        Returns:
+            Unacked count, cumulative age histogram and expired count, or
+            None if the broker does not track unacked messages
+        """
+        return None
+
+
+class AsyncBroker(ABC):
+    """Abstract interface for asyncio Celery broker implementations.
+
+    Mirrors ``Broker`` with coroutine methods, so many brokers can be
+    polled concurrently from a single event loop.
+    """
+
+    @abstractmethod
+    async def connect(self) -> None:
+        """Establish connection to the broker."""
+        pass
+
+    @abstractmethod
+    async def disconnect(self) -> None:
+        """Close the connection to the broker."""
+        pass
+
+    @abstractmethod
+    async def is_connected(self) -> bool:
+        """Check if the connection to the broker is active."""
+        pass
+
+    @abstractmethod
+    async def ping(self) -> bool:
+        """Check if broker is reachable."""
+        pass
+
+    @property
+    @abstractmethod
+    def connection_info(self) -> Dict[str, Any]:
+        """Get connection information."""
+        pass
+
+    def connection_counts(self) -> Dict[str, int]:
+        """Get the number of broker connections per state.
+
+        Returns:
+            Mapping of state (e.g. ``in_use``, ``idle``) to number of
+            connections, empty if the broker does not expose them
+        """
+        return {}
+
+    @abstractmethod
+    async def get_queue_length(self, queue_name: str) -> int:
+        """Get the number of messages in a queue.
+
+        Args:
+            queue_name: Name of the queue to inspect
+
+        Returns:
+            Number of messages in the queue
+        """
+        pass
+
+    @abstractmethod
+    async def get_queue_lengths(self, queue_names: List[str]) -> Dict[str, int]:
+        """Get the number of messages in several queues at once.
+
+        Args:
+            queue_names: Names of the queues to inspect
+
+        Returns:
+            Mapping of queue name to number of messages in the queue
+        """
+        pass
+
+    async def get_priority_queue_lengths(
+        self, queue_names: List[str], priority_steps: List[int], separator: str
+    ) -> Dict[str, Dict[int, int]]:
+        """Get the number of messages per priority in several queues.
+
+        Brokers that do not split a queue into one key per priority report
+        every message at priority 0.
+
+        Args:
+            queue_names: Names of the queues to inspect
+            priority_steps: Priority steps of the Celery transport
+            separator: Separator between queue name and priority step
+
+        Returns:
+            Mapping of queue name to messages per priority step
+        """
+        return {
+            queue: {0: length}
+            for queue, length in (await self.get_queue_lengths(queue_names)).items()
+        }
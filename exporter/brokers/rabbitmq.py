@@ -0,0 +1,384 @@
+import base64
+import http.client
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+from exporter.brokers.base import Broker
+from exporter.models import Queue
+
+logger = logging.getLogger(__name__)
+
+# Columns requested from /api/queues, everything else is left out of the
+# response
+QUEUE_COLUMNS = ("name", "messages_ready", "messages_unacknowledged", "consumers")
+
+# Seconds a vhost's queue listing is reused by the brokers of other dbs.
+# Shorter than any polling interval, so only the dbs of one collection
+# cycle share a listing.
+LISTING_MAX_AGE = 1.0
+
+# Errors of a kept-alive connection the server closed in the meantime
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+class RabbitMQError(Exception):
+    """Error response of the RabbitMQ management API."""
+
+
+class ManagementConnectionPool:
+    """Bounded pool of keep-alive connections to the management API.
+
+    Requests reuse idle HTTP/1.1 connections instead of opening one per
+    request. A request failing because the server closed an idle
+    connection is retried once on a fresh connection.
+    """
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 15672,
+        username: str = "guest",
+        password: Optional[str] = None,
+        use_ssl: bool = False,
+        timeout: float = 5.0,
+        max_connections: int = 1,
+    ) -> None:
+        """Initialize the pool, connections are opened on first use.
+
+        Args:
+            host: Management API host
+            port: Management API port
+            username: Management API user
+            password: Password of the user
+            use_ssl: Connect with HTTPS
+            timeout: Socket timeout in seconds
+            max_connections: Maximum number of connections in the pool
+        """
+        self.host = host
+        self.port = port
+        self._use_ssl = use_ssl
+        self._timeout = timeout
+        credentials = f"{username}:{password or ''}".encode()
+        self._headers = {
+            "Authorization": f"Basic {base64.b64encode(credentials).decode()}",
+            "Accept": "application/json",
+        }
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, max_connections or 1))
+        self._lock = threading.Lock()
+        self._in_use = 0
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        if self._use_ssl:
+            return http.client.HTTPSConnection(
+                self.host, self.port, timeout=self._timeout
+            )
+        return http.client.HTTPConnection(self.host, self.port, timeout=self._timeout)
+
+    def request(self, path: str) -> Any:
+        """Send a GET request and decode its JSON response.
+
+        Waits up to the socket timeout for a free connection.
+
+        Args:
+            path: Path and query string of the request
+
+        Returns:
+            Decoded response body
+
+        Raises:
+            RabbitMQError: If the API answers with an error status
+            OSError: If the API cannot be reached
+        """
+        if not self._slots.acquire(timeout=self._timeout):
+            raise TimeoutError("No free connection to the management API")
+        with self._lock:
+            self._in_use += 1
+        try:
+            try:
+                connection = self._idle.get_nowait()
+                reused = True
+            except queue.Empty:
+                connection = self._new_connection()
+                reused = False
+            while True:
+                try:
+                    status, body = self._send(connection, path)
+                    break
+                except Exception as e:
+                    connection.close()
+                    if not (reused and isinstance(e, _STALE_CONNECTION_ERRORS)):
+                        raise
+                    connection, reused = self._new_connection(), False
+            self._idle.put(connection)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+        if status != 200:
+            raise RabbitMQError(
+                f"GET {path} returned {status}: {body[:200].decode(errors='replace')}"
+            )
+        return json.loads(body)
+
+    def _send(
+        self, connection: http.client.HTTPConnection, path: str
+    ) -> Tuple[int, bytes]:
+        connection.request("GET", path, headers=self._headers)
+        response = connection.getresponse()
+        return response.status, response.read()
+
+    def counts(self) -> Dict[str, int]:
+        """Number of connections per state."""
+        return {"in_use": self._in_use, "idle": self._idle.qsize()}
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class _Listing:
+    """Latest queue listing of a vhost, shared by the brokers of every db."""
+
+    def __init__(self) -> None:
+        # Held while fetching, so concurrent dbs wait for one request
+        self.lock = threading.Lock()
+        self.fetched_at = float("-inf")
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+
+class RabbitMQBroker(Broker):
+    """RabbitMQ broker implementation over the management HTTP API.
+
+    The depth, unacked count and consumer count of every queue of the
+    vhost come from a single ``/api/queues/<vhost>`` request restricted
+    to the needed columns, instead of one AMQP passive declare per queue.
+    RabbitMQ has no databases: ``db`` only labels the monitored queues,
+    and the brokers of every db of a cycle share one listing of the
+    vhost, reused for ``LISTING_MAX_AGE`` seconds.
+    """
+
+    # Listing of each (host, port, username, vhost)
+    _listings: Dict[Tuple[str, int, str, str], _Listing] = {}
+    _listings_lock = threading.Lock()
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 15672,
+        db: int = 0,
+        password: Optional[str] = None,
+        socket_timeout: float = 5.0,
+        username: str = "guest",
+        vhost: str = "/",
+        use_ssl: bool = False,
+        connection_pool: Optional[ManagementConnectionPool] = None,
+        **kwargs,
+    ) -> None:
+        """Initialize RabbitMQ management API settings.
+
+        Args:
+            host: Management API host
+            port: Management API port
+            db: Label of the monitored queues
+            password: Password of the management user
+            socket_timeout: Socket timeout in seconds
+            username: Management user
+            vhost: Virtual host of the queues
+            use_ssl: Connect to the management API with HTTPS
+            connection_pool: Optional pool shared with brokers of other
+                dbs, see ``create_shared_pool``
+            **kwargs: Redis-specific options, ignored
+        """
+        self._host = host
+        self._port = port
+        self._db = db
+        self._password = password
+        self._socket_timeout = socket_timeout
+        self._username = username
+        self._vhost = vhost
+        self._use_ssl = use_ssl
+        self._connection_pool = connection_pool
+        self._pool: Optional[ManagementConnectionPool] = None
+
+    @classmethod
+    def create_shared_pool(
+        cls, max_connections: int = 4, **kwargs
+    ) -> ManagementConnectionPool:
+        """Create a pool of keep-alive connections shared by every db.
+
+        Args:
+            max_connections: Maximum number of connections in the pool
+            **kwargs: Broker configuration, as accepted by ``RabbitMQBroker``
+
+        Returns:
+            Pool to pass as ``connection_pool`` to each broker
+        """
+        kwargs.pop("db", None)
+        return cls(**kwargs)._new_pool(max_connections)
+
+    @classmethod
+    def close_shared_pool(cls, pool: ManagementConnectionPool) -> None:
+        """Close the connections of a pool from ``create_shared_pool``."""
+        pool.close()
+
+    def _new_pool(self, max_connections: int = 1) -> ManagementConnectionPool:
+        return ManagementConnectionPool(
+            host=self._host,
+            port=self._port,
+            username=self._username,
+            password=self._password,
+            use_ssl=self._use_ssl,
+            timeout=self._socket_timeout,
+            max_connections=max_connections,
+        )
+
+    def _request(self, path: str, **params: Any) -> Any:
+        if self._pool is None:
+            raise RuntimeError("Not connected to RabbitMQ")
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        return self._pool.request(path)
+
+    def connect(self) -> None:
+        """Set up the connection pool and check the API answers."""
+        self._pool = self._connection_pool or self._new_pool()
+        try:
+            self._request("/api/overview", columns="rabbitmq_version")
+            logger.info(f"Connected to RabbitMQ at {self.connection_info}")
+        except (OSError, RabbitMQError, ValueError) as e:
+            logger.error(f"Failed to connect to RabbitMQ: {e}")
+            self._pool = None
+            raise
+
+    def disconnect(self) -> None:
+        """Close the connections, unless the pool is shared."""
+        if self._pool is not None and self._connection_pool is None:
+            self._pool.close()
+            logger.info("Disconnected from RabbitMQ")
+        self._pool = None
+
+    def is_connected(self) -> bool:
+        """Check if the management API answers."""
+        return self.ping()
+
+    def ping(self) -> bool:
+        """Check if the management API answers.
+
+        Returns:
+            True if the API answered successfully
+        """
+        try:
+            self._request("/api/overview", columns="rabbitmq_version")
+            return True
+        except (OSError, RabbitMQError, RuntimeError, ValueError):
+            return False
+
+    def connection_counts(self) -> Dict[str, int]:
+        """Get the number of management API connections per state.
+
+        With a shared pool, every broker reports the same connections.
+        """
+        return self._pool.counts() if self._pool is not None else {}
+
+    def get_queue_details(self, queue_names: List[str]) -> List[Queue]:
+        """Get the length, unacked messages and consumers of several queues.
+
+        Queues missing from the vhost are reported empty.
+
+        Args:
+            queue_names: Names of the queues to inspect
+
+        Returns:
+            One queue per name, in the given order
+        """
+        stats = self._queue_stats()
+        queues = []
+        for name in queue_names:
+            item = stats.get(name, {})
+            queues.append(
+                Queue(
+                    name=name,
+                    db=self._db,
+                    length=item.get("messages_ready") or 0,
+                    unacked=item.get("messages_unacknowledged") or 0,
+                    consumers=item.get("consumers") or 0,
+                )
+            )
+        return queues
+
+    def _queue_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get the stats of every queue of the vhost, by name.
+
+        The listing is fetched once for the brokers of every db and
+        reused until it is ``LISTING_MAX_AGE`` seconds old.
+        """
+        key = (self._host, self._port, self._username, self._vhost)
+        with self._listings_lock:
+            listing = self._listings.setdefault(key, _Listing())
+        with listing.lock:
+            if time.monotonic() - listing.fetched_at >= LISTING_MAX_AGE:
+                items = self._request(
+                    f"/api/queues/{quote(self._vhost, safe='')}",
+                    columns=",".join(QUEUE_COLUMNS),
+                    disable_stats="true",
+                    enable_queue_totals="true",
+                )
+                listing.stats = {item["name"]: item for item in items}
+                listing.fetched_at = time.monotonic()
+            return listing.stats
+
+    def get_queue_length(self, queue_name: str) -> int:
+        """Get the number of ready messages in a queue.
+
+        Args:
+            queue_name: Name of the queue
+
+        Returns:
+            Number of messages waiting for a consumer
+        """
+        return self.get_queue_lengths([queue_name])[queue_name]
+
+    def get_queue_lengths(self, queue_names: List[str]) -> Dict[str, int]:
+        """Get the number of ready messages in several queues in one request.
+
+        Args:
+            queue_names: Names of the queues
+
+        Returns:
+            Mapping of queue name to number of messages waiting for a
+            consumer
+        """
+        return {
+            queue.name: queue.length for queue in self.get_queue_details(queue_names)
+        }
+
+    @property
+    def connection_info(self) -> Dict[str, Any]:
+        """Get RabbitMQ connection information.
+
+        Returns:
+            Dictionary with connection details
+        """
+        return {
+            "host": self._host,
+            "port": self._port,
+            "vhost": self._vhost,
+            "vdb": self._db,
+            "type": "rabbitmq",
+        }
@@ -1,18 +1,53 @@
 import logging
-from typing import Any, Dict, Optional, List
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 import redis
-from redis.exceptions import RedisError
-from redis.sentinel import Sentinel
+from redis.client import Pipeline
+from redis.exceptions import ConnectionError, NoScriptError, RedisError, TimeoutError
+from redis.sentinel import SentinelConnectionPool
 
 from exporter.brokers.base import Broker
+from exporter.brokers.sentinel import BlockingSentinelConnectionPool, SharedSentinel
+from exporter.models import Unacked
 
 logger = logging.getLogger(__name__)
 
+# Keys kombu's Redis transport keeps reserved messages in
+UNACKED_KEY = "unacked"
+UNACKED_INDEX_KEY = "unacked_index"
+
+# Computes the stats of a db on the server and returns them as one flat
+# array of integers: the LLEN of each list key, then optionally HLEN and
+# ZCARD of the unacked structures, a ZCOUNT per age bucket and the number
+# of expired reservations.
+#
+# KEYS: unacked hash, unacked index, then the list keys
+# ARGV[1]: "1" to compute unacked stats
+# ARGV[2]: highest reservation score of an expired message
+# ARGV[3..]: lowest reservation score of each age bucket
+STATS_SCRIPT = """
+local reply = {}
+for i = 3, #KEYS do
+    reply[#reply + 1] = redis.call('LLEN', KEYS[i])
+end
+if ARGV[1] == '1' then
+    reply[#reply + 1] = redis.call('HLEN', KEYS[1])
+    reply[#reply + 1] = redis.call('ZCARD', KEYS[2])
+    for i = 3, #ARGV do
+        reply[#reply + 1] = redis.call('ZCOUNT', KEYS[2], ARGV[i], '+inf')
+    end
+    reply[#reply + 1] = redis.call('ZCOUNT', KEYS[2], '-inf', ARGV[2])
+end
+return reply
+"""
+
 
 class RedisBroker(Broker):
     """Redis broker implementation."""
 
+    supports_discovery = True
+
     def __init__(
         self,
         host: str = "localhost",
@@ -24,6 +59,9 @@ class RedisBroker(Broker):
         sentinel_hosts: Optional[str] = None,
         sentinel_master_name: Optional[str] = None,
         sentinel_password: Optional[str] = None,
+        pipeline_chunk_size: int = 500,
+        connection_pool: Optional[redis.ConnectionPool] = None,
+        use_scripts: bool = False,
         **kwargs,
     ) -> None:
         """Initialize Redis broker connection.
@@ -38,6 +76,11 @@ class RedisBroker(Broker):
             sentinel_hosts: Comma-separated list of Sentinel hosts
             sentinel_master_name: Name of the master to monitor
             sentinel_password: Optional Sentinel password
+            pipeline_chunk_size: Maximum number of commands sent per pipeline
+            connection_pool: Optional pool shared with brokers of other
+                databases, see ``create_shared_pool``
+            use_scripts: Compute the stats of a db with a server-side Lua
+                script, see ``get_db_stats``
             **kwargs: Additional redis-py connection arguments
         """
         self._host = host
@@ -49,37 +92,113 @@ class RedisBroker(Broker):
         self._sentinel_hosts = sentinel_hosts
         self._sentinel_master_name = sentinel_master_name
         self._sentinel_password = sentinel_password
+        self._pipeline_chunk_size = max(1, pipeline_chunk_size)
         self._kwargs = kwargs
+        self._connection_pool = connection_pool
+        # Database the shared pool's connections are bound to
+        self._pool_db: int = (
+            connection_pool.connection_kwargs.get("db", 0) if connection_pool else db
+        )
+        self._select_db = self._pool_db != db
         self._client: Optional[redis.Redis] = None
+        self._use_scripts = use_scripts
+        # SHA1 of STATS_SCRIPT once loaded with SCRIPT LOAD
+        self._script_sha: Optional[str] = None
 
-    def _get_sentinel_connection(self) -> redis.Redis:
-        """Get a connection to the master from a Sentinel."""
+    @classmethod
+    def create_shared_pool(
+        cls, max_connections: int = 4, **kwargs
+    ) -> redis.ConnectionPool:
+        """Create a bounded connection pool shared by brokers of all databases.
+
+        Connections of the pool stay on database 0. Brokers for other
+        databases switch to their own database with a ``SELECT`` at the
+        start of every pipelined batch and switch back at its end, so the
+        number of connections does not grow with the number of databases.
+        When every connection is in use, callers wait up to the socket
+        timeout for one to be released, with or without Sentinel.
+
+        Args:
+            max_connections: Maximum number of connections in the pool
+            **kwargs: Broker configuration, as accepted by ``RedisBroker``
+
+        Returns:
+            Connection pool to pass as ``connection_pool`` to each broker
+        """
+        kwargs.pop("db", None)
+        kwargs.pop("use_scripts", None)
+        broker = cls(**kwargs)
+        if broker._use_sentinel:
+            return broker._get_sentinel().connection_pool(
+                broker._sentinel_master_name,
+                pool_class=BlockingSentinelConnectionPool,
+                db=0,
+                password=broker._password,
+                socket_timeout=broker._socket_timeout,
+                max_connections=max_connections,
+                timeout=broker._socket_timeout,
+                **broker._kwargs,
+            )
+        return redis.BlockingConnectionPool(
+            host=broker._host,
+            port=broker._port,
+            db=0,
+            password=broker._password,
+            socket_timeout=broker._socket_timeout,
+            max_connections=max_connections,
+            timeout=broker._socket_timeout,
+            **broker._kwargs,
+        )
+
+    @classmethod
+    def close_shared_pool(cls, pool: Any) -> None:
+        """Disconnect a pool from ``create_shared_pool``.
+
+        A Sentinel pool is released from its shared Sentinel client, which
+        is closed along with its last pool.
+
+        Args:
+            pool: Pool to close
+        """
+        if isinstance(pool, SentinelConnectionPool) and isinstance(
+            pool.sentinel_manager, SharedSentinel
+        ):
+            pool.sentinel_manager.release(pool)
+        else:
+            pool.disconnect()
+
+    def _get_sentinel(self) -> SharedSentinel:
+        """Get the Sentinel client shared by every broker of the exporter."""
         if not self._sentinel_hosts:
             raise ValueError("Sentinel hosts must be provided")
         if not self._sentinel_master_name:
             raise ValueError("Sentinel master name must be provided")
 
-        sentinel_hosts: List[Any] = [
-            tuple(host.split(":")) for host in self._sentinel_hosts.split(",")
-        ]
-        sentinel = Sentinel(
-            sentinels=sentinel_hosts,
-            password=self._sentinel_password,
+        return SharedSentinel.for_config(
+            self._sentinel_hosts,
+            sentinel_password=self._sentinel_password,
             socket_timeout=self._socket_timeout,
             **self._kwargs,
         )
-        return sentinel.master_for(
-            self._sentinel_master_name,
-            db=self._db,
-            password=self._password,
-            socket_timeout=self._socket_timeout,
-            **self._kwargs,
+
+    def _get_sentinel_connection(self) -> redis.Redis:
+        """Get a connection to the master through the shared Sentinel."""
+        return redis.Redis(
+            connection_pool=self._get_sentinel().connection_pool(
+                self._sentinel_master_name,
+                db=self._db,
+                password=self._password,
+                socket_timeout=self._socket_timeout,
+                **self._kwargs,
+            )
         )
 
     def connect(self) -> None:
         """Establish connection to Redis."""
         try:
-            if self._use_sentinel:
+            if self._connection_pool is not None:
+                self._client = redis.Redis(connection_pool=self._connection_pool)
+            elif self._use_sentinel:
                 self._client = self._get_sentinel_connection()
             else:
                 self._client = redis.Redis(
@@ -103,6 +222,9 @@ class RedisBroker(Broker):
         if self._client:
             try:
                 self._client.close()
+                if self._use_sentinel and self._connection_pool is None:
+                    # The pool is the broker's own, see _get_sentinel_connection
+                    self.close_shared_pool(self._client.connection_pool)
                 logger.info("Disconnected from Redis")
             except RedisError as e:
                 logger.error(f"Error disconnecting from Redis: {e}")
@@ -119,6 +241,69 @@ class RedisBroker(Broker):
         except RedisError:
             return False
 
+    def connection_counts(self) -> Dict[str, int]:
+        """Get the number of connections of the client's pool per state.
+
+        With a shared pool, every broker reports the same connections.
+        redis-py has no public API for these counts, so they are read
+        from the pool's internals; nothing is reported when a redis-py
+        version lays them out differently.
+        """
+        if not self._client:
+            return {}
+        pool = self._client.connection_pool
+        try:
+            if isinstance(pool, redis.BlockingConnectionPool):
+                created = len(pool._connections)
+                idle = sum(
+                    1 for connection in list(pool.pool.queue) if connection is not None
+                )
+                return {"in_use": created - idle, "idle": idle}
+            return {
+                "in_use": len(pool._in_use_connections),
+                "idle": len(pool._available_connections),
+            }
+        except (AttributeError, TypeError):
+            return {}
+
+    def _pipeline(self) -> Pipeline:
+        """Start a non-transactional pipeline on this broker's database."""
+        if not self._client:
+            raise RuntimeError("Not connected to Redis")
+
+        pipe = self._client.pipeline(transaction=False)
+        if self._select_db:
+            pipe.execute_command("SELECT", self._db)
+        return pipe
+
+    def _execute(self, pipe: Pipeline) -> List[Any]:
+        """Execute a pipeline started with ``_pipeline``.
+
+        Restores the shared connection's database and strips the replies
+        of the ``SELECT`` commands.
+        """
+        try:
+            if not self._select_db:
+                return pipe.execute()
+            pipe.execute_command("SELECT", self._pool_db)
+            return pipe.execute()[1:-1]
+        except (ConnectionError, TimeoutError):
+            if self._use_sentinel:
+                # The master may have moved without us hearing about it
+                self._get_sentinel().invalidate(self._sentinel_master_name)
+            raise
+
+    def _llen_many(self, keys: List[str]) -> List[int]:
+        """LLEN several keys in pipelined chunks of ``pipeline_chunk_size``."""
+        lengths: List[int] = []
+        for start in range(0, len(keys), self._pipeline_chunk_size):
+            chunk = keys[start : start + self._pipeline_chunk_size]
+            pipe = self._pipeline()
+            for key in chunk:
+                pipe.llen(key)
+            lengths.extend(self._execute(pipe))
+        return lengths
+
     def get_queue_length(self, queue_name: str) -> int:
         """Get number of messages in a Redis queue.
 
@@ -136,11 +321,367 @@ class RedisBroker(Broker):
 
         try:
             # In Redis, Celery queues are stored as lists
-            return self._client.llen(queue_name)
+            pipe = self._pipeline()
+            pipe.llen(queue_name)
+            return self._execute(pipe)[0]
         except RedisError as e:
             logger.error(f"Failed to get queue length for {queue_name}: {e}")
             raise
 
+    def get_queue_lengths(self, queue_names: List[str]) -> Dict[str, int]:
+        """Get number of messages in several Redis queues.
+
+        LLENs are sent through a non-transactional pipeline, split into
+        chunks of at most ``pipeline_chunk_size`` commands, so a db costs
+        one round-trip per chunk instead of one per queue.
+
+        Args:
+            queue_names: Names of the queues to inspect
+
+        Returns:
+            Mapping of queue name to number of messages in queue
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        if not self._client:
+            raise RuntimeError("Not connected to Redis")
+
+        try:
+            return dict(zip(queue_names, self._llen_many(queue_names)))
+        except RedisError as e:
+            logger.error(f"Failed to get queue lengths for {queue_names}: {e}")
+            raise
+
+    def get_priority_queue_lengths(
+        self, queue_names: List[str], priority_steps: List[int], separator: str
+    ) -> Dict[str, Dict[int, int]]:
+        """Get number of messages per priority in several Redis queues.
+
+        With ``priority_steps``, kombu stores a queue as one list per step:
+        the bare queue name for step 0 and ``<queue><separator><step>``
+        for the others. Every sub-list of every queue is fetched in the
+        same pipelined batch.
+
+        Args:
+            queue_names: Names of the queues to inspect
+            priority_steps: Priority steps of the Celery transport
+            separator: Separator between queue name and priority step
+
+        Returns:
+            Mapping of queue name to messages per priority step
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        if not self._client:
+            raise RuntimeError("Not connected to Redis")
+
+        keys = [
+            priority_queue_key(queue, step, separator)
+            for queue in queue_names
+            for step in priority_steps
+        ]
+        try:
+            lengths = iter(self._llen_many(keys))
+        except RedisError as e:
+            logger.error(f"Failed to get priority lengths for {queue_names}: {e}")
+            raise
+        return {
+            queue: {step: next(lengths) for step in priority_steps}
+            for queue in queue_names
+        }
+
+    def get_queue_samples(self, windows: Dict[str, int]) -> Dict[str, List[bytes]]:
+        """Read raw messages from the consumer end of several Redis queues.
+
+        kombu pushes messages on the left of a list and consumes them from
+        the right, so each window is an ``LRANGE queue -n -1``. All windows
+        are read in a single pipelined round-trip.
+
+        Args:
+            windows: Mapping of queue name to number of messages to read
+
+        Returns:
+            Mapping of queue name to raw messages, next to be consumed last
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        windows = {queue: size for queue, size in windows.items() if size > 0}
+        if not windows:
+            return {}
+
+        try:
+            pipe = self._pipeline()
+            for queue_name, size in windows.items():
+                pipe.lrange(queue_name, -size, -1)
+            return dict(zip(windows, self._execute(pipe)))
+        except RedisError as e:
+            logger.error(f"Failed to sample queues {list(windows)}: {e}")
+            raise
+
+    def get_queue_messages(
+        self, positions: Dict[str, List[int]]
+    ) -> Dict[str, List[Optional[bytes]]]:
+        """Read raw messages at given positions of several Redis queues.
+
+        Every position is an ``LINDEX``; all of them are sent in a single
+        pipelined round-trip. Position -1 is the next message consumed.
+
+        Args:
+            positions: Mapping of queue name to list indexes to read
+
+        Returns:
+            Mapping of queue name to the raw message at each index, None
+            where the index is out of range
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        positions = {queue: indexes for queue, indexes in positions.items() if indexes}
+        if not positions:
+            return {}
+
+        try:
+            pipe = self._pipeline()
+            for queue_name, indexes in positions.items():
+                for index in indexes:
+                    pipe.lindex(queue_name, index)
+            replies = iter(self._execute(pipe))
+        except RedisError as e:
+            logger.error(f"Failed to read messages of {list(positions)}: {e}")
+            raise
+        return {
+            queue_name: [next(replies) for _ in indexes]
+            for queue_name, indexes in positions.items()
+        }
+
+    def get_unacked(
+        self,
+        age_buckets: List[float],
+        visibility_timeout: float,
+        now: Optional[float] = None,
+        unacked_key: str = UNACKED_KEY,
+        unacked_index_key: str = UNACKED_INDEX_KEY,
+    ) -> Unacked:
+        """Get statistics of messages reserved by workers but not acked.
+
+        kombu keeps every reserved message in the ``unacked`` hash and its
+        reservation time as score in the ``unacked_index`` sorted set.
+        The age histogram is built with one ZCOUNT per bucket, so no
+        message is read, and everything is sent in a single pipelined
+        round-trip.
+
+        Args:
+            age_buckets: Upper bounds in seconds of the age histogram
+            visibility_timeout: Seconds after which kombu redelivers a
+                reserved message
+            now: Current time, defaults to ``time.time()``
+            unacked_key: Hash holding the reserved messages
+            unacked_index_key: Sorted set of reservation times
+
+        Returns:
+            Unacked count, cumulative age histogram and expired count
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        now = time.time() if now is None else now
+        bounds = sorted(set(age_buckets))
+        try:
+            pipe = self._pipeline()
+            pipe.hlen(unacked_key)
+            pipe.zcard(unacked_index_key)
+            for bound in bounds:
+                # Reserved at most ``bound`` seconds ago
+                pipe.zcount(unacked_index_key, now - bound, "+inf")
+            pipe.zcount(unacked_index_key, "-inf", f"({now - visibility_timeout}")
+            count, total, *bucket_counts, expired = self._execute(pipe)
+        except RedisError as e:
+            logger.error(f"Failed to get unacked messages: {e}")
+            raise
+
+        buckets = dict(zip(bounds, bucket_counts))
+        buckets[float("inf")] = total
+        return Unacked(db=self._db, count=count, buckets=buckets, expired=expired)
+
+    def get_db_stats(
+        self,
+        queue_names: List[str],
+        priority_steps: List[int],
+        separator: str,
+        age_buckets: Optional[List[float]] = None,
+        visibility_timeout: float = 3600.0,
+    ) -> Tuple[Dict[str, Dict[int, int]], Optional[Unacked]]:
+        """Get every per-queue and unacked statistic of a database.
+
+        With ``use_scripts``, the stats are computed on the server by
+        ``STATS_SCRIPT``, loaded once with SCRIPT LOAD and run with
+        EVALSHA. Each call covers at most ``pipeline_chunk_size`` keys and
+        all calls are pipelined, so a db costs one round-trip and replies
+        are bare integers. Without scripts, the pipelined commands of
+        ``Broker.get_db_stats`` are used.
+
+        Args:
+            queue_names: Names of the queues to inspect
+            priority_steps: Priority steps of the Celery transport; empty
+                to report every message at priority 0
+            separator: Separator between queue name and priority step
+            age_buckets: Age histogram bounds of unacked messages; None to
+                skip unacked statistics
+            visibility_timeout: Seconds after which kombu redelivers a
+                reserved message
+
+        Returns:
+            Messages per priority step of each queue, and unacked
+            statistics when requested
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        if not self._use_scripts:
+            return super().get_db_stats(
+                queue_names, priority_steps, separator, age_buckets, visibility_timeout
+            )
+        if not self._client:
+            raise RuntimeError("Not connected to Redis")
+
+        steps = priority_steps or [0]
+        keys = [
+            priority_queue_key(queue, step, separator)
+            for queue in queue_names
+            for step in steps
+        ]
+        now = time.time()
+        bounds = sorted(set(age_buckets or []))
+        unacked_args = [
+            "1" if bounds else "0",
+            f"({now - visibility_timeout}",
+            *(now - bound for bound in bounds),
+        ]
+        chunks = [
+            keys[start : start + self._pipeline_chunk_size]
+            for start in range(0, len(keys), self._pipeline_chunk_size)
+        ] or [[]]
+
+        try:
+            replies = self._run_stats_script(chunks, unacked_args)
+        except RedisError as e:
+            logger.error(f"Failed to run stats script for {queue_names}: {e}")
+            raise
+
+        lengths = iter(replies)
+        priorities = {
+            queue: {step: next(lengths) for step in steps} for queue in queue_names
+        }
+        unacked = None
+        if bounds:
+            count, total, *bucket_counts, expired = lengths
+            buckets = dict(zip(bounds, bucket_counts))
+            buckets[float("inf")] = total
+            unacked = Unacked(
+                db=self._db, count=count, buckets=buckets, expired=expired
+            )
+        return priorities, unacked
+
+    def _run_stats_script(
+        self, chunks: List[List[str]], unacked_args: List[Any]
+    ) -> List[int]:
+        """Run ``STATS_SCRIPT`` once per chunk of keys in one pipeline.
+
+        Only the last call computes the unacked stats, so the flattened
+        replies are every list length followed by the unacked stats. The script is
+        (re)loaded when the server does not know it, which also covers a
+        Sentinel failover to a master that never saw it.
+        """
+        for attempt in range(2):
+            if self._script_sha is None:
+                self._script_sha = self._client.script_load(STATS_SCRIPT)
+            pipe = self._pipeline()
+            for index, chunk in enumerate(chunks):
+                args = unacked_args if index == len(chunks) - 1 else ["0"]
+                pipe.evalsha(
+                    self._script_sha,
+                    len(chunk) + 2,
+                    UNACKED_KEY,
+                    UNACKED_INDEX_KEY,
+                    *chunk,
+                    *args,
+                )
+            try:
+                return [value for reply in self._execute(pipe) for value in reply]
+            except NoScriptError:
+                if attempt:
+                    raise
+                logger.info("Stats script missing on the server, reloading it")
+                self._script_sha = None
+        return []
+
+    def scan_keys(
+        self,
+        cursor: int = 0,
+        match: Optional[str] = None,
+        count: int = 1000,
+        key_type: Optional[str] = None,
+    ) -> Tuple[int, List[str]]:
+        """Run a single SCAN step.
+
+        Args:
+            cursor: Cursor returned by the previous step, 0 to start a pass
+            match: Optional glob pattern keys must match
+            count: Number of keyspace slots to visit in this step
+            key_type: Optional Redis type keys must have, e.g. ``list``
+
+        Returns:
+            Cursor for the next step (0 once the pass is complete) and the
+            names of the keys found in this step
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        try:
+            pipe = self._pipeline()
+            pipe.scan(cursor=cursor, match=match, count=count, _type=key_type)
+            next_cursor, keys = self._execute(pipe)[0]
+        except RedisError as e:
+            logger.error(f"Failed to scan keys: {e}")
+            raise
+        return int(next_cursor), [_decode(key) for key in keys]
+
+    def get_kombu_binding_queues(
+        self, binding_keys: Iterable[str], separator: str = "\x06\x16"
+    ) -> Set[str]:
+        """Get the queues bound in kombu's ``_kombu.binding.*`` sets.
+
+        Each member of a binding set is ``routing_key, pattern, queue``
+        joined by the transport's separator.
+
+        Args:
+            binding_keys: Names of the binding sets to read
+            separator: Separator used by the kombu Redis transport
+
+        Returns:
+            Names of the bound queues
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        binding_keys = list(binding_keys)
+        if not binding_keys:
+            return set()
+
+        try:
+            pipe = self._pipeline()
+            for key in binding_keys:
+                pipe.smembers(key)
+            bindings = self._execute(pipe)
+        except RedisError as e:
+            logger.error(f"Failed to read kombu bindings {binding_keys}: {e}")
+            raise
+
+        return binding_queues(bindings, separator)
+
     def ping(self) -> bool:
         """Check if Redis is reachable.
 
@@ -175,3 +716,32 @@ class RedisBroker(Broker):
             "vdb": self._db,
             "type": "redis",
         }
+
+
+def priority_queue_key(queue_name: str, priority_step: int, separator: str) -> str:
+    """Get the Redis key kombu stores a queue's priority step in."""
+    if priority_step:
+        return f"{queue_name}{separator}{priority_step}"
+    return queue_name
+
+
+def binding_queues(bindings: Iterable[Iterable[Any]], separator: str) -> Set[str]:
+    """Get the queues of the members of kombu binding sets.
+
+    Each member is ``routing_key, pattern, queue`` joined by the
+    transport's separator.
+    """
+    queues: Set[str] = set()
+    for members in bindings:
+        for member in members:
+            queue = _decode(member).split(separator)[-1]
+            if queue:
+                queues.add(queue)
+    return queues
+
+
+def _decode(value: Any) -> str:
+    """Decode a Redis reply into a string."""
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return str(value)
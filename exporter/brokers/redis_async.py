@@ -0,0 +1,240 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+import redis.asyncio as aioredis
+from redis.asyncio.sentinel import Sentinel
+from redis.exceptions import RedisError
+
+from exporter.brokers.base import AsyncBroker
+from exporter.brokers.redis import priority_queue_key
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRedisBroker(AsyncBroker):
+    """Redis broker implementation on top of ``redis.asyncio``."""
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        password: Optional[str] = None,
+        socket_timeout: float = 5.0,
+        use_sentinel: bool = False,
+        sentinel_hosts: Optional[str] = None,
+        sentinel_master_name: Optional[str] = None,
+        sentinel_password: Optional[str] = None,
+        pipeline_chunk_size: int = 500,
+        **kwargs,
+    ) -> None:
+        """Initialize Redis broker connection.
+
+        Args:
+            host: Redis host address
+            port: Redis port number
+            db: Redis database number
+            password: Optional Redis password
+            socket_timeout: Socket timeout in seconds
+            use_sentinel: Use Redis Sentinel for connection
+            sentinel_hosts: Comma-separated list of Sentinel hosts
+            sentinel_master_name: Name of the master to monitor
+            sentinel_password: Optional Sentinel password
+            pipeline_chunk_size: Maximum number of commands sent per pipeline
+            **kwargs: Additional redis-py connection arguments
+        """
+        self._host = host
+        self._port = port
+        self._db = db
+        self._password = password
+        self._socket_timeout = socket_timeout
+        self._use_sentinel = use_sentinel
+        self._sentinel_hosts = sentinel_hosts
+        self._sentinel_master_name = sentinel_master_name
+        self._sentinel_password = sentinel_password
+        self._pipeline_chunk_size = max(1, pipeline_chunk_size)
+        self._kwargs = kwargs
+        self._client: Optional[aioredis.Redis] = None
+
+    def _get_sentinel_connection(self) -> aioredis.Redis:
+        """Get a connection to the master from a Sentinel."""
+        if not self._sentinel_hosts:
+            raise ValueError("Sentinel hosts must be provided")
+        if not self._sentinel_master_name:
+            raise ValueError("Sentinel master name must be provided")
+
+        sentinel_hosts: List[Any] = [
+            tuple(host.split(":")) for host in self._sentinel_hosts.split(",")
+        ]
+        sentinel = Sentinel(
+            sentinels=sentinel_hosts,
+            password=self._sentinel_password,
+            socket_timeout=self._socket_timeout,
+            **self._kwargs,
+        )
+        return sentinel.master_for(
+            self._sentinel_master_name,
+            db=self._db,
+            password=self._password,
+            socket_timeout=self._socket_timeout,
+            **self._kwargs,
+        )
+
+    async def connect(self) -> None:
+        """Establish connection to Redis."""
+        try:
+            if self._use_sentinel:
+                self._client = self._get_sentinel_connection()
+            else:
+                self._client = aioredis.Redis(
+                    host=self._host,
+                    port=self._port,
+                    db=self._db,
+                    password=self._password,
+                    socket_timeout=self._socket_timeout,
+                    **self._kwargs,
+                )
+            # Test connection
+            await self._client.ping()
+            logger.info(f"Connected to Redis at {self.connection_info}")
+        except (RedisError, ValueError) as e:
+            logger.error(f"Failed to connect to Redis: {e}")
+            self._client = None
+            raise
+
+    async def disconnect(self) -> None:
+        """Close Redis connection."""
+        if self._client:
+            try:
+                await self._client.aclose()
+                logger.info("Disconnected from Redis")
+            except RedisError as e:
+                logger.error(f"Error disconnecting from Redis: {e}")
+            finally:
+                self._client = None
+
+    async def is_connected(self) -> bool:
+        """Check if Redis connection is active."""
+        return await self.ping()
+
+    async def _llen_many(self, keys: List[str]) -> List[int]:
+        """LLEN several keys in pipelined chunks of ``pipeline_chunk_size``."""
+        lengths: List[int] = []
+        for start in range(0, len(keys), self._pipeline_chunk_size):
+            chunk = keys[start : start + self._pipeline_chunk_size]
+            pipe = self._client.pipeline(transaction=False)
+            for key in chunk:
+                pipe.llen(key)
+            lengths.extend(await pipe.execute())
+        return lengths
+
+    async def get_queue_length(self, queue_name: str) -> int:
+        """Get number of messages in a Redis queue.
+
+        Args:
+            queue_name: Name of the queue to inspect
+
+        Returns:
+            Number of messages in queue
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        lengths = await self.get_queue_lengths([queue_name])
+        return lengths[queue_name]
+
+    async def get_queue_lengths(self, queue_names: List[str]) -> Dict[str, int]:
+        """Get number of messages in several Redis queues.
+
+        LLENs are sent through non-transactional pipelines of at most
+        ``pipeline_chunk_size`` commands.
+
+        Args:
+            queue_names: Names of the queues to inspect
+
+        Returns:
+            Mapping of queue name to number of messages in queue
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        if not self._client:
+            raise RuntimeError("Not connected to Redis")
+
+        try:
+            return dict(zip(queue_names, await self._llen_many(queue_names)))
+        except RedisError as e:
+            logger.error(f"Failed to get queue lengths for {queue_names}: {e}")
+            raise
+
+    async def get_priority_queue_lengths(
+        self, queue_names: List[str], priority_steps: List[int], separator: str
+    ) -> Dict[str, Dict[int, int]]:
+        """Get number of messages per priority in several Redis queues.
+
+        Every priority sub-list of every queue is fetched in the same
+        pipelined batch, see ``RedisBroker.get_priority_queue_lengths``.
+
+        Args:
+            queue_names: Names of the queues to inspect
+            priority_steps: Priority steps of the Celery transport
+            separator: Separator between queue name and priority step
+
+        Returns:
+            Mapping of queue name to messages per priority step
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        if not self._client:
+            raise RuntimeError("Not connected to Redis")
+
+        keys = [
+            priority_queue_key(queue, step, separator)
+            for queue in queue_names
+            for step in priority_steps
+        ]
+        try:
+            lengths = iter(await self._llen_many(keys))
+        except RedisError as e:
+            logger.error(f"Failed to get priority lengths for {queue_names}: {e}")
+            raise
+        return {
+            queue: {step: next(lengths) for step in priority_steps}
+            for queue in queue_names
+        }
+
+    async def ping(self) -> bool:
+        """Check if Redis is reachable.
+
+        Returns:
+            True if Redis responds to ping, False otherwise
+        """
+        if not self._client:
+            return False
+        try:
+            await self._client.ping()
+            return True
+        except RedisError:
+            return False
+
+    @property
+    def connection_info(self) -> Dict[str, Any]:
+        """Get Redis connection information.
+
+        Returns:
+            Dictionary with connection details
+        """
+        if self._use_sentinel:
+            return {
+                "sentinel_hosts": self._sentinel_hosts,
+                "sentinel_master_name": self._sentinel_master_name,
+                "vdb": self._db,
+                "type": "redis-sentinel",
+            }
+        return {
+            "host": self._host,
+            "port": self._port,
+            "vdb": self._db,
+            "type": "redis",
+        }
@@ -0,0 +1,571 @@
+import logging
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from redis.cluster import ClusterNode, RedisCluster
+from redis.crc import key_slot
+from redis.exceptions import (
+    AskError,
+    ConnectionError,
+    MovedError,
+    RedisError,
+    TimeoutError,
+)
+
+from exporter.brokers.base import Broker
+from exporter.brokers.redis import (
+    UNACKED_INDEX_KEY,
+    UNACKED_KEY,
+    binding_queues,
+    priority_queue_key,
+)
+from exporter.models import Unacked
+
+logger = logging.getLogger(__name__)
+
+# A command as sent to Redis: name, key, then the other arguments
+Command = Tuple[Any, ...]
+
+# Redirections followed for a command before giving up
+MAX_REDIRECTS = 3
+
+# Low bits of a cluster SCAN cursor holding the fingerprint of the
+# primaries it was issued for
+SCAN_TOPOLOGY_BITS = 16
+
+
+def group_by_node(
+    commands: Sequence[Command], node_for_slot: Callable[[int], str]
+) -> Dict[str, List[int]]:
+    """Group commands by the node owning the hash slot of their key.
+
+    Args:
+        commands: Commands, each with its key as second element
+        node_for_slot: Name of the node owning a hash slot
+
+    Returns:
+        Mapping of node name to the indexes of its commands, in order
+    """
+    groups: Dict[str, List[int]] = {}
+    slots: Dict[Any, int] = {}
+    for index, command in enumerate(commands):
+        key = command[1]
+        if key not in slots:
+            slots[key] = key_slot(key.encode() if isinstance(key, str) else key)
+        groups.setdefault(node_for_slot(slots[key]), []).append(index)
+    return groups
+
+
+def _topology_fingerprint(names: List[str]) -> int:
+    """Fingerprint of the primaries of a cluster, on SCAN_TOPOLOGY_BITS bits."""
+    return zlib.crc32(",".join(names).encode()) & ((1 << SCAN_TOPOLOGY_BITS) - 1)
+
+
+class RedisClusterBroker(Broker):
+    """Redis Cluster broker implementation.
+
+    Keys are grouped by the node owning their hash slot and every node
+    gets one non-transactional pipeline, run concurrently on a small
+    thread pool, so a cycle costs about one round-trip whatever the
+    number of nodes. MOVED replies refresh the cached slot map and ASK
+    replies are followed with ``ASKING``; both reuse the per-node
+    clients instead of reconnecting. A node that cannot be reached, e.g.
+    a primary that failed over, refreshes the slot map once and its
+    commands are sent to the new owners of their slots.
+    """
+
+    supports_discovery = True
+
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        password: Optional[str] = None,
+        socket_timeout: float = 5.0,
+        cluster_nodes: Optional[str] = None,
+        pipeline_chunk_size: int = 500,
+        cluster_max_workers: int = 8,
+        **kwargs,
+    ) -> None:
+        """Initialize Redis Cluster connection settings.
+
+        Args:
+            host: Host of a cluster node, used without ``cluster_nodes``
+            port: Port of that cluster node
+            db: Redis database number, must be 0 on a cluster
+            password: Optional Redis password
+            socket_timeout: Socket timeout in seconds
+            cluster_nodes: Comma-separated startup nodes, e.g.
+                'node1:6379,node2:6379'
+            pipeline_chunk_size: Maximum number of commands sent per
+                pipeline and node
+            cluster_max_workers: Maximum number of nodes queried at once
+            **kwargs: Additional redis-py connection arguments
+        """
+        if db != 0:
+            raise ValueError("Redis Cluster only supports db 0")
+        self._host = host
+        self._port = port
+        self._db = db
+        self._password = password
+        self._socket_timeout = socket_timeout
+        self._cluster_nodes = cluster_nodes
+        self._pipeline_chunk_size = max(1, pipeline_chunk_size)
+        self._cluster_max_workers = max(1, cluster_max_workers)
+        self._kwargs = kwargs
+        self._client: Optional[RedisCluster] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _startup_nodes(self) -> List[ClusterNode]:
+        """Parse the configured startup nodes."""
+        if not self._cluster_nodes:
+            return [ClusterNode(self._host, self._port)]
+        nodes = []
+        for node in self._cluster_nodes.split(","):
+            host, _, port = node.strip().rpartition(":")
+            nodes.append(ClusterNode(host, int(port)))
+        return nodes
+
+    def connect(self) -> None:
+        """Establish connection to the cluster and load its slot map."""
+        try:
+            self._client = RedisCluster(
+                startup_nodes=self._startup_nodes(),
+                password=self._password,
+                socket_timeout=self._socket_timeout,
+                **self._kwargs,
+            )
+            self._client.ping()
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._cluster_max_workers,
+                thread_name_prefix="cluster-node",
+            )
+            logger.info(f"Connected to Redis Cluster at {self.connection_info}")
+        except (RedisError, ValueError) as e:
+            logger.error(f"Failed to connect to Redis Cluster: {e}")
+            self._client = None
+            raise
+
+    def disconnect(self) -> None:
+        """Close connections to every cluster node."""
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self._client:
+            try:
+                self._client.close()
+                logger.info("Disconnected from Redis Cluster")
+            except RedisError as e:
+                logger.error(f"Error disconnecting from Redis Cluster: {e}")
+            finally:
+                self._client = None
+
+    def is_connected(self) -> bool:
+        """Check if the cluster connection is active."""
+        return self.ping()
+
+    def ping(self) -> bool:
+        """Check if the cluster is reachable.
+
+        Returns:
+            True if the cluster nodes respond to ping, False otherwise
+        """
+        if not self._client:
+            return False
+        try:
+            return bool(self._client.ping())
+        except RedisError:
+            return False
+
+    @property
+    def connection_info(self) -> Dict[str, Any]:
+        """Get Redis Cluster connection information.
+
+        Returns:
+            Dictionary with connection details
+        """
+        return {
+            "cluster_nodes": self._cluster_nodes or f"{self._host}:{self._port}",
+            "vdb": self._db,
+            "type": "redis-cluster",
+        }
+
+    def _node_for_slot(self, slot: int) -> str:
+        return self._client.nodes_manager.get_node_from_slot(slot).name
+
+    def _run_on_node(
+        self, node_name: str, commands: List[Command], asking: bool = False
+    ) -> List[Any]:
+        """Send commands to one node in pipelined chunks.
+
+        Errors are returned in place of replies so redirections can be
+        handled per command.
+        """
+        nodes_manager = self._client.nodes_manager
+        node = nodes_manager.get_node(node_name=node_name)
+        if node is None or node.redis_connection is None:
+            # Redirected to a node missing from the cached topology
+            nodes_manager.initialize()
+            node = nodes_manager.get_node(node_name=node_name)
+            if node is None or node.redis_connection is None:
+                raise RedisError(f"Unknown cluster node {node_name}")
+        replies: List[Any] = []
+        for start in range(0, len(commands), self._pipeline_chunk_size):
+            pipe = node.redis_connection.pipeline(transaction=False)
+            for command in commands[start : start + self._pipeline_chunk_size]:
+                if asking:
+                    pipe.execute_command("ASKING")
+                pipe.execute_command(*command)
+            chunk_replies = pipe.execute(raise_on_error=False)
+            replies.extend(chunk_replies[1::2] if asking else chunk_replies)
+        return replies
+
+    def _execute(self, commands: List[Command]) -> List[Any]:
+        """Run commands on the nodes owning their keys, concurrently.
+
+        Args:
+            commands: Commands, each with its key as second element
+
+        Returns:
+            Replies in the order of the commands
+
+        Raises:
+            RedisError: If a command fails, is redirected too often or its
+                node stays unreachable after a slot map refresh
+        """
+        if not self._client or not self._executor:
+            raise RuntimeError("Not connected to Redis Cluster")
+
+        replies: List[Any] = [None] * len(commands)
+        # Indexes of the commands to send, per node, and whether the node
+        # is the target of an ASK redirection
+        batches: Dict[Tuple[str, bool], List[int]] = {
+            (node, False): indexes
+            for node, indexes in group_by_node(commands, self._node_for_slot).items()
+        }
+        refreshed_on_failure = False
+        for _ in range(MAX_REDIRECTS + 1):
+            futures = {
+                batch: self._executor.submit(
+                    self._run_on_node,
+                    batch[0],
+                    [commands[i] for i in indexes],
+                    batch[1],
+                )
+                for batch, indexes in batches.items()
+            }
+
+            moved = False
+            redirected: Dict[Tuple[str, bool], List[int]] = {}
+            for batch, future in futures.items():
+                try:
+                    batch_replies = future.result()
+                except (ConnectionError, TimeoutError) as e:
+                    if refreshed_on_failure:
+                        raise
+                    # The node may have failed over: route its commands
+                    # again with a refreshed slot map, like MOVED ones
+                    logger.warning(f"Cluster node {batch[0]} is unreachable: {e}")
+                    moved = True
+                    # No node to name: _regroup routes them by slot anyway
+                    redirected.setdefault(("", False), []).extend(batches[batch])
+                    continue
+                for index, reply in zip(batches[batch], batch_replies):
+                    if isinstance(reply, MovedError):
+                        moved = True
+                        redirected.setdefault(
+                            (f"{reply.host}:{reply.port}", False), []
+                        ).append(index)
+                    elif isinstance(reply, AskError):
+                        redirected.setdefault(
+                            (f"{reply.host}:{reply.port}", True), []
+                        ).append(index)
+                    elif isinstance(reply, Exception):
+                        raise reply
+                    else:
+                        replies[index] = reply
+
+            if not redirected:
+                return replies
+            if moved:
+                # Slots moved for good: reload the slot map once, clients
+                # of known nodes are kept
+                refreshed_on_failure |= ("", False) in redirected
+                self._client.nodes_manager.initialize()
+                redirected = self._regroup(commands, redirected)
+            batches = redirected
+        raise RedisError(f"Too many redirections for {len(batches)} node batches")
+
+    def _regroup(
+        self,
+        commands: List[Command],
+        redirected: Dict[Tuple[str, bool], List[int]],
+    ) -> Dict[Tuple[str, bool], List[int]]:
+        """Route MOVED commands with the refreshed slot map, keep ASK ones.
+
+        Commands of unreachable nodes are routed like MOVED ones.
+        """
+        batches: Dict[Tuple[str, bool], List[int]] = {}
+        for (node, asking), indexes in redirected.items():
+            if asking:
+                batches.setdefault((node, True), []).extend(indexes)
+                continue
+            moved = [commands[index] for index in indexes]
+            for owner, positions in group_by_node(moved, self._node_for_slot).items():
+                batches.setdefault((owner, False), []).extend(
+                    indexes[position] for position in positions
+                )
+        return batches
+
+    def get_queue_length(self, queue_name: str) -> int:
+        """Get number of messages in a Redis queue.
+
+        Args:
+            queue_name: Name of the queue to inspect
+
+        Returns:
+            Number of messages in queue
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        return self.get_queue_lengths([queue_name])[queue_name]
+
+    def get_queue_lengths(self, queue_names: List[str]) -> Dict[str, int]:
+        """Get number of messages in several Redis queues.
+
+        Args:
+            queue_names: Names of the queues to inspect
+
+        Returns:
+            Mapping of queue name to number of messages in queue
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        try:
+            lengths = self._execute([("LLEN", queue) for queue in queue_names])
+        except RedisError as e:
+            logger.error(f"Failed to get queue lengths for {queue_names}: {e}")
+            raise
+        return dict(zip(queue_names, lengths))
+
+    def get_priority_queue_lengths(
+        self, queue_names: List[str], priority_steps: List[int], separator: str
+    ) -> Dict[str, Dict[int, int]]:
+        """Get number of messages per priority in several Redis queues.
+
+        Priority sub-queues hash to different slots, so they are spread
+        over the nodes like any other key.
+
+        Args:
+            queue_names: Names of the queues to inspect
+            priority_steps: Priority steps of the Celery transport
+            separator: Separator between queue name and priority step
+
+        Returns:
+            Mapping of queue name to messages per priority step
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        commands: List[Command] = [
+            ("LLEN", priority_queue_key(queue, step, separator))
+            for queue in queue_names
+            for step in priority_steps
+        ]
+        try:
+            lengths = iter(self._execute(commands))
+        except RedisError as e:
+            logger.error(f"Failed to get priority lengths for {queue_names}: {e}")
+            raise
+        return {
+            queue: {step: next(lengths) for step in priority_steps}
+            for queue in queue_names
+        }
+
+    def get_queue_samples(self, windows: Dict[str, int]) -> Dict[str, List[bytes]]:
+        """Read raw messages from the consumer end of several Redis queues.
+
+        Args:
+            windows: Mapping of queue name to number of messages to read
+
+        Returns:
+            Mapping of queue name to raw messages, next to be consumed last
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        windows = {queue: size for queue, size in windows.items() if size > 0}
+        try:
+            samples = self._execute(
+                [("LRANGE", queue, -size, -1) for queue, size in windows.items()]
+            )
+        except RedisError as e:
+            logger.error(f"Failed to sample queues {list(windows)}: {e}")
+            raise
+        return dict(zip(windows, samples))
+
+    def get_queue_messages(
+        self, positions: Dict[str, List[int]]
+    ) -> Dict[str, List[Optional[bytes]]]:
+        """Read raw messages at given positions of several Redis queues.
+
+        Args:
+            positions: Mapping of queue name to list indexes to read
+
+        Returns:
+            Mapping of queue name to the raw message at each index, None
+            where the index is out of range
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        positions = {queue: indexes for queue, indexes in positions.items() if indexes}
+        try:
+            replies = iter(
+                self._execute(
+                    [
+                        ("LINDEX", queue, index)
+                        for queue, indexes in positions.items()
+                        for index in indexes
+                    ]
+                )
+            )
+        except RedisError as e:
+            logger.error(f"Failed to read messages of {list(positions)}: {e}")
+            raise
+        return {
+            queue: [next(replies) for _ in indexes]
+            for queue, indexes in positions.items()
+        }
+
+    def get_unacked(
+        self,
+        age_buckets: List[float],
+        visibility_timeout: float,
+        now: Optional[float] = None,
+    ) -> Unacked:
+        """Get statistics of messages reserved by workers but not acked.
+
+        Args:
+            age_buckets: Upper bounds in seconds of the age histogram
+            visibility_timeout: Seconds after which kombu redelivers a
+                reserved message
+            now: Current time, defaults to ``time.time()``
+
+        Returns:
+            Unacked count, cumulative age histogram and expired count
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        now = time.time() if now is None else now
+        bounds = sorted(set(age_buckets))
+        commands: List[Command] = [
+            ("HLEN", UNACKED_KEY),
+            ("ZCARD", UNACKED_INDEX_KEY),
+            *(("ZCOUNT", UNACKED_INDEX_KEY, now - bound, "+inf") for bound in bounds),
+            ("ZCOUNT", UNACKED_INDEX_KEY, "-inf", f"({now - visibility_timeout}"),
+        ]
+        try:
+            count, total, *bucket_counts, expired = self._execute(commands)
+        except RedisError as e:
+            logger.error(f"Failed to get unacked messages: {e}")
+            raise
+
+        buckets = dict(zip(bounds, bucket_counts))
+        buckets[float("inf")] = total
+        return Unacked(db=self._db, count=count, buckets=buckets, expired=expired)
+
+    def scan_keys(
+        self,
+        cursor: int = 0,
+        match: Optional[str] = None,
+        count: int = 1000,
+        key_type: Optional[str] = None,
+    ) -> Tuple[int, List[str]]:
+        """Run a single SCAN step over the primaries, one node at a time.
+
+        Every primary holds its own slice of the keyspace, so a pass scans
+        the primaries in turn, ordered by name. The returned cursor packs
+        the index of the node being scanned, that node's own cursor and a
+        fingerprint of the primaries. A cursor issued for other primaries,
+        e.g. after a failover, restarts the pass from the first one.
+
+        Args:
+            cursor: Cursor returned by the previous step, 0 to start a pass
+            match: Optional glob pattern keys must match
+            count: Number of keyspace slots to visit in this step
+            key_type: Optional Redis type keys must have, e.g. ``list``
+
+        Returns:
+            Cursor for the next step (0 once the pass is complete) and the
+            names of the keys found in this step
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        if not self._client:
+            raise RuntimeError("Not connected to Redis Cluster")
+
+        primaries = sorted(self._client.get_primaries(), key=lambda node: node.name)
+        if not primaries:
+            return 0, []
+        topology = _topology_fingerprint([node.name for node in primaries])
+        mask = (1 << SCAN_TOPOLOGY_BITS) - 1
+        if cursor and cursor & mask != topology:
+            logger.info("Cluster primaries changed, restarting the key scan")
+            cursor = 0
+        position = cursor >> SCAN_TOPOLOGY_BITS
+        index, node_cursor = position % len(primaries), position // len(primaries)
+        try:
+            node_cursor, keys = primaries[index].redis_connection.scan(
+                cursor=node_cursor, match=match, count=count, _type=key_type
+            )
+        except RedisError as e:
+            logger.error(f"Failed to scan keys of {primaries[index].name}: {e}")
+            raise
+
+        if int(node_cursor):
+            position = int(node_cursor) * len(primaries) + index
+        elif index + 1 < len(primaries):
+            position = index + 1
+        else:
+            position = 0
+        next_cursor = (position << SCAN_TOPOLOGY_BITS) | topology if position else 0
+        return next_cursor, [
+            key.decode("utf-8", errors="replace") if isinstance(key, bytes) else key
+            for key in keys
+        ]
+
+    def get_kombu_binding_queues(
+        self, binding_keys: Iterable[str], separator: str = "\x06\x16"
+    ) -> Set[str]:
+        """Get the queues bound in kombu's ``_kombu.binding.*`` sets.
+
+        The sets are read from the nodes owning them, concurrently.
+
+        Args:
+            binding_keys: Names of the binding sets to read
+            separator: Separator used by the kombu Redis transport
+
+        Returns:
+            Names of the bound queues
+
+        Raises:
+            RedisError: If Redis operation fails
+        """
+        binding_keys = list(binding_keys)
+        if not binding_keys:
+            return set()
+
+        try:
+            bindings = self._execute([("SMEMBERS", key) for key in binding_keys])
+        except RedisError as e:
+            logger.error(f"Failed to read kombu bindings {binding_keys}: {e}")
+            raise
+        return binding_queues(bindings, separator)
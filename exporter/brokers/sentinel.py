@@ -0,0 +1,264 @@
+import logging
+import threading
+import weakref
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from redis import BlockingConnectionPool
+from redis.exceptions import RedisError
+from redis.sentinel import Sentinel, SentinelConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Channel Sentinels announce a completed failover on
+SWITCH_MASTER_CHANNEL = "+switch-master"
+
+# Seconds the watcher waits for a message before checking if it must stop
+WATCH_POLL_INTERVAL = 1.0
+
+
+class BlockingSentinelConnectionPool(SentinelConnectionPool, BlockingConnectionPool):
+    """Sentinel master pool waiting for a free connection when exhausted.
+
+    As with ``BlockingConnectionPool``, a caller beyond ``max_connections``
+    waits up to ``timeout`` seconds for a connection to be released
+    instead of failing at once with "Too many connections".
+    """
+
+    def disconnect(self, inuse_connections: bool = True) -> None:
+        """Disconnect every connection, or only the idle ones.
+
+        Args:
+            inuse_connections: Also disconnect connections in use
+        """
+        if inuse_connections:
+            super().disconnect()
+            return
+        # Blocking pools of redis-py < 7 cannot disconnect idle connections
+        # only, which a failover does
+        self._checkpid()
+        for connection in list(self.pool.queue):
+            if connection is not None:
+                connection.disconnect()
+
+
+class SharedSentinel:
+    """One Sentinel client shared by every broker of an exporter.
+
+    Acts as the ``sentinel_manager`` of the brokers' connection pools,
+    answering ``discover_master`` from a cache instead of asking the
+    Sentinels again for every db and connection. A background thread
+    subscribes to ``+switch-master``: on a failover the cache is updated
+    and every registered pool drops its idle connections, so the next
+    cycle connects straight to the new master. If the subscription
+    misses a failover, a connection error invalidates the cache and the
+    next discovery asks the Sentinels again.
+
+    The client lives as long as its pools: once the last one is released,
+    the watcher stops and the client is dropped from the shared ones.
+    """
+
+    _instances: Dict[Tuple[Any, ...], "SharedSentinel"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(
+        self,
+        sentinel_hosts: str,
+        sentinel_password: Optional[str] = None,
+        socket_timeout: float = 5.0,
+        **kwargs,
+    ) -> None:
+        """Initialize the shared Sentinel client.
+
+        Args:
+            sentinel_hosts: Comma-separated list of Sentinel hosts
+            sentinel_password: Optional Sentinel password
+            socket_timeout: Socket timeout in seconds
+            **kwargs: Additional redis-py connection arguments
+        """
+        hosts: List[Any] = [
+            (host.rsplit(":", 1)[0], int(host.rsplit(":", 1)[1]))
+            for host in sentinel_hosts.split(",")
+        ]
+        self.sentinel = Sentinel(
+            sentinels=hosts,
+            password=sentinel_password,
+            socket_timeout=socket_timeout,
+            **kwargs,
+        )
+        self._masters: Dict[str, Tuple[str, int]] = {}
+        self._pools: "weakref.WeakSet[SentinelConnectionPool]" = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # Key of the client in the shared ones, set by ``for_config``
+        self._key: Optional[Tuple[Any, ...]] = None
+
+    @classmethod
+    def for_config(
+        cls,
+        sentinel_hosts: str,
+        sentinel_password: Optional[str] = None,
+        socket_timeout: float = 5.0,
+        **kwargs,
+    ) -> "SharedSentinel":
+        """Get the shared client of a Sentinel configuration, creating it once."""
+        key = (
+            sentinel_hosts,
+            sentinel_password,
+            socket_timeout,
+            *sorted(kwargs.items()),
+        )
+        with cls._instances_lock:
+            if key not in cls._instances:
+                shared = cls(
+                    sentinel_hosts, sentinel_password, socket_timeout, **kwargs
+                )
+                shared._key = key
+                cls._instances[key] = shared
+            return cls._instances[key]
+
+    def discover_master(self, service_name: str) -> Tuple[str, int]:
+        """Get the address of a master, from the cache when known.
+
+        Raises:
+            MasterNotFoundError: If no Sentinel knows the master
+        """
+        with self._lock:
+            address = self._masters.get(service_name)
+        if address is not None:
+            return address
+
+        address = self.sentinel.discover_master(service_name)
+        with self._lock:
+            self._masters[service_name] = address
+        logger.info(f"Discovered master {service_name} at {address[0]}:{address[1]}")
+        return address
+
+    def discover_slaves(self, service_name: str) -> List[Tuple[str, int]]:
+        """Get the addresses of the replicas of a master."""
+        return self.sentinel.discover_slaves(service_name)
+
+    def invalidate(self, service_name: str) -> None:
+        """Forget the cached address of a master after a connection error."""
+        with self._lock:
+            self._masters.pop(service_name, None)
+
+    def connection_pool(
+        self,
+        service_name: str,
+        pool_class: Type[SentinelConnectionPool] = SentinelConnectionPool,
+        **kwargs,
+    ) -> SentinelConnectionPool:
+        """Create a master connection pool tracked for failovers.
+
+        Args:
+            service_name: Name of the master
+            pool_class: Class of the pool, e.g.
+                ``BlockingSentinelConnectionPool``
+            **kwargs: Connection pool arguments
+
+        Returns:
+            Pool resolving the master through this shared client
+        """
+        pool = pool_class(service_name, self, **kwargs)
+        with self._lock:
+            self._pools.add(pool)
+        if self._key is not None:
+            # Shared again if its last pool was released meanwhile
+            with self._instances_lock:
+                self._instances.setdefault(self._key, self)
+        self.watch()
+        return pool
+
+    def release(self, pool: SentinelConnectionPool) -> None:
+        """Disconnect a pool, closing the client once no pool is left.
+
+        Args:
+            pool: Pool created by ``connection_pool``
+        """
+        pool.disconnect()
+        with self._lock:
+            self._pools.discard(pool)
+            if len(self._pools):
+                return
+        self.close()
+
+    def close(self) -> None:
+        """Stop following failovers and drop the client from the shared ones."""
+        if self._key is not None:
+            with self._instances_lock:
+                if self._instances.get(self._key) is self:
+                    del self._instances[self._key]
+        with self._lock:
+            self._stop.set()
+            self._watcher = None
+        for sentinel in self.sentinel.sentinels:
+            sentinel.close()
+
+    def watch(self) -> None:
+        """Start following failovers in the background, once."""
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._stop = threading.Event()
+            self._watcher = threading.Thread(
+                target=self._watch_forever,
+                args=(self._stop,),
+                daemon=True,
+                name="sentinel-watcher",
+            )
+        self._watcher.start()
+
+    def _watch_forever(self, stop: threading.Event) -> None:
+        """Listen to ``+switch-master``, moving to the next Sentinel on errors.
+
+        Messages are polled with a timeout rather than read blocking, as a
+        blocking read on a quiet channel would hit the socket timeout.
+
+        Args:
+            stop: Event set when the client is closed
+        """
+        retry_delay = 1.0
+        while not stop.is_set():
+            for sentinel in self.sentinel.sentinels:
+                pubsub = sentinel.pubsub(ignore_subscribe_messages=True)
+                try:
+                    pubsub.subscribe(SWITCH_MASTER_CHANNEL)
+                    retry_delay = 1.0
+                    while not stop.is_set():
+                        message = pubsub.get_message(timeout=WATCH_POLL_INTERVAL)
+                        if message is not None:
+                            self.handle_message(message)
+                except RedisError as e:
+                    logger.warning(f"Lost Sentinel subscription: {e}")
+                finally:
+                    pubsub.close()
+                if stop.is_set():
+                    return
+            stop.wait(retry_delay)
+            retry_delay = min(retry_delay * 2, 30.0)
+
+    def handle_message(self, message: Dict[str, Any]) -> None:
+        """Apply a ``+switch-master`` announcement.
+
+        The payload is ``<master> <old ip> <old port> <new ip> <new port>``.
+        """
+        data = message.get("data")
+        if isinstance(data, bytes):
+            data = data.decode("utf-8", errors="replace")
+        try:
+            service_name, _, _, host, port = str(data).split()
+            address = (host, int(port))
+        except ValueError:
+            return
+
+        with self._lock:
+            pools = [pool for pool in self._pools if pool.service_name == service_name]
+            if service_name not in self._masters and not pools:
+                return
+            self._masters[service_name] = address
+
+        logger.warning(f"Master {service_name} switched to {host}:{port}")
+        for pool in pools:
+            # Drops the idle connections to the old master
+            pool.get_master_address()
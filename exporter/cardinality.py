@@ -0,0 +1,81 @@
+import heapq
+import math
+import threading
+from typing import Dict, List, Optional, Set
+
+from exporter.discovery import compile_pattern
+
+
+class QueueLimiter:
+    """Per-db limit on the number of queues exported with their own series.
+
+    The ``limit`` longest queues of a db, found with a heap in
+    O(n log limit), keep exact series; the others are folded into one
+    remainder per db. Queues matching a pinned pattern are always
+    exported and do not count against the limit.
+
+    To stop queues of similar lengths from flapping in and out, ranks
+    around the limit are sticky. With a margin of ``hysteresis * limit``
+    ranks, rounded down and below ``limit``, the first ``limit - margin``
+    queues, at least the longest one, are always exported; the remaining
+    slots go first to queues already exported that still rank within
+    ``limit + margin``, then to the next queues by rank.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        pinned: Optional[List[str]] = None,
+        hysteresis: float = 0.1,
+    ) -> None:
+        """Initialize the limiter.
+
+        Args:
+            limit: Queues exported per db, besides pinned ones
+            pinned: Glob patterns, or regexes prefixed with ``re:``, of
+                queues always exported
+            hysteresis: Margin, as a fraction of ``limit``, within which
+                exported queues keep their series
+        """
+        self.limit = max(0, limit)
+        self._pinned = [compile_pattern(pattern) for pattern in pinned or []]
+        self._margin = min(
+            math.floor(self.limit * max(0.0, hysteresis)), max(0, self.limit - 1)
+        )
+        # Queues exported by the last selection of each db
+        self._selected: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def is_pinned(self, queue: str) -> bool:
+        """Whether a queue matches a pinned pattern."""
+        return any(matcher.match(queue) for matcher in self._pinned)
+
+    def select(self, db: int, lengths: Dict[str, int]) -> Set[str]:
+        """Select the queues of a db that keep their own series.
+
+        Args:
+            db: Db of the queues
+            lengths: Length of every queue of the db
+
+        Returns:
+            Names of the queues to export individually
+        """
+        pinned = {queue for queue in lengths if self.is_pinned(queue)}
+        # Ties are broken by name so the selection is deterministic
+        ranked = heapq.nlargest(
+            self.limit + self._margin,
+            (queue for queue in lengths if queue not in pinned),
+            key=lambda queue: (lengths[queue], queue),
+        )
+        with self._lock:
+            previous = self._selected.get(db, set())
+            selected = ranked[: max(0, self.limit - self._margin)]
+            boundary = ranked[len(selected) :]
+            for incumbent in (True, False):
+                for queue in boundary:
+                    if len(selected) >= self.limit:
+                        break
+                    if (queue in previous) == incumbent:
+                        selected.append(queue)
+            self._selected[db] = set(selected)
+        return pinned | set(selected)
@@ -0,0 +1,74 @@
+import threading
+import time
+from typing import Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Circuit breaker guarding the collection of one broker.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    collections are skipped, so an unreachable endpoint no longer costs a
+    socket timeout every cycle. Once ``reset_timeout`` has passed, a
+    single probe collection is let through: its success closes the
+    circuit, its failure opens it for another ``reset_timeout``.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0) -> None:
+        """Initialize a closed circuit.
+
+        Args:
+            failure_threshold: Consecutive failures opening the circuit
+            reset_timeout: Seconds the circuit stays open before a probe
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Current state: ``closed``, ``open`` or ``half_open``."""
+        return self._state
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        """Whether a collection may run now.
+
+        An open circuit past its reset timeout turns half-open and allows
+        this call only; others are refused until the probe is recorded.
+
+        Args:
+            now: Current time, defaults to ``time.monotonic()``
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful collection."""
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+
+    def record_failure(self, now: Optional[float] = None) -> None:
+        """Count a failed collection, opening the circuit when needed.
+
+        Args:
+            now: Current time, defaults to ``time.monotonic()``
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = now
@@ -1,11 +1,24 @@
 import logging
-from typing import Any, Dict, Iterable, List, Optional
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 from prometheus_client import Metric
-from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.core import GaugeMetricFamily, HistogramMetricFamily
 from prometheus_client.registry import Collector
+from prometheus_client.utils import floatToGoString
 
 from exporter.brokers import Broker, BrokerFactory
+from exporter.cardinality import QueueLimiter
+from exporter.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from exporter.discovery import QueueDiscovery
+from exporter.instrumentation import ExporterMetrics
+from exporter.models import Queue, Unacked
+from exporter.rates import RateEstimator
+from exporter.sampler import AgeSampler, TaskSampler
+from exporter.scheduler import AdaptiveScheduler
+from exporter.sharding import Shard
 from exporter.utils import parse_monitor_queues
 
 logger = logging.getLogger(__name__)
@@ -19,6 +32,23 @@ class CQCollector(Collector):
         broker_type: str,
         broker_config: Dict[str, Any],
         monitor_queues_config: str,
+        collection_concurrency: int = 1,
+        collection_timeout: Optional[float] = None,
+        discovery: Optional[QueueDiscovery] = None,
+        priority_steps: Optional[List[int]] = None,
+        priority_separator: str = "\x06\x16",
+        task_sampler: Optional[TaskSampler] = None,
+        age_sampler: Optional[AgeSampler] = None,
+        unacked_buckets: Optional[List[float]] = None,
+        visibility_timeout: float = 3600.0,
+        scheduler: Optional[AdaptiveScheduler] = None,
+        instrumentation: Optional[ExporterMetrics] = None,
+        circuit_failure_threshold: int = 0,
+        circuit_reset_timeout: float = 30.0,
+        executor: Optional[ThreadPoolExecutor] = None,
+        shard: Optional[Shard] = None,
+        queue_limiter: Optional[QueueLimiter] = None,
+        rate_estimator: Optional[RateEstimator] = None,
     ) -> None:
         """Initialize the collector.
 
@@ -26,23 +56,360 @@ class CQCollector(Collector):
             broker_type: Type of broker to use
             broker_config: Configuration for the broker connection
             monitor_queues_config: Configuration for the queues to monitor
+            collection_concurrency: Number of dbs collected in parallel
+            collection_timeout: Deadline in seconds for a collection cycle;
+                dbs that do not answer in time are reported as timed out.
+                None or 0 waits for every db.
+            discovery: Optional discovery of queues in addition to the
+                configured ones
+            priority_steps: Priority steps of the Celery Redis transport;
+                when set, every priority sub-queue is collected
+            priority_separator: Separator between queue name and priority
+                step in the transport's keys
+            task_sampler: Optional sampler estimating the backlog of each
+                queue per task name
+            age_sampler: Optional sampler estimating the oldest message
+                age and wait-time quantiles of each queue
+            unacked_buckets: Age histogram bounds in seconds of messages
+                reserved by workers; when set, unacked metrics are collected
+            visibility_timeout: Visibility timeout of the Celery transport,
+                reserved messages older than it are about to be redelivered
+            scheduler: Optional adaptive schedule; when set, each cycle
+                only polls the queues that are due and reports the last
+                known state of the others
+            instrumentation: Optional metrics recording the collector's
+                own cycle durations, broker latencies and errors
+            circuit_failure_threshold: Consecutive failed or timed out
+                collections of a db after which it is skipped and its
+                last known values are served as stale; 0 disables it
+            circuit_reset_timeout: Seconds a db is skipped before a probe
+                collection is attempted
+            executor: Optional worker pool shared with other collectors,
+                used instead of one sized by ``collection_concurrency``;
+                it is left running on ``close``
+            shard: Optional subset of the queues collected by this
+                replica; db-wide statistics are collected by the replica
+                owning the db
+            queue_limiter: Optional per-db limit on the queues exported
+                with their own series, the others are reported as one
+                remainder per db
+            rate_estimator: Optional estimator of the net rate, drain rate
+                and time to empty of each queue from its recent lengths
+
+        Raises:
+            ValueError: If discovery is set for a broker type that cannot
+                discover queues
         """
+        if discovery is not None and not BrokerFactory.supports_discovery(broker_type):
+            raise ValueError(f"Broker type {broker_type} does not support discovery")
         self._monitor_queues: Dict[int, List[str]] = parse_monitor_queues(
             monitor_queues_config
         )
+        self._discovery = discovery
+        self._priority_steps: List[int] = sorted(set(priority_steps or []))
+        self._priority_separator = priority_separator
+        self._task_sampler = task_sampler
+        self._age_sampler = age_sampler
+        self._unacked_buckets: List[float] = sorted(set(unacked_buckets or []))
+        self._visibility_timeout = visibility_timeout
+        # Unacked statistics of each db, from its last collection
+        self._unacked: Dict[int, Unacked] = {}
+        self._unacked_lock = threading.Lock()
+        self._scheduler = scheduler
+        self._shard = shard
+        self._queue_limiter = queue_limiter
+        self._rate_estimator = rate_estimator
+        # Number of queues of each db owned by this replica
+        self._shard_queues: Dict[int, int] = {}
+        self._instrumentation = instrumentation
+        # Last known state of every queue, per db, when polling adaptively
+        self._queues: Dict[int, Dict[str, Queue]] = {}
+        # Last successful collection of each db, served while it is failing
+        self._last_results: Dict[int, List[Queue]] = {}
+        self._last_success: Dict[int, float] = {}
+        if discovery is not None:
+            for db in discovery.dbs:
+                self._monitor_queues.setdefault(db, [])
         self._broker_type: str = broker_type
-        self._brokers: Dict[int, Optional[Broker]] = {}
+        # Pool shared by the brokers of every db, if any
+        self._shared_pool: Optional[Any] = None
+        self._brokers: Dict[int, Optional[Broker]] = self._create_brokers(broker_config)
+        self._circuits: Dict[int, CircuitBreaker] = {}
+        if circuit_failure_threshold > 0:
+            self._circuits = {
+                db: CircuitBreaker(circuit_failure_threshold, circuit_reset_timeout)
+                for db in self._brokers
+            }
+
+        # Bounded worker pool shared by all collection cycles
+        self._collection_timeout: Optional[float] = collection_timeout or None
+        self._owns_executor = executor is None
+        self._executor: Optional[ThreadPoolExecutor] = (
+            executor or self._create_executor(collection_concurrency)
+        )
+        # In-flight collection per db, kept across cycles so a db that is
+        # still busy is not queued a second time
+        self._pending: Dict[int, Future] = {}
+
+    def _create_brokers(
+        self, broker_config: Dict[str, Any]
+    ) -> Dict[int, Optional[Broker]]:
+        """Create and connect one broker per monitored db."""
+        broker_config = dict(broker_config)
+        max_connections = broker_config.pop("max_connections", None)
+        if broker_config.pop("shared_pool", False):
+            # One bounded pool for every db instead of one client per db
+            shared_pool = BrokerFactory.create_shared_pool(
+                self._broker_type, max_connections=max_connections, **broker_config
+            )
+            self._shared_pool = shared_pool
+            if shared_pool is None:
+                logger.warning(
+                    f"Broker type {self._broker_type} does not support a shared pool, "
+                    "using one connection per db"
+                )
+            else:
+                broker_config["connection_pool"] = shared_pool
+
+        brokers: Dict[int, Optional[Broker]] = {}
         for db, _ in self._monitor_queues.items():
             try:
                 broker_config["db"] = db
-                broker = BrokerFactory.create(broker_type, **broker_config)
+                broker = BrokerFactory.create(self._broker_type, **broker_config)
                 broker.connect()
-                self._brokers[db] = broker
+                brokers[db] = broker
             except Exception as e:
                 logger.error(
                     f"Failed to initialize broker for db {db}: {e}", exc_info=True
                 )
                 raise
+        return brokers
+
+    def _create_executor(
+        self, collection_concurrency: int
+    ) -> Optional[ThreadPoolExecutor]:
+        """Create the worker pool the dbs are collected on."""
+        return ThreadPoolExecutor(
+            max_workers=max(1, collection_concurrency),
+            thread_name_prefix="db-collector",
+        )
+
+    def _collect_db(self, db: int, queues: List[str]) -> List[Queue]:
+        """Collect queue lengths for a single db."""
+        broker = self._brokers[db]
+        if self._discovery is not None:
+            try:
+                self._discovery.step(db, broker)
+            except Exception as e:
+                logger.error(f"Error discovering queues in db {db}: {e}")
+            queues = sorted(set(queues) | self._discovery.queues(db))
+        if self._shard is not None:
+            queues = [queue for queue in queues if self._shard.owns(db, queue)]
+            self._shard_queues[db] = len(queues)
+        if self._rate_estimator is not None:
+            self._rate_estimator.forget(db, queues)
+        if self._task_sampler is not None:
+            self._task_sampler.prune(db, queues)
+
+        if self._scheduler is not None:
+            return self._collect_due(db, queues)
+        return self._collect_queues(db, queues)
+
+    def _collect_due(self, db: int, queues: List[str]) -> List[Queue]:
+        """Poll the due queues of a db and merge them into its last state."""
+        due = self._scheduler.due(db, queues)
+        known = self._queues.setdefault(db, {})
+        if due or self._unacked_buckets:
+            polled = self._collect_queues(db, due)
+            self._scheduler.update(db, {queue.name: queue.length for queue in polled})
+            known.update((queue.name, queue) for queue in polled)
+        for queue in set(known) - set(queues):
+            del known[queue]
+        return [known[queue] for queue in sorted(known)]
+
+    def _collect_queues(self, db: int, queues: List[str]) -> List[Queue]:
+        """Collect the stats of the given queues of a db."""
+        broker = self._brokers[db]
+        started = time.perf_counter()
+        result = broker.get_queue_details(queues)
+        unacked = None
+        if result is None:
+            collect_unacked = bool(self._unacked_buckets) and (
+                self._shard is None or self._shard.owns_db(db)
+            )
+            priorities, unacked = broker.get_db_stats(
+                queues,
+                self._priority_steps,
+                self._priority_separator,
+                age_buckets=self._unacked_buckets if collect_unacked else None,
+                visibility_timeout=self._visibility_timeout,
+            )
+            if not self._priority_steps:
+                lengths = {queue: steps[0] for queue, steps in priorities.items()}
+                result = self._build_queues(db, lengths)
+            else:
+                result = self._build_queues(db, priorities=priorities)
+        if self._instrumentation is not None:
+            self._instrumentation.broker_latency.labels(str(db)).observe(
+                time.perf_counter() - started
+            )
+        if unacked is not None:
+            with self._unacked_lock:
+                self._unacked[db] = unacked
+        if self._rate_estimator is not None:
+            self._rate_estimator.observe(
+                db, {queue.name: queue.length for queue in result}
+            )
+
+        if self._task_sampler is not None:
+            try:
+                breakdown = self._task_sampler.sample(
+                    db,
+                    broker,
+                    {queue.name: queue.length for queue in result},
+                    priorities={queue.name: queue.priorities for queue in result},
+                    separator=self._priority_separator,
+                )
+                for queue in result:
+                    queue.tasks = breakdown.get(queue.name, [])
+            except Exception as e:
+                logger.error(f"Error sampling tasks in db {db}: {e}")
+
+        if self._age_sampler is not None:
+            try:
+                ages = self._age_sampler.sample(
+                    db,
+                    broker,
+                    {queue.name: queue.length for queue in result},
+                    priorities={queue.name: queue.priorities for queue in result},
+                    separator=self._priority_separator,
+                )
+                for queue in result:
+                    queue.oldest_age, queue.wait_quantiles = ages.get(
+                        queue.name, (None, {})
+                    )
+            except Exception as e:
+                logger.error(f"Error sampling message ages in db {db}: {e}")
+        return result
+
+    @staticmethod
+    def _build_queues(
+        db: int,
+        lengths: Optional[Dict[str, int]] = None,
+        priorities: Optional[Dict[str, Dict[int, int]]] = None,
+    ) -> List[Queue]:
+        """Build queue models from plain or per-priority lengths."""
+        if priorities is None:
+            return [
+                Queue(name=queue, db=db, length=length)
+                for queue, length in (lengths or {}).items()
+            ]
+        return [
+            Queue(
+                name=queue,
+                db=db,
+                length=sum(per_priority.values()),
+                priorities=per_priority,
+            )
+            for queue, per_priority in priorities.items()
+        ]
+
+    def _collect_dbs(self) -> Tuple[Dict[int, List[Queue]], List[int]]:
+        """Collect every db on the worker pool within the cycle deadline.
+
+        Returns:
+            Queues of the dbs that finished in time, and the dbs that
+            missed the deadline
+        """
+        futures: Dict[Future, int] = {}
+        for db, queues in self._monitor_queues.items():
+            if not self._brokers.get(db):
+                continue
+            circuit = self._circuits.get(db)
+            future = self._pending.get(db)
+            if future is None or future.done():
+                if circuit is not None and not circuit.allow():
+                    continue
+                future = self._executor.submit(  # type: ignore[union-attr]
+                    self._collect_db, db, queues
+                )
+                self._pending[db] = future
+            elif circuit is not None and circuit.state == OPEN:
+                # Still stuck on an unreachable db, do not wait for it again
+                continue
+            futures[future] = db
+
+        done, not_done = wait(futures, timeout=self._collection_timeout)
+
+        results: Dict[int, List[Queue]] = {}
+        for future in done:
+            db = futures[future]
+            del self._pending[db]
+            try:
+                results[db] = future.result()
+            except Exception as e:
+                logger.error(f"Error collecting metrics for db {db}: {e}")
+                self._record_errors(db)
+                self._record_failure(db)
+            else:
+                self._last_results[db] = results[db]
+                self._last_success[db] = time.time()
+                if db in self._circuits:
+                    self._circuits[db].record_success()
+
+        timed_out = sorted(futures[future] for future in not_done)
+        for db in timed_out:
+            self._record_failure(db)
+        if timed_out:
+            logger.warning(
+                f"Collection of dbs {timed_out} did not finish within "
+                f"{self._collection_timeout}s"
+            )
+        return results, timed_out
+
+    def _record_failure(self, db: int) -> None:
+        """Count a failed collection against the circuit of a db."""
+        circuit = self._circuits.get(db)
+        if circuit is None:
+            return
+        previous = circuit.state
+        circuit.record_failure()
+        if previous != OPEN and circuit.state == OPEN:
+            logger.warning(
+                f"Circuit of db {db} opened, serving its last known values for "
+                f"{circuit.reset_timeout}s"
+            )
+
+    def _serve_stale(self, results: Dict[int, List[Queue]]) -> List[int]:
+        """Fill in the last known queues of dbs missing from the results.
+
+        Returns:
+            Dbs whose values are stale
+        """
+        stale = []
+        for db in self._brokers:
+            if db in results:
+                continue
+            stale.append(db)
+            if db in self._last_results:
+                results[db] = self._last_results[db]
+        return sorted(stale)
+
+    def close(self) -> None:
+        """Stop the worker pool and disconnect every broker and their pool."""
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(wait=False)
+        for broker in self._brokers.values():
+            if broker is not None:
+                broker.disconnect()
+        if self._shared_pool is not None:
+            BrokerFactory.close_shared_pool(self._broker_type, self._shared_pool)
+            self._shared_pool = None
+
+    def _record_errors(self, db: int) -> None:
+        """Count a failed collection of a db."""
+        if self._instrumentation is not None:
+            self._instrumentation.db_errors.labels(str(db)).inc()
 
     def collect(self) -> Iterable[Metric]:
         """Collect metrics from the broker.
@@ -57,31 +424,298 @@ class CQCollector(Collector):
             labels=["broker_type", "queue", "vdb"],
         )
 
+        # Queue length per priority step
+        celery_queue_priority_length_metric = GaugeMetricFamily(
+            "celery_queue_priority_length",
+            "Number of messages in the queue per priority step",
+            labels=["broker_type", "queue", "vdb", "priority"],
+        )
+
+        # Estimated queue backlog per task name
+        celery_queue_task_count_metric = GaugeMetricFamily(
+            "celery_queue_task_count",
+            "Estimated number of messages in the queue per task name",
+            labels=["broker_type", "queue", "vdb", "task"],
+        )
+
+        # Age of the oldest message and wait-time quantiles
+        celery_queue_oldest_message_age_metric = GaugeMetricFamily(
+            "celery_queue_oldest_message_age_seconds",
+            "Age of the oldest message in the queue",
+            labels=["broker_type", "queue", "vdb"],
+        )
+        celery_queue_wait_time_metric = GaugeMetricFamily(
+            "celery_queue_wait_time_seconds",
+            "Estimated time messages in the queue have been waiting",
+            labels=["broker_type", "queue", "vdb", "quantile"],
+        )
+
+        # Per-queue deliveries and consumers, from brokers that report them
+        celery_queue_unacked_messages_metric = GaugeMetricFamily(
+            "celery_queue_unacked_messages",
+            "Number of messages of the queue delivered and not acknowledged",
+            labels=["broker_type", "queue", "vdb"],
+        )
+        celery_queue_consumers_metric = GaugeMetricFamily(
+            "celery_queue_consumers",
+            "Number of consumers subscribed to the queue",
+            labels=["broker_type", "queue", "vdb"],
+        )
+
+        # Rates estimated from the recent lengths of each queue
+        celery_queue_net_rate_metric = GaugeMetricFamily(
+            "celery_queue_net_rate",
+            "Estimated change of the queue length per second",
+            labels=["broker_type", "queue", "vdb"],
+        )
+        celery_queue_drain_rate_metric = GaugeMetricFamily(
+            "celery_queue_drain_rate",
+            "Smoothed rate of queue length decreases per second",
+            labels=["broker_type", "queue", "vdb"],
+        )
+        celery_queue_time_to_empty_metric = GaugeMetricFamily(
+            "celery_queue_time_to_empty_seconds",
+            "Queue length divided by the opposite of its net rate, "
+            "+Inf while it is not shrinking",
+            labels=["broker_type", "queue", "vdb"],
+        )
+
+        # Messages reserved by workers and not acknowledged yet
+        celery_queue_unacked_metric = GaugeMetricFamily(
+            "celery_queue_unacked",
+            "Number of messages reserved by workers and not acknowledged",
+            labels=["broker_type", "vdb"],
+        )
+        celery_queue_unacked_age_metric = HistogramMetricFamily(
+            "celery_queue_unacked_age_seconds",
+            "Time since unacknowledged messages were reserved",
+            labels=["broker_type", "vdb"],
+        )
+        celery_queue_unacked_expired_metric = GaugeMetricFamily(
+            "celery_queue_unacked_expired",
+            "Number of unacknowledged messages past the visibility timeout",
+            labels=["broker_type", "vdb"],
+        )
+
+        # Queues folded into one remainder per db by the queue limit
+        celery_queue_other_count_metric = GaugeMetricFamily(
+            "celery_queue_other_count",
+            "Number of queues of the db beyond the queue limit",
+            labels=["broker_type", "vdb"],
+        )
+        celery_queue_other_length_metric = GaugeMetricFamily(
+            "celery_queue_other_length",
+            "Total number of messages in the queues beyond the queue limit",
+            labels=["broker_type", "vdb"],
+        )
+
+        # Broker connections per state
+        celery_exporter_broker_connections_metric = GaugeMetricFamily(
+            "celery_exporter_broker_connections",
+            "Number of broker connections per state",
+            labels=["broker_type", "vdb", "state"],
+        )
+
+        # Dbs that missed the collection deadline
+        celery_queue_collection_timeout_metric = GaugeMetricFamily(
+            "celery_queue_collection_timeout",
+            "Whether the db missed the collection deadline in the last cycle",
+            labels=["broker_type", "vdb"],
+        )
+
+        # Staleness of the values served for each db
+        celery_queue_stale_metric = GaugeMetricFamily(
+            "celery_queue_stale",
+            "Whether the db values are the last known ones, not from this cycle",
+            labels=["broker_type", "vdb"],
+        )
+        celery_queue_last_success_metric = GaugeMetricFamily(
+            "celery_queue_last_success_timestamp_seconds",
+            "Unix time of the last successful collection of the db",
+            labels=["broker_type", "vdb"],
+        )
+        # Queues collected by this replica when sharded
+        celery_exporter_shard_metric = GaugeMetricFamily(
+            "celery_exporter_shard",
+            "Shard of the queues collected by this exporter replica",
+            labels=["shard_index", "shard_count"],
+        )
+        celery_exporter_shard_queues_metric = GaugeMetricFamily(
+            "celery_exporter_shard_queues",
+            "Number of queues of the db owned by this exporter replica",
+            labels=["broker_type", "vdb"],
+        )
+        celery_exporter_circuit_state_metric = GaugeMetricFamily(
+            "celery_exporter_circuit_state",
+            "State of the circuit breaker of each db",
+            labels=["broker_type", "vdb", "state"],
+        )
+
         try:
-            # Collect metrics for each db
-            for db, queues in self._monitor_queues.items():
-                broker = self._brokers.get(db)
-                if not broker:
-                    continue
-                # Get list of all queues
-                # Collect metrics for each queue
-                for queue in queues:
-                    try:
-                        length = broker.get_queue_length(queue)
+            started = time.perf_counter()
+            results, timed_out = self._collect_dbs()
+            if self._instrumentation is not None:
+                self._instrumentation.collection_duration.observe(
+                    time.perf_counter() - started
+                )
+            stale = self._serve_stale(results) if self._circuits else []
+            estimates = (
+                self._rate_estimator.estimates()
+                if self._rate_estimator is not None
+                else {}
+            )
 
-                        # Queue length
-                        celery_queue_length_metric.add_metric(
-                            labels=[self._broker_type, queue, str(db)],
+            for db in sorted(results):
+                queues = results[db]
+                if self._queue_limiter is not None:
+                    selected = self._queue_limiter.select(
+                        db, {queue.name: queue.length for queue in queues}
+                    )
+                    other = [queue for queue in queues if queue.name not in selected]
+                    queues = [queue for queue in queues if queue.name in selected]
+                    labels = [self._broker_type, str(db)]
+                    celery_queue_other_count_metric.add_metric(labels, len(other))
+                    celery_queue_other_length_metric.add_metric(
+                        labels, sum(queue.length for queue in other)
+                    )
+                for queue in queues:
+                    # Queue length
+                    celery_queue_length_metric.add_metric(
+                        labels=[self._broker_type, queue.name, str(db)],
+                        value=queue.length,
+                    )
+                    for priority, length in queue.priorities.items():
+                        celery_queue_priority_length_metric.add_metric(
+                            labels=[
+                                self._broker_type,
+                                queue.name,
+                                str(db),
+                                str(priority),
+                            ],
                             value=length,
                         )
+                    for task in queue.tasks:
+                        celery_queue_task_count_metric.add_metric(
+                            labels=[self._broker_type, queue.name, str(db), task.name],
+                            value=task.count,
+                        )
+                    if queue.oldest_age is not None:
+                        celery_queue_oldest_message_age_metric.add_metric(
+                            labels=[self._broker_type, queue.name, str(db)],
+                            value=queue.oldest_age,
+                        )
+                    for q, wait_time in queue.wait_quantiles.items():
+                        celery_queue_wait_time_metric.add_metric(
+                            labels=[self._broker_type, queue.name, str(db), str(q)],
+                            value=wait_time,
+                        )
+                    if queue.unacked is not None:
+                        celery_queue_unacked_messages_metric.add_metric(
+                            labels=[self._broker_type, queue.name, str(db)],
+                            value=queue.unacked,
+                        )
+                    if queue.consumers is not None:
+                        celery_queue_consumers_metric.add_metric(
+                            labels=[self._broker_type, queue.name, str(db)],
+                            value=queue.consumers,
+                        )
+                    if (db, queue.name) in estimates:
+                        labels = [self._broker_type, queue.name, str(db)]
+                        rate, drain_rate, time_to_empty = estimates[db, queue.name]
+                        celery_queue_net_rate_metric.add_metric(labels, rate)
+                        celery_queue_drain_rate_metric.add_metric(labels, drain_rate)
+                        celery_queue_time_to_empty_metric.add_metric(
+                            labels, time_to_empty
+                        )
 
-                    except Exception as e:
-                        logger.error(
-                            f"Error collecting metrics for queue {queue} in db {db}: {e}"
+            with self._unacked_lock:
+                unacked_dbs = {
+                    db: self._unacked[db] for db in results if db in self._unacked
+                }
+            for db, unacked in sorted(unacked_dbs.items()):
+                labels = [self._broker_type, str(db)]
+                celery_queue_unacked_metric.add_metric(labels, unacked.count)
+                # No sum: ages are only known per bucket
+                celery_queue_unacked_age_metric.add_metric(
+                    labels,
+                    buckets=[
+                        (floatToGoString(bound), count)
+                        for bound, count in sorted(unacked.buckets.items())
+                    ],
+                    sum_value=None,
+                )
+                celery_queue_unacked_expired_metric.add_metric(labels, unacked.expired)
+
+            if self._instrumentation is not None:
+                for db, broker in self._brokers.items():
+                    for state, count in broker.connection_counts().items():
+                        celery_exporter_broker_connections_metric.add_metric(
+                            [self._broker_type, str(db), state], count
                         )
-                        continue
+
+            for db in self._brokers:
+                celery_queue_collection_timeout_metric.add_metric(
+                    labels=[self._broker_type, str(db)],
+                    value=1 if db in timed_out else 0,
+                )
 
             yield celery_queue_length_metric
+            if self._queue_limiter is not None:
+                yield celery_queue_other_count_metric
+                yield celery_queue_other_length_metric
+            if self._priority_steps:
+                yield celery_queue_priority_length_metric
+            if self._task_sampler is not None:
+                yield celery_queue_task_count_metric
+            if self._age_sampler is not None:
+                yield celery_queue_oldest_message_age_metric
+                yield celery_queue_wait_time_metric
+            if celery_queue_unacked_messages_metric.samples:
+                yield celery_queue_unacked_messages_metric
+            if celery_queue_consumers_metric.samples:
+                yield celery_queue_consumers_metric
+            if self._rate_estimator is not None:
+                yield celery_queue_net_rate_metric
+                yield celery_queue_drain_rate_metric
+                yield celery_queue_time_to_empty_metric
+            if self._unacked_buckets:
+                yield celery_queue_unacked_metric
+                yield celery_queue_unacked_age_metric
+                yield celery_queue_unacked_expired_metric
+            if self._circuits:
+                for db, circuit in sorted(self._circuits.items()):
+                    labels = [self._broker_type, str(db)]
+                    celery_queue_stale_metric.add_metric(
+                        labels, 1 if db in stale else 0
+                    )
+                    if db in self._last_success:
+                        celery_queue_last_success_metric.add_metric(
+                            labels, self._last_success[db]
+                        )
+                    for state in (CLOSED, OPEN, HALF_OPEN):
+                        celery_exporter_circuit_state_metric.add_metric(
+                            labels + [state], 1 if circuit.state == state else 0
+                        )
+
+            if self._shard is not None:
+                celery_exporter_shard_metric.add_metric(
+                    [str(self._shard.index), str(self._shard.count)], 1
+                )
+                for db, count in sorted(self._shard_queues.items()):
+                    celery_exporter_shard_queues_metric.add_metric(
+                        [self._broker_type, str(db)], count
+                    )
+
+            yield celery_queue_collection_timeout_metric
+            if self._shard is not None:
+                yield celery_exporter_shard_metric
+                yield celery_exporter_shard_queues_metric
+            if self._circuits:
+                yield celery_queue_stale_metric
+                yield celery_queue_last_success_metric
+                yield celery_exporter_circuit_state_metric
+            if self._instrumentation is not None:
+                yield celery_exporter_broker_connections_metric
 
         except Exception as e:
             logger.error(f"Error collecting queue metrics: {e}")
@@ -11,7 +11,42 @@ class DefaultConfig:
     HOST = "0.0.0.0"
     PORT = 9726
     POLLING_INTERVAL = 30
+    COLLECT_ON_SCRAPE = False
+    SCRAPE_CACHE_TTL = 5.0
+    ADAPTIVE_POLLING = False
+    POLLING_MIN_INTERVAL = 5.0
+    POLLING_MAX_INTERVAL = 300.0
     MONITOR_QUEUES = "0:celery"
+    ENGINE = "sync"
+    PRIORITY_STEPS = ""
+    PRIORITY_SEPARATOR = "\\x06\\x16"
+    TASK_SAMPLE_SIZE = 0
+    TASK_SAMPLE_BYTE_BUDGET = 1024 * 1024
+    AGE_SAMPLE_SIZE = 0
+    AGE_TIMESTAMP_HEADER = None
+    UNACKED_AGE_BUCKETS = ""
+    VISIBILITY_TIMEOUT = 3600.0
+    DISCOVERY_PATTERNS = None
+    DISCOVERY_USE_BINDINGS = False
+    DISCOVERY_INTERVAL = 300.0
+    DISCOVERY_SCAN_COUNT = 1000
+    DISCOVERY_EVICTION_GRACE = 3600.0
+    COLLECTION_CONCURRENCY = 1
+    COLLECTION_TIMEOUT = 0.0
+    CIRCUIT_FAILURE_THRESHOLD = 0
+    CIRCUIT_RESET_TIMEOUT = 30.0
+    HISTORY_RETENTION = 0
+    HISTORY_MAX_QUEUES = 10000
+    RATE_WINDOW = 0
+    RATE_SMOOTHING = 0.3
+    QUEUE_LIMIT = 0
+    QUEUE_LIMIT_PINNED = None
+    QUEUE_LIMIT_HYSTERESIS = 0.1
+    SHARD_INDEX = 0
+    SHARD_COUNT = 1
+    TARGETS_FILE = None
+    PROBE_MAX_WORKERS = 8
+    PROBE_IDLE_TIMEOUT = 300.0
     LOG_LEVEL = "INFO"
     LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
     LOG_DATEFMT = "%Y-%m-%d %H:%M:%S"
@@ -19,11 +54,20 @@ class DefaultConfig:
     BROKER_HOST = "localhost"
     BROKER_PORT = 6379
     BROKER_PASSWORD = None
+    BROKER_USERNAME = "guest"
+    BROKER_VHOST = "/"
+    BROKER_USE_SSL = False
     BROKER_SOCKET_TIMEOUT = 5.0
     BROKER_USE_SENTINEL = False
     BROKER_SENTINEL_HOSTS = None
     BROKER_SENTINEL_MASTER_NAME = None
     BROKER_SENTINEL_PASSWORD = None
+    BROKER_CLUSTER_NODES = None
+    BROKER_CLUSTER_MAX_WORKERS = 8
+    BROKER_PIPELINE_CHUNK_SIZE = 500
+    BROKER_SHARED_POOL = False
+    BROKER_MAX_CONNECTIONS = 4
+    BROKER_USE_SCRIPTS = False
 
 
 class Settings(BaseSettings):
@@ -37,7 +81,42 @@ class Settings(BaseSettings):
     host: str
     port: int
     polling_interval: int
+    collect_on_scrape: bool
+    scrape_cache_ttl: float
+    adaptive_polling: bool
+    polling_min_interval: float
+    polling_max_interval: float
     monitor_queues: str
+    engine: str
+    priority_steps: str
+    priority_separator: str
+    task_sample_size: int
+    task_sample_byte_budget: int
+    age_sample_size: int
+    age_timestamp_header: Optional[str] = None
+    unacked_age_buckets: str
+    visibility_timeout: float
+    discovery_patterns: Optional[str] = None
+    discovery_use_bindings: bool
+    discovery_interval: float
+    discovery_scan_count: int
+    discovery_eviction_grace: float
+    collection_concurrency: int
+    collection_timeout: float
+    circuit_failure_threshold: int
+    circuit_reset_timeout: float
+    history_retention: int
+    history_max_queues: int
+    rate_window: int
+    rate_smoothing: float
+    queue_limit: int
+    queue_limit_pinned: Optional[str] = None
+    queue_limit_hysteresis: float
+    shard_index: int
+    shard_count: int
+    targets_file: Optional[str] = None
+    probe_max_workers: int
+    probe_idle_timeout: float
     log_level: str
     log_format: str
     log_datefmt: str
@@ -45,8 +124,17 @@ class Settings(BaseSettings):
     broker_host: str
     broker_port: int
     broker_password: Optional[str] = None
+    broker_username: str
+    broker_vhost: str
+    broker_use_ssl: bool
     broker_socket_timeout: float
     broker_use_sentinel: bool
     broker_sentinel_hosts: Optional[str] = None
     broker_sentinel_master_name: Optional[str] = None
     broker_sentinel_password: Optional[str] = None
+    broker_cluster_nodes: Optional[str] = None
+    broker_cluster_max_workers: int
+    broker_pipeline_chunk_size: int
+    broker_shared_pool: bool
+    broker_max_connections: int
+    broker_use_scripts: bool
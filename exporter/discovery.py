@@ -0,0 +1,187 @@
+import fnmatch
+import logging
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Pattern, Set
+
+from exporter.brokers import RedisBroker
+
+logger = logging.getLogger(__name__)
+
+# Prefix of the sets kombu's Redis transport keeps its exchange bindings in
+KOMBU_BINDING_PREFIX = "_kombu.binding."
+# Prefix marking a discovery pattern as a regular expression
+REGEX_PREFIX = "re:"
+
+
+def compile_pattern(pattern: str) -> Pattern[str]:
+    """Compile a discovery pattern.
+
+    Patterns are shell-style globs (``celery*``) unless prefixed with
+    ``re:``, in which case the rest is a regular expression matched
+    against the start of the queue name.
+    """
+    if pattern.startswith(REGEX_PREFIX):
+        return re.compile(pattern[len(REGEX_PREFIX) :])
+    return re.compile(fnmatch.translate(pattern))
+
+
+class _DBDiscovery:
+    """Discovery state of a single db."""
+
+    def __init__(self, patterns: List[str]) -> None:
+        self.patterns = patterns
+        self.matchers = [compile_pattern(pattern) for pattern in patterns]
+        # A single glob can be pushed down to SCAN MATCH
+        self.scan_match: Optional[str] = None
+        if len(patterns) == 1 and not patterns[0].startswith(REGEX_PREFIX):
+            self.scan_match = patterns[0]
+
+        # Published queue names, replaced at the end of every pass
+        self.queues: Set[str] = set()
+        # Queue names found so far by the pass in progress
+        self.found: Set[str] = set()
+        # Time each published queue was last found
+        self.last_seen: Dict[str, float] = {}
+        # Cursor of each source, None once the source finished its pass
+        self.cursors: Dict[str, Optional[int]] = {}
+        self.next_pass_at: float = 0.0
+
+
+class QueueDiscovery:
+    """Incremental discovery of Celery queues in Redis.
+
+    Queues are found from kombu's ``_kombu.binding.*`` sets and from list
+    keys matching glob or regex patterns. Both sources walk the keyspace
+    with SCAN, one ``scan_count`` step per collection cycle, so a pass
+    over a large keyspace is spread across cycles instead of blocking
+    Redis like KEYS would.
+
+    Names found during a pass are added to the cache straight away. When
+    the pass completes, queues the pass did not find are evicted once
+    they have not been found for ``eviction_grace`` seconds. kombu
+    deletes the list of a queue that drains, so a queue idle for less
+    than the grace period keeps being collected, with a length of 0. The
+    next pass starts ``refresh_interval`` seconds later, so discovery
+    runs on a slower cadence than length collection.
+    """
+
+    def __init__(
+        self,
+        patterns: Dict[int, List[str]],
+        use_bindings: bool = False,
+        refresh_interval: float = 300.0,
+        scan_count: int = 1000,
+        binding_separator: str = "\x06\x16",
+        eviction_grace: float = 3600.0,
+    ) -> None:
+        """Initialize queue discovery.
+
+        Args:
+            patterns: Queue name patterns per db, as parsed by
+                ``parse_discovery_patterns``
+            use_bindings: Discover queues bound in ``_kombu.binding.*``
+            refresh_interval: Seconds between the start of two passes
+            scan_count: COUNT hint of each SCAN step
+            binding_separator: Separator of kombu binding members
+            eviction_grace: Seconds a queue that is no longer found, e.g.
+                an empty queue whose list kombu deleted, is still collected
+        """
+        self._use_bindings = use_bindings
+        self._refresh_interval = refresh_interval
+        self._scan_count = scan_count
+        self._binding_separator = binding_separator
+        self._eviction_grace = eviction_grace
+        self._dbs: Dict[int, _DBDiscovery] = {
+            db: _DBDiscovery(db_patterns) for db, db_patterns in patterns.items()
+        }
+        self._lock = threading.Lock()
+
+    @property
+    def dbs(self) -> List[int]:
+        """Dbs with discovery patterns."""
+        return sorted(self._dbs)
+
+    def queues(self, db: int) -> Set[str]:
+        """Get the cached queue names discovered in a db."""
+        state = self._dbs.get(db)
+        if state is None:
+            return set()
+        return set(state.queues)
+
+    def _state(self, db: int) -> _DBDiscovery:
+        with self._lock:
+            if db not in self._dbs:
+                # Dbs without patterns still get their kombu bindings
+                self._dbs[db] = _DBDiscovery([])
+            return self._dbs[db]
+
+    def step(self, db: int, broker: RedisBroker, now: Optional[float] = None) -> None:
+        """Advance the discovery pass of a db by one SCAN step per source.
+
+        Args:
+            db: Db the broker is connected to
+            broker: Broker to scan with
+            now: Current time, defaults to ``time.monotonic()``
+        """
+        now = time.monotonic() if now is None else now
+        state = self._state(db)
+
+        if not state.cursors:
+            if now < state.next_pass_at:
+                return
+            # Start a new pass
+            state.found = set()
+            if state.matchers:
+                state.cursors["patterns"] = 0
+            if self._use_bindings:
+                state.cursors["bindings"] = 0
+            if not state.cursors:
+                return
+
+        if state.cursors.get("patterns") is not None:
+            cursor, keys = broker.scan_keys(
+                state.cursors["patterns"],
+                match=state.scan_match,
+                count=self._scan_count,
+                key_type="list",
+            )
+            for key in keys:
+                if any(matcher.match(key) for matcher in state.matchers):
+                    state.found.add(key)
+            state.cursors["patterns"] = cursor or None
+
+        if state.cursors.get("bindings") is not None:
+            cursor, keys = broker.scan_keys(
+                state.cursors["bindings"],
+                match=f"{KOMBU_BINDING_PREFIX}*",
+                count=self._scan_count,
+                key_type="set",
+            )
+            state.found |= broker.get_kombu_binding_queues(
+                keys, separator=self._binding_separator
+            )
+            state.cursors["bindings"] = cursor or None
+
+        for queue in state.found:
+            state.last_seen[queue] = now
+        if any(cursor is not None for cursor in state.cursors.values()):
+            # Pass in progress: expose new queues without evicting yet
+            state.queues = state.queues | state.found
+            return
+
+        # Pass complete: evict the queues not found for the grace period
+        evicted = {
+            queue
+            for queue in state.queues - state.found
+            if now - state.last_seen.get(queue, now) >= self._eviction_grace
+        }
+        if evicted:
+            logger.info(f"Evicting vanished queues in db {db}: {sorted(evicted)}")
+            for queue in evicted:
+                state.last_seen.pop(queue, None)
+        state.queues = (state.queues | state.found) - evicted
+        state.found = set()
+        state.cursors = {}
+        state.next_pass_at = now + self._refresh_interval
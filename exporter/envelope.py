@@ -0,0 +1,81 @@
+"""Cheap parsing of Celery message envelopes stored by kombu in Redis."""
+
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+# kombu's Redis transport base64-encodes message bodies, so the only
+# "headers" key in the raw envelope is the one holding Celery's headers
+_HEADERS_KEY = re.compile(rb'"headers"\s*:\s*')
+_decoder = json.JSONDecoder()
+
+
+def parse_headers(raw: bytes) -> Dict[str, Any]:
+    """Parse the ``headers`` object of a Celery envelope.
+
+    Only the headers object is decoded, the (possibly large) body is
+    skipped. Falls back to decoding the whole envelope if the headers
+    cannot be located.
+
+    Args:
+        raw: Message as stored in the Redis list
+
+    Returns:
+        Celery headers of the message, empty if they cannot be parsed
+    """
+    match = _HEADERS_KEY.search(raw)
+    if match is not None:
+        try:
+            headers, _ = _decoder.raw_decode(raw[match.end() :].decode("utf-8"))
+            if isinstance(headers, dict):
+                return headers
+        except ValueError:
+            pass
+    try:
+        headers = json.loads(raw).get("headers")
+    except (ValueError, AttributeError):
+        return {}
+    return headers if isinstance(headers, dict) else {}
+
+
+class HeaderCache:
+    """Bounded LRU cache of parsed message headers.
+
+    Entries are keyed by the length and hash of the raw message rather
+    than the message itself, so the cache never holds message bodies.
+    Only the header fields in ``fields`` are retained.
+    """
+
+    def __init__(self, fields: Tuple[str, ...], maxsize: int = 10000) -> None:
+        """Initialize the cache.
+
+        Args:
+            fields: Header fields to keep for each message
+            maxsize: Maximum number of messages kept in the cache
+        """
+        self._fields = fields
+        self._maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, raw: bytes) -> Dict[str, Any]:
+        """Get the cached header fields of a message, parsing it on a miss."""
+        key = (len(raw), hash(raw))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        headers = parse_headers(raw)
+        entry = {field: headers.get(field) for field in self._fields}
+        with self._lock:
+            self._entries[key] = entry
+            if len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+        return entry
@@ -1,30 +1,154 @@
+import json
 import logging
 import socket
 import threading
 import time
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
 
-from prometheus_client import generate_latest
+from exporter.history import QueueHistory
+from exporter.instrumentation import ExporterMetrics
+from exporter.probe import TargetPool
+from exporter.scheduler import AdaptiveScheduler
+from exporter.snapshot import Snapshot
 
 logger = logging.getLogger(__package__)
 
+# Shortest wait between two collections when polling adaptively
+MIN_COLLECTION_DELAY = 0.1
+
+
+def accepts(header: str, media: str) -> bool:
+    """Check if an Accept or Accept-Encoding header allows a media or coding.
+
+    Args:
+        header: Value of the request header, e.g. ``gzip;q=0.8, br``
+        media: Media type or content coding to look for
+
+    Returns:
+        True if the value is listed without ``q=0``
+    """
+    for item in header.split(","):
+        value, *params = (part.strip() for part in item.split(";"))
+        if value.lower() != media:
+            continue
+        for param in params:
+            name, _, quality = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    return float(quality) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
 
 class MetricsHandler(BaseHTTPRequestHandler):
     def do_GET(self) -> None:
-        if self.path == "/metrics":
-            # Get metrics from server instance
-            metrics_server = self.server.metrics_server  # type: Exporter
-            with metrics_server.lock:
-                metrics = metrics_server.metrics
-
-            self.send_response(200)
-            self.send_header("Content-Type", "text/plain; version=0.0.4")
-            self.end_headers()
-            self.wfile.write(metrics)
+        url = urlsplit(self.path)
+        # Get metrics from server instance
+        metrics_server = self.server.metrics_server  # type: Exporter
+        if url.path == "/metrics":
+            started = time.perf_counter()
+            self._send_snapshot(metrics_server.get_snapshot())
+        elif url.path == "/api/history" and metrics_server.history is not None:
+            self._send_history(metrics_server.history, parse_qs(url.query))
+            return
+        elif url.path == "/probe" and metrics_server.targets is not None:
+            started = time.perf_counter()
+            target = parse_qs(url.query).get("target", [""])[0]
+            if not target:
+                self._send_error(400, "Missing target parameter")
+                return
+            try:
+                snapshot = metrics_server.targets.get_snapshot(target)
+            except KeyError:
+                self._send_error(404, f"Unknown target {target}")
+                return
+            except Exception as e:
+                logger.error(f"Error probing target {target}: {e}")
+                self._send_error(503, f"Error probing target {target}")
+                return
+            self._send_snapshot(snapshot)
         else:
-            self.send_response(404)
+            self._send_error(404, "Not Found")
+            return
+
+        instrumentation = metrics_server.instrumentation
+        if instrumentation is not None:
+            instrumentation.scrape_duration.observe(time.perf_counter() - started)
+
+    def _send_snapshot(self, snapshot: Snapshot) -> None:
+        """Answer with a snapshot, negotiating its format and encoding."""
+        openmetrics = accepts(
+            self.headers.get("Accept", ""), "application/openmetrics-text"
+        )
+        compressed = accepts(self.headers.get("Accept-Encoding", ""), "gzip")
+        etag = snapshot.etag(openmetrics, compressed)
+
+        if etag in {
+            tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")
+        }:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Vary", "Accept, Accept-Encoding")
             self.end_headers()
-            self.wfile.write(b"Not Found")
+            return
+
+        body = snapshot.body(openmetrics, compressed)
+        age = snapshot.age()
+        self.send_response(200)
+        self.send_header("Age", str(int(age)))
+        self.send_header("X-Snapshot-Age", f"{age:.3f}")
+        self.send_header("Content-Type", snapshot.content_type(openmetrics))
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Vary", "Accept, Accept-Encoding")
+        if compressed:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+        instrumentation = self.server.metrics_server.instrumentation
+        if instrumentation is not None:
+            instrumentation.response_bytes.labels(
+                "gzip" if compressed else "identity"
+            ).inc(len(body))
+
+    def _send_history(
+        self, history: QueueHistory, params: Dict[str, List[str]]
+    ) -> None:
+        """Answer with the recent lengths of a queue as JSON."""
+        try:
+            db = int(params["db"][0])
+            queue = params["queue"][0]
+            since = float(params.get("since", ["0"])[0])
+        except (KeyError, ValueError):
+            self._send_error(400, "db and queue are required, since is a Unix time")
+            return
+        samples = history.query(db, queue, since)
+        if samples is None:
+            self._send_error(404, f"No history for queue {queue} in db {db}")
+            return
+
+        body = json.dumps(
+            {"db": db, "queue": queue, "samples": [list(s) for s in samples]}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str) -> None:
+        body = message.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
 
     def log_message(self, format: str, *args) -> None:
         """
@@ -33,16 +157,62 @@ class MetricsHandler(BaseHTTPRequestHandler):
         pass
 
 
+class MetricsServer(ThreadingHTTPServer):
+    """HTTP server answering every request on its own thread."""
+
+    daemon_threads = True
+
+
 class Exporter:
-    def __init__(self, registry, polling_interval: int) -> None:
+    def __init__(
+        self,
+        registry,
+        polling_interval: int,
+        scheduler: Optional[AdaptiveScheduler] = None,
+        collect_on_scrape: bool = False,
+        scrape_cache_ttl: float = 5.0,
+        instrumentation: Optional[ExporterMetrics] = None,
+        targets: Optional[TargetPool] = None,
+        history: Optional[QueueHistory] = None,
+    ) -> None:
         """
         Initialize the Exporter.
+
+        Args:
+            registry: Registry to collect snapshots from
+            polling_interval: Seconds between two collections
+            scheduler: Optional adaptive schedule shared with the collector;
+                when set, collections run when the next queue is due
+                instead of every ``polling_interval``
+            collect_on_scrape: Collect when metrics are requested instead
+                of on a background timer
+            scrape_cache_ttl: Seconds a snapshot collected on scrape is
+                served before the next scrape collects again
+            instrumentation: Optional metrics recording scrape latency,
+                bytes served and snapshot timestamp
+            targets: Optional brokers collected on demand and served from
+                ``/probe?target=<name>``
+            history: Optional store of the recent queue lengths of every
+                collection, served from ``/api/history``
         """
         self.registry = registry
         self.polling_interval = polling_interval
+        self.scheduler = scheduler
+        self.collect_on_scrape = collect_on_scrape
+        self.scrape_cache_ttl = scrape_cache_ttl
+        self.targets = targets
+        self.history = history
 
-        self.metrics = b""
+        # Latest collection. Snapshots are immutable and built off-lock;
+        # the lock only guards swapping in the next one.
+        self.snapshot = Snapshot.empty()
         self.lock = threading.Lock()
+        # Collection on scrape: expiry of the snapshot, and the collection
+        # in flight that concurrent scrapes wait on
+        self._expires_at = 0.0
+        self._in_flight: Optional[Future] = None
+
+        self.instrumentation = instrumentation
 
         self._http_server = None
         self._collection_thread = None
@@ -51,18 +221,32 @@ class Exporter:
     def start_collection_thread(self) -> None:
         """
         Start the collection thread that periodically updates metrics.
+
+        With probe targets, the thread also closes the connections of
+        targets no longer probed, even when no probe comes in.
         """
 
         def collect_metrics():
             while True:
                 try:
+                    # Collect off-lock, scrapes keep the previous snapshot
+                    snapshot = self._collect_snapshot()
                     with self.lock:
-                        self.metrics = generate_latest(self.registry)
+                        self.snapshot = snapshot
+                    self._record_history(snapshot)
                 except Exception as e:
                     logger.error(
                         f"There was an error collecting metrics: {e}", exc_info=True
                     )
-                time.sleep(self.polling_interval)
+                if self.targets is not None:
+                    try:
+                        self.targets.evict_idle()
+                    except Exception as e:
+                        logger.error(
+                            f"There was an error closing idle targets: {e}",
+                            exc_info=True,
+                        )
+                time.sleep(self._next_collection_delay())
 
         self._collection_thread = threading.Thread(
             target=collect_metrics, daemon=True, name="metrics-collector"
@@ -70,6 +254,71 @@ class Exporter:
         logger.info("Start metrics collection thread...")
         self._collection_thread.start()
 
+    def get_snapshot(self) -> Snapshot:
+        """Get the snapshot to serve a scrape from.
+
+        When collecting on scrape, an expired snapshot is replaced by a new
+        collection. Only one collection runs at a time: scrapes arriving
+        while it is in flight wait for its result instead of starting their
+        own, so concurrent scrapers do not multiply broker load.
+        """
+        with self.lock:
+            if not self.collect_on_scrape or time.monotonic() < self._expires_at:
+                return self.snapshot
+            in_flight = self._in_flight
+            leader = in_flight is None
+            if leader:
+                in_flight = self._in_flight = Future()
+
+        if not leader:
+            return in_flight.result()
+
+        snapshot = None
+        try:
+            snapshot = self._collect_snapshot()
+            self._record_history(snapshot)
+        except Exception as e:
+            logger.error(f"There was an error collecting metrics: {e}", exc_info=True)
+        with self.lock:
+            if snapshot is not None:
+                self.snapshot = snapshot
+                self._expires_at = time.monotonic() + self.scrape_cache_ttl
+            else:
+                # Serve the previous snapshot, the next scrape retries
+                snapshot = self.snapshot
+            self._in_flight = None
+        in_flight.set_result(snapshot)
+        return snapshot
+
+    def _collect_snapshot(self) -> Snapshot:
+        """Collect the registry into a new snapshot.
+
+        The snapshot timestamp is set first, so it is collected into the
+        snapshot it dates: served data is ``time() - timestamp`` old.
+        """
+        if self.instrumentation is not None:
+            self.instrumentation.snapshot_timestamp.set(time.time())
+        return Snapshot.from_registry(self.registry)
+
+    def _record_history(self, snapshot: Snapshot) -> None:
+        """Add the queue lengths of a new snapshot to the history."""
+        if self.history is None:
+            return
+        lengths = {
+            (int(sample.labels["vdb"]), sample.labels["queue"]): sample.value
+            for metric in snapshot.metrics
+            if metric.name == "celery_queue_length"
+            for sample in metric.samples
+        }
+        self.history.record(lengths, now=snapshot.created_at)
+
+    def _next_collection_delay(self) -> float:
+        """Seconds to wait before the next collection."""
+        if self.scheduler is None:
+            return self.polling_interval
+        # Floor the delay so a backlog of due queues cannot spin the loop
+        return max(MIN_COLLECTION_DELAY, self.scheduler.time_until_due())
+
     def serve_metrics(self, host: str, port: int) -> None:
         """
         Start the HTTP server to serve metrics
@@ -83,12 +332,13 @@ class Exporter:
             ValueError: If port is not in valid range
             OSError: If server cannot bind to the specified host:port
         """
-        # Start the collection thread
-        self.start_collection_thread()
+        # Start the collection thread, unless scrapes trigger collections
+        if not self.collect_on_scrape:
+            self.start_collection_thread()
 
         try:
             # Create HTTP server
-            self._http_server = HTTPServer((host, port), MetricsHandler)
+            self._http_server = MetricsServer((host, port), MetricsHandler)
             # Add reference to this instance so handler can access metrics
             self._http_server.metrics_server = self  # type: ignore
 
@@ -119,6 +369,9 @@ class Exporter:
             finally:
                 self._http_server = None
 
+        if self.targets is not None:
+            self.targets.close()
+
         # Clear thread reference
         self._collection_thread = None
 
@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from exporter.ringbuffer import SLOT_OVERHEAD, RingBuffers
+
+logger = logging.getLogger(__name__)
+
+
+class QueueHistory:
+    """Last lengths of every queue, kept in memory for quick lookups.
+
+    Each (db, queue) has a fixed ring of ``retention`` samples in shared
+    typed arrays, see ``RingBuffers``, found through a dict index kept
+    in update order. At most ``max_queues`` queues are kept: when full, a
+    new queue replaces the one updated least recently, in O(1). The
+    samples therefore never take more than ``memory_ceiling`` bytes; the
+    index and the queue names come on top, in proportion to the number
+    and length of the names.
+    """
+
+    def __init__(self, retention: int = 120, max_queues: int = 10000) -> None:
+        """Initialize an empty history.
+
+        Args:
+            retention: Samples kept per queue; at one sample per collection,
+                the window covers ``retention`` polling intervals
+            max_queues: Maximum number of queues kept
+        """
+        self.retention = max(1, retention)
+        self.max_queues = max(1, max_queues)
+        self._rings = RingBuffers(self.retention)
+        self._lock = threading.Lock()
+
+    @property
+    def memory_ceiling(self) -> int:
+        """Most bytes the samples and their state can take.
+
+        The index entries and the (db, queue) keys are not included.
+        """
+        return self.max_queues * (16 * self.retention + SLOT_OVERHEAD)
+
+    def record(
+        self, lengths: Dict[Tuple[int, str], float], now: Optional[float] = None
+    ) -> None:
+        """Record the lengths of queues collected at the same time.
+
+        Args:
+            lengths: Length of each queue by (db, queue)
+            now: Unix time of the collection, defaults to ``time.time()``
+        """
+        now = time.time() if now is None else now
+        rings = self._rings
+        with self._lock:
+            for key, length in lengths.items():
+                if key not in rings.slots and len(rings) >= self.max_queues:
+                    # The first key is the one updated least recently
+                    rings.release(next(iter(rings.slots)))
+                slot, _ = rings.slot(key)
+                rings.slots.move_to_end(key)
+                rings.append(slot, now, length)
+
+    def query(
+        self, db: int, queue: str, since: float = 0.0
+    ) -> Optional[List[Tuple[float, float]]]:
+        """Get the samples of a queue.
+
+        Args:
+            db: Db of the queue
+            queue: Name of the queue
+            since: Only return samples taken after this Unix time
+
+        Returns:
+            (time, length) samples, oldest first, or None if the queue has
+            no history
+        """
+        rings = self._rings
+        with self._lock:
+            slot = rings.slots.get((db, queue))
+            if slot is None:
+                return None
+            return [
+                (rings.times[position], rings.values[position])
+                for position in rings.positions(slot)
+                if rings.times[position] > since
+            ]
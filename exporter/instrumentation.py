@@ -0,0 +1,70 @@
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram
+
+# Buckets from sub-millisecond Redis round-trips to cycles at the deadline
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class ExporterMetrics:
+    """Metrics about the exporter itself.
+
+    Every recording is a lock-protected increment of a counter or
+    histogram bucket, cheap enough to stay enabled permanently.
+    """
+
+    def __init__(self, registry: CollectorRegistry = REGISTRY) -> None:
+        """Create the metrics and register them.
+
+        Args:
+            registry: Registry to register the metrics with
+        """
+        self.collection_duration = Histogram(
+            "celery_exporter_collection_duration_seconds",
+            "Duration of a collection cycle over every db",
+            buckets=LATENCY_BUCKETS,
+            registry=registry,
+        )
+        self.broker_latency = Histogram(
+            "celery_exporter_broker_latency_seconds",
+            "Duration of the batched broker round-trips collecting a db",
+            ["vdb"],
+            buckets=LATENCY_BUCKETS,
+            registry=registry,
+        )
+        self.db_errors = Counter(
+            "celery_exporter_db_errors",
+            "Number of failed collections per db",
+            ["vdb"],
+            registry=registry,
+        )
+        self.scrape_duration = Histogram(
+            "celery_exporter_scrape_duration_seconds",
+            "Duration of handling a metrics request",
+            buckets=LATENCY_BUCKETS,
+            registry=registry,
+        )
+        self.response_bytes = Counter(
+            "celery_exporter_response_bytes",
+            "Number of metrics payload bytes served per content coding",
+            ["encoding"],
+            registry=registry,
+        )
+        self.snapshot_timestamp = Gauge(
+            "celery_exporter_snapshot_timestamp_seconds",
+            "Unix time the collection of the served snapshot started",
+            registry=registry,
+        )
@@ -1,3 +1,5 @@
+from typing import Any, Dict, List, Optional
+
 from pydantic import BaseModel
 
 
@@ -10,3 +12,36 @@ class Queue(BaseModel):
     name: str
     db: int
     length: int
+    # Messages per priority step, empty unless priority steps are configured
+    priorities: Dict[int, int] = {}
+    # Estimated messages per task name, empty unless sampling is enabled
+    tasks: List[Task] = []
+    # Age in seconds of the oldest message, None unless ages are sampled
+    oldest_age: Optional[float] = None
+    # Estimated wait time in seconds per quantile
+    wait_quantiles: Dict[float, float] = {}
+    # Messages delivered and not acknowledged, None unless the broker
+    # tracks them per queue
+    unacked: Optional[int] = None
+    # Consumers subscribed to the queue, None unless the broker reports them
+    consumers: Optional[int] = None
+
+
+class Unacked(BaseModel):
+    db: int
+    # Messages reserved by workers and not acknowledged yet
+    count: int
+    # Reserved messages at most as old as each bucket bound, in seconds;
+    # +Inf holds every message in the unacked index
+    buckets: Dict[float, int]
+    # Reserved messages older than the visibility timeout
+    expired: int
+
+
+class ProbeTarget(BaseModel):
+    # Broker type, as accepted by --broker-type
+    broker_type: str = "redis"
+    # Queues to monitor, e.g. '0:celery;1:tasks'
+    monitor_queues: str = "0:celery"
+    # Broker connection settings, e.g. host, port and password
+    broker: Dict[str, Any] = {}
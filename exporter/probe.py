@@ -0,0 +1,184 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import CollectorRegistry
+
+from exporter.collector import CQCollector
+from exporter.models import ProbeTarget
+from exporter.snapshot import Snapshot
+
+logger = logging.getLogger(__name__)
+
+
+def load_targets(path: str) -> Dict[str, ProbeTarget]:
+    """Load the probe targets of a JSON file.
+
+    The file maps each target name to its settings, e.g.
+    ``{"orders": {"monitor_queues": "0:celery", "broker": {"host": "redis-1"}}}``.
+
+    Args:
+        path: Path of the targets file
+
+    Returns:
+        Settings of each target
+
+    Raises:
+        ValueError: If the file is not a valid targets file
+    """
+    with open(path) as f:
+        try:
+            targets = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid targets file {path}: {e}") from e
+    if not isinstance(targets, dict) or not targets:
+        raise ValueError(f"Targets file {path} must map target names to settings")
+    return {name: ProbeTarget(**settings) for name, settings in targets.items()}
+
+
+class _Probe:
+    """Collector of one target and the snapshot cache in front of it."""
+
+    def __init__(self, collector: CQCollector, cache_ttl: float) -> None:
+        self.collector = collector
+        self.registry = CollectorRegistry(auto_describe=False)
+        self.registry.register(collector)
+        self.cache_ttl = cache_ttl
+        self.snapshot: Optional[Snapshot] = None
+        self.expires_at = 0.0
+        self.last_used = time.monotonic()
+        # Serializes collections, concurrent probes share the result
+        self.lock = threading.Lock()
+
+    def get_snapshot(self) -> Snapshot:
+        self.last_used = time.monotonic()
+        with self.lock:
+            if self.snapshot is None or time.monotonic() >= self.expires_at:
+                self.snapshot = Snapshot.from_registry(self.registry)
+                self.expires_at = time.monotonic() + self.cache_ttl
+            return self.snapshot
+
+
+class TargetPool:
+    """Collectors of many brokers, served by one exporter process.
+
+    A target's collector and broker connections are created on its first
+    probe and kept, keyed by target name, until it has not been probed
+    for ``idle_timeout`` seconds. Every collector runs its db collections
+    on one shared worker pool, so the number of broker round-trips in
+    flight stays bounded whatever the number of targets, and concurrent
+    probes of a target wait for the same collection.
+    """
+
+    def __init__(
+        self,
+        targets: Dict[str, ProbeTarget],
+        max_workers: int = 8,
+        idle_timeout: float = 300.0,
+        cache_ttl: float = 5.0,
+        collector_options: Optional[Dict[str, Any]] = None,
+        broker_defaults: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Initialize the pool, no broker is connected until probed.
+
+        Args:
+            targets: Settings of each target, by name
+            max_workers: Number of db collections run at once over every
+                target
+            idle_timeout: Seconds after its last probe a target's
+                connections are closed
+            cache_ttl: Seconds a target's collection is reused by later
+                probes
+            collector_options: Options passed to every ``CQCollector``
+            broker_defaults: Broker settings of targets that do not set
+                them, e.g. ``socket_timeout``
+        """
+        self.targets = targets
+        self.idle_timeout = idle_timeout
+        self.cache_ttl = cache_ttl
+        self._collector_options = dict(collector_options or {})
+        self._broker_defaults = dict(broker_defaults or {})
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="probe-collector"
+        )
+        self._probes: Dict[str, _Probe] = {}
+        self._lock = threading.Lock()
+
+    def _create_probe(self, name: str) -> _Probe:
+        target = self.targets[name]
+        collector = CQCollector(
+            target.broker_type,
+            {**self._broker_defaults, **target.broker},
+            target.monitor_queues,
+            executor=self._executor,
+            **self._collector_options,
+        )
+        logger.info(f"Connected probe target {name}")
+        return _Probe(collector, self.cache_ttl)
+
+    def get_snapshot(self, name: str) -> Snapshot:
+        """Collect a target, or reuse its collection within the cache TTL.
+
+        Args:
+            name: Name of the target
+
+        Returns:
+            Snapshot of the target's metrics
+
+        Raises:
+            KeyError: If the target is not configured
+        """
+        if name not in self.targets:
+            raise KeyError(name)
+        self.evict_idle()
+
+        with self._lock:
+            probe = self._probes.get(name)
+        if probe is None:
+            # Connect off-lock, a slow broker must not hold up other targets
+            created = self._create_probe(name)
+            with self._lock:
+                probe = self._probes.setdefault(name, created)
+            if probe is not created:
+                created.collector.close()
+        return probe.get_snapshot()
+
+    def evict_idle(self, now: Optional[float] = None) -> List[str]:
+        """Close the collectors of targets not probed within the idle timeout.
+
+        Args:
+            now: Current time, defaults to ``time.monotonic()``
+
+        Returns:
+            Names of the evicted targets
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            evicted = {
+                name: probe
+                for name, probe in self._probes.items()
+                if now - probe.last_used > self.idle_timeout
+            }
+            for name in evicted:
+                del self._probes[name]
+        for name, probe in evicted.items():
+            logger.info(f"Closing idle probe target {name}")
+            probe.collector.close()
+        return sorted(evicted)
+
+    def active_targets(self) -> List[str]:
+        """Names of the targets with open connections."""
+        with self._lock:
+            return sorted(self._probes)
+
+    def close(self) -> None:
+        """Close every target's collector and stop the worker pool."""
+        with self._lock:
+            probes = list(self._probes.values())
+            self._probes.clear()
+        for probe in probes:
+            probe.collector.close()
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,130 @@
+import math
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, Optional, Tuple
+
+from exporter.ringbuffer import RingBuffers
+
+# Net rate, drain rate and time to empty of a queue
+Estimate = Tuple[float, float, float]
+
+
+class RateEstimator:
+    """Enqueue/drain rates of queues from their recent length samples.
+
+    The last ``window`` (time, length) samples of every queue live in two
+    flat typed arrays, one fixed-size ring per queue, so a queue costs
+    ``16 * window + 24`` bytes plus its index entry, whatever its
+    history. Slots of queues no longer monitored are reused.
+    ``estimates`` walks the arrays once per cycle and fits every queue in
+    that single pass:
+
+    - net rate: least-squares slope of length over time, in messages per
+      second; negative while the queue drains
+    - drain rate: exponentially smoothed rate of length decreases, a
+      lower bound of the consumption rate since enqueues offset it
+    - time to empty: length divided by the opposite of the net rate, +Inf
+      while the net rate is not negative; the drain rate is not used, as
+      it ignores the enqueues that keep refilling the queue
+    """
+
+    def __init__(self, window: int = 10, smoothing: float = 0.3) -> None:
+        """Initialize the estimator.
+
+        Args:
+            window: Number of samples kept per queue, at least 2
+            smoothing: Weight of the latest decrease in the drain rate,
+                between 0 and 1
+        """
+        self.window = max(2, window)
+        self._alpha = min(1.0, max(0.0, smoothing))
+        self._rings = RingBuffers(self.window)
+        # Smoothed drain rate of each ring slot
+        self._drain = array("d")
+        self._lock = threading.Lock()
+
+    def observe(
+        self, db: int, lengths: Dict[str, int], now: Optional[float] = None
+    ) -> None:
+        """Record the lengths of queues of a db polled at the same time.
+
+        Args:
+            db: Db of the queues
+            lengths: Length of each polled queue
+            now: Time of the poll, defaults to ``time.monotonic()``
+        """
+        now = time.monotonic() if now is None else now
+        rings = self._rings
+        with self._lock:
+            for queue, length in lengths.items():
+                slot, created = rings.slot((db, queue))
+                if slot == len(self._drain):
+                    self._drain.append(0.0)
+                filled = 0 if created else rings.filled[slot]
+                if filled:
+                    last = rings.latest(slot)
+                    elapsed = now - rings.times[last]
+                    if elapsed <= 0:
+                        continue
+                    drained = max(0.0, rings.values[last] - length) / elapsed
+                    self._drain[slot] = (
+                        drained
+                        if filled == 1
+                        else self._alpha * drained
+                        + (1 - self._alpha) * self._drain[slot]
+                    )
+                rings.append(slot, now, length)
+
+    def forget(self, db: int, queues: Iterable[str]) -> None:
+        """Free the samples of the queues of a db that are not listed.
+
+        Args:
+            db: Db of the queues
+            queues: Queues of the db still monitored
+        """
+        keep = set(queues)
+        with self._lock:
+            for key in [
+                key for key in self._rings.slots if key[0] == db and key[1] not in keep
+            ]:
+                self._rings.release(key)
+
+    def estimates(self) -> Dict[Tuple[int, str], Estimate]:
+        """Estimate every queue with at least two samples in one pass.
+
+        Returns:
+            Net rate, drain rate and time to empty per (db, queue)
+        """
+        rings = self._rings
+        times, lengths = rings.times, rings.values
+        result: Dict[Tuple[int, str], Estimate] = {}
+        with self._lock:
+            for key, slot in rings.slots.items():
+                n = rings.filled[slot]
+                if n < 2:
+                    continue
+                latest = rings.latest(slot)
+                origin = times[latest]
+                sum_t = sum_l = sum_tt = sum_tl = 0.0
+                for position in rings.positions(slot):
+                    # Relative to the latest sample to keep precision
+                    t = times[position] - origin
+                    length = lengths[position]
+                    sum_t += t
+                    sum_l += length
+                    sum_tt += t * t
+                    sum_tl += t * length
+                denominator = n * sum_tt - sum_t * sum_t
+                rate = (
+                    (n * sum_tl - sum_t * sum_l) / denominator if denominator else 0.0
+                )
+                length = lengths[latest]
+                if length <= 0:
+                    time_to_empty = 0.0
+                elif rate < 0:
+                    time_to_empty = length / -rate
+                else:
+                    time_to_empty = math.inf
+                result[key] = (rate, self._drain[slot], time_to_empty)
+        return result
@@ -0,0 +1,91 @@
+from array import array
+from collections import OrderedDict
+from typing import Hashable, List, Tuple
+
+# Bytes of the per-slot fill count and write position
+SLOT_OVERHEAD = 16
+
+
+class RingBuffers:
+    """Fixed-size rings of (time, value) samples, one per key.
+
+    The samples of every ring live in two flat ``array('d')``, ``size``
+    entries per slot, with no Python object per sample. A ring costs
+    ``16 * size + 16`` bytes plus its index entry; slots of released keys
+    are reused by new ones.
+    """
+
+    def __init__(self, size: int) -> None:
+        """Initialize empty rings.
+
+        Args:
+            size: Samples kept per ring, older ones are overwritten
+        """
+        self.size = max(1, size)
+        # Slot of each key, oldest key first unless moved with move_to_end
+        self.slots: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._free: List[int] = []
+        # size entries per slot
+        self.times = array("d")
+        self.values = array("d")
+        # One entry per slot
+        self.filled = array("l")
+        self._next = array("l")
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes allocated for the samples and state of every slot.
+
+        The index of the keys, and the keys themselves, are not counted.
+        """
+        return len(self.filled) * (16 * self.size + SLOT_OVERHEAD)
+
+    def slot(self, key: Hashable) -> Tuple[int, bool]:
+        """Get the slot of a key, allocating an empty one if needed.
+
+        Returns:
+            Slot of the key, and whether it was just allocated
+        """
+        slot = self.slots.get(key)
+        if slot is not None:
+            return slot, False
+        if self._free:
+            slot = self._free.pop()
+            self.filled[slot] = self._next[slot] = 0
+        else:
+            slot = len(self.filled)
+            self.times.extend([0.0] * self.size)
+            self.values.extend([0.0] * self.size)
+            self.filled.append(0)
+            self._next.append(0)
+        self.slots[key] = slot
+        return slot, True
+
+    def release(self, key: Hashable) -> None:
+        """Free the slot of a key for reuse."""
+        slot = self.slots.pop(key, None)
+        if slot is not None:
+            self._free.append(slot)
+
+    def append(self, slot: int, time: float, value: float) -> None:
+        """Write a sample, overwriting the oldest one of a full ring."""
+        position = slot * self.size + self._next[slot]
+        self.times[position] = time
+        self.values[position] = value
+        self._next[slot] = (self._next[slot] + 1) % self.size
+        self.filled[slot] = min(self.size, self.filled[slot] + 1)
+
+    def latest(self, slot: int) -> int:
+        """Array position of the latest sample of a non-empty ring."""
+        return slot * self.size + (self._next[slot] - 1) % self.size
+
+    def positions(self, slot: int) -> List[int]:
+        """Array positions of the samples of a ring, oldest first."""
+        base = slot * self.size
+        if self.filled[slot] < self.size:
+            return list(range(base, base + self.filled[slot]))
+        start = base + self._next[slot]
+        return list(range(start, base + self.size)) + list(range(base, start))
@@ -0,0 +1,436 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from exporter.brokers import Broker
+from exporter.brokers.redis import priority_queue_key
+from exporter.envelope import HeaderCache
+from exporter.models import Task
+
+# Label used for messages without a task name header
+UNKNOWN_TASK = "unknown"
+
+
+def priority_lists(
+    queue: str,
+    length: int,
+    priorities: Optional[Dict[int, int]] = None,
+    separator: str = "\x06\x16",
+) -> List[Tuple[str, int]]:
+    """Get the lists holding a queue's messages, in consumption order.
+
+    kombu stores a queue with priority steps as one list per step and
+    consumes the lowest step first.
+
+    Args:
+        queue: Name of the queue
+        length: Number of messages in the queue
+        priorities: Messages per priority step; None or empty when the
+            queue is a single list
+        separator: Separator between queue name and priority step
+
+    Returns:
+        Key and length of each non-empty list of the queue
+    """
+    if not priorities:
+        return [(queue, length)] if length > 0 else []
+    return [
+        (priority_queue_key(queue, step, separator), count)
+        for step, count in sorted(priorities.items())
+        if count > 0
+    ]
+
+
+class TaskSampler:
+    """Estimate the per-task-name breakdown of queue backlogs by sampling.
+
+    Every cycle, a bounded window of messages is read from the consumer
+    end of each queue and the ``task`` header of each message is counted.
+    With priority steps, the window spans the queue's priority lists in
+    consumption order. Counts are scaled up to the full queue length.
+
+    Reads of a db are capped by a byte budget per cycle, so long queues
+    never turn a scrape into a multi-megabyte transfer. Windows are sized
+    from the average message size of the last sample of each queue; the
+    size of a queue never sampled is first learned by reading its next
+    message alone, and that read is charged to the budget. Those reads
+    are batched as far as the remaining budget allows, assuming unread
+    messages are as large as the largest one seen in the db, so a db
+    with many new queues learns them over several cycles. Queues that do
+    not fit in the budget reuse the breakdown of their last sample, and
+    the starting queue is rotated every cycle so the budget is shared
+    fairly.
+    """
+
+    def __init__(
+        self,
+        sample_size: int = 100,
+        byte_budget: int = 1024 * 1024,
+        cache_size: int = 10000,
+    ) -> None:
+        """Initialize the sampler.
+
+        Args:
+            sample_size: Maximum number of messages read per queue
+            byte_budget: Maximum number of bytes read per db and cycle
+            cache_size: Number of messages whose headers are cached
+        """
+        self._sample_size = sample_size
+        self._byte_budget = byte_budget
+        self._headers = HeaderCache(("task",), maxsize=cache_size)
+        # Average message size and task breakdown of each sampled queue,
+        # per db so concurrent dbs never touch the same dict
+        self._message_sizes: Dict[int, Dict[str, float]] = {}
+        self._ratios: Dict[int, Dict[str, Dict[str, float]]] = {}
+        self._offsets: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _rotation(self, db: int, lengths: Dict[str, int]) -> List[str]:
+        """Non-empty queues of a db, starting one further every cycle."""
+        queues = sorted(queue for queue, length in lengths.items() if length > 0)
+        if not queues:
+            return []
+        offset = self._offsets.get(db, 0) % len(queues)
+        self._offsets[db] = offset + 1
+        return queues[offset:] + queues[:offset]
+
+    def _read_heads(
+        self,
+        broker: Broker,
+        queues: List[str],
+        keys: Dict[str, str],
+        message_sizes: Dict[str, float],
+        budget: float,
+    ) -> Tuple[Dict[str, bytes], float]:
+        """Read the next message of queues of unknown size within a budget.
+
+        Messages are read in batches sized by the remaining budget and the
+        largest message size known, starting with a single message when
+        none is known yet; queues left over are read in later cycles.
+
+        Args:
+            broker: Broker to read messages with
+            queues: Queues of unknown size, in the order they get the budget
+            keys: Key of the first list of each queue
+            message_sizes: Average message size of each queue, updated
+                with the size of every message read
+            budget: Bytes that can be read
+
+        Returns:
+            Next message of each queue read, and the budget left
+        """
+        heads: Dict[str, bytes] = {}
+        largest = max(message_sizes.values(), default=None)
+        while queues and budget > 0:
+            count = 1 if largest is None else int(budget // max(largest, 1))
+            if count < 1:
+                break
+            batch, queues = queues[:count], queues[count:]
+            replies = broker.get_queue_messages({keys[queue]: [-1] for queue in batch})
+            for queue in batch:
+                head = (replies.get(keys[queue]) or [None])[0]
+                if head is None:
+                    continue
+                heads[queue] = head
+                message_sizes[queue] = len(head)
+                largest = max(largest or 0, len(head))
+                budget -= len(head)
+        return heads, budget
+
+    def _plan(
+        self,
+        queues: List[str],
+        lengths: Dict[str, int],
+        message_sizes: Dict[str, float],
+        budget: float,
+    ) -> Dict[str, int]:
+        """Choose how many messages to read from each queue within a budget.
+
+        Args:
+            queues: Queues in the order they get the budget
+            lengths: Current length of each queue
+            message_sizes: Average message size of each queue; queues of
+                unknown size are skipped
+            budget: Bytes that can be read
+
+        Returns:
+            Number of messages to read per queue
+        """
+        windows: Dict[str, int] = {}
+        for queue in queues:
+            message_size = message_sizes.get(queue)
+            if message_size is None:
+                continue
+            window = min(
+                self._sample_size, lengths[queue], int(budget // max(message_size, 1))
+            )
+            if window < 1:
+                continue
+            windows[queue] = window
+            budget -= window * message_size
+        return windows
+
+    def sample(
+        self,
+        db: int,
+        broker: Broker,
+        lengths: Dict[str, int],
+        priorities: Optional[Dict[str, Dict[int, int]]] = None,
+        separator: str = "\x06\x16",
+    ) -> Dict[str, List[Task]]:
+        """Estimate the task breakdown of the queues of a db.
+
+        Args:
+            db: Db the broker is connected to
+            broker: Broker to read messages with
+            lengths: Current length of each queue
+            priorities: Messages per priority step of each queue, when the
+                transport has priority steps
+            separator: Separator between queue name and priority step
+
+        Returns:
+            Mapping of queue name to estimated message count per task
+        """
+        priorities = priorities or {}
+        lists = {
+            queue: priority_lists(queue, length, priorities.get(queue), separator)
+            for queue, length in lengths.items()
+        }
+        with self._lock:
+            message_sizes = self._message_sizes.setdefault(db, {})
+            db_ratios = self._ratios.setdefault(db, {})
+        queues = self._rotation(db, lengths)
+        budget = float(self._byte_budget)
+
+        # Learn the message size of never sampled queues from their next
+        # message, charged to the budget
+        heads, budget = self._read_heads(
+            broker,
+            [queue for queue in queues if queue not in message_sizes],
+            {queue: lists[queue][0][0] for queue in queues},
+            message_sizes,
+            budget,
+        )
+
+        windows = self._plan(queues, lengths, message_sizes, budget)
+        key_windows: Dict[str, int] = {}
+        for queue, window in windows.items():
+            for key, count in lists[queue]:
+                if window < 1:
+                    break
+                key_windows[key] = min(window, count)
+                window -= key_windows[key]
+        replies = broker.get_queue_samples(key_windows)
+
+        samples: Dict[str, List[bytes]] = {}
+        for queue in windows:
+            samples[queue] = [
+                raw for key, _ in lists[queue] for raw in replies.get(key, [])
+            ]
+        for queue, head in heads.items():
+            # Already paid for, the next message samples a queue left
+            # without a window
+            if not samples.get(queue):
+                samples[queue] = [head]
+
+        breakdown: Dict[str, List[Task]] = {}
+        for queue, length in lengths.items():
+            messages = samples.get(queue)
+            if messages:
+                message_sizes[queue] = sum(map(len, messages)) / len(messages)
+                counts = Counter(
+                    self._headers.get(raw)["task"] or UNKNOWN_TASK for raw in messages
+                )
+                db_ratios[queue] = {
+                    task: count / len(messages) for task, count in counts.items()
+                }
+            elif length == 0:
+                db_ratios.pop(queue, None)
+
+            ratios = db_ratios.get(queue)
+            if not ratios:
+                breakdown[queue] = []
+                continue
+            breakdown[queue] = [
+                Task(name=task, count=round(ratio * length))
+                for task, ratio in sorted(ratios.items())
+            ]
+        return breakdown
+
+    def prune(self, db: int, queues: Iterable[str]) -> None:
+        """Forget the state of queues of a db that are no longer monitored.
+
+        Args:
+            db: Db of the queues
+            queues: Every queue of the db still monitored, whether or not
+                it is sampled this cycle
+        """
+        keep = set(queues)
+        for state in (self._message_sizes.get(db, {}), self._ratios.get(db, {})):
+            for queue in [queue for queue in state if queue not in keep]:
+                del state[queue]
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """Parse a header timestamp given as epoch seconds or ISO 8601."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    return None
+
+
+def quantile(values: List[float], q: float) -> float:
+    """Nearest-rank quantile of a sorted, non-empty list."""
+    index = min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))
+    return values[index]
+
+
+class AgeSampler:
+    """Estimate how long messages have been waiting in each queue.
+
+    Each cycle reads the message at the consumer end of a queue (the
+    oldest one) plus a strided sample of positions across the list, with
+    one pipelined batch of LINDEX per db. With priority steps, positions
+    span the queue's priority lists in consumption order, and the
+    consumer end of every list is read too, since each list holds its
+    own oldest message. The enqueue time of a message is
+    taken from a timestamp header, when the publisher sets one, and
+    otherwise from the first time the exporter saw the message's id,
+    which makes the age a lower bound.
+
+    Headers are cached by message hash and timestamps by message id, so
+    steady-state cycles only cost the few LINDEX reads per queue.
+    """
+
+    QUANTILES: Tuple[float, ...] = (0.5, 0.9, 0.99)
+
+    def __init__(
+        self,
+        sample_size: int = 10,
+        timestamp_header: Optional[str] = None,
+        cache_size: int = 100000,
+        quantiles: Tuple[float, ...] = QUANTILES,
+    ) -> None:
+        """Initialize the sampler.
+
+        Args:
+            sample_size: Number of positions read per queue, including the
+                oldest message
+            timestamp_header: Header holding the enqueue time of a message,
+                as epoch seconds or ISO 8601; None to use first-seen times
+            cache_size: Number of messages whose headers and timestamps
+                are cached
+            quantiles: Wait-time quantiles to estimate
+        """
+        self._sample_size = max(1, sample_size)
+        self._timestamp_header = timestamp_header
+        self._cache_size = cache_size
+        self._quantiles = quantiles
+        fields = ("id", timestamp_header) if timestamp_header else ("id",)
+        self._headers = HeaderCache(fields, maxsize=cache_size)
+        # Enqueue time of each message id seen recently
+        self._timestamps: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def positions(self, length: int) -> List[int]:
+        """Positions to read from a queue, counted from the consumer end."""
+        count = min(self._sample_size, length)
+        if count < 1:
+            return []
+        if count == 1:
+            return [-1]
+        stride = (length - 1) / (count - 1)
+        return sorted({-1 - round(k * stride) for k in range(count)}, reverse=True)
+
+    def _timestamp(self, raw: bytes, now: float) -> float:
+        """Get the enqueue time of a message."""
+        headers = self._headers.get(raw)
+        if self._timestamp_header:
+            timestamp = parse_timestamp(headers.get(self._timestamp_header))
+            if timestamp is not None:
+                return timestamp
+
+        message_id = headers.get("id") or str(hash(raw))
+        with self._lock:
+            timestamp = self._timestamps.get(message_id)
+            if timestamp is None:
+                timestamp = self._timestamps[message_id] = now
+            else:
+                self._timestamps.move_to_end(message_id)
+            if len(self._timestamps) > self._cache_size:
+                self._timestamps.popitem(last=False)
+        return timestamp
+
+    def sample(
+        self,
+        db: int,
+        broker: Broker,
+        lengths: Dict[str, int],
+        now: Optional[float] = None,
+        priorities: Optional[Dict[str, Dict[int, int]]] = None,
+        separator: str = "\x06\x16",
+    ) -> Dict[str, Tuple[Optional[float], Dict[float, float]]]:
+        """Estimate message ages of the queues of a db.
+
+        Args:
+            db: Db the broker is connected to
+            broker: Broker to read messages with
+            lengths: Current length of each queue
+            now: Current time, defaults to ``time.time()``
+            priorities: Messages per priority step of each queue, when the
+                transport has priority steps
+            separator: Separator between queue name and priority step
+
+        Returns:
+            Mapping of queue name to the age of its oldest message (None
+            when empty) and its wait-time quantiles
+        """
+        now = time.time() if now is None else now
+        priorities = priorities or {}
+        reads: Dict[str, Dict[str, List[int]]] = {}
+        for queue, length in lengths.items():
+            lists = priority_lists(queue, length, priorities.get(queue), separator)
+            queue_reads = reads[queue] = {key: [-1] for key, _ in lists}
+            for position in self.positions(sum(count for _, count in lists)):
+                # Find the list holding the position, counted over every
+                # list of the queue
+                for key, count in lists:
+                    if -position <= count:
+                        if position not in queue_reads[key]:
+                            queue_reads[key].append(position)
+                        break
+                    position += count
+        messages = broker.get_queue_messages(
+            {key: indexes for keys in reads.values() for key, indexes in keys.items()}
+        )
+
+        ages: Dict[str, Tuple[Optional[float], Dict[float, float]]] = {}
+        for queue in lengths:
+            sampled = [
+                max(0.0, now - self._timestamp(raw, now))
+                for key in reads[queue]
+                for raw in messages.get(key, [])
+                if raw is not None
+            ]
+            if not sampled:
+                ages[queue] = (None, {})
+                continue
+            sampled.sort()
+            ages[queue] = (
+                sampled[-1],
+                {q: quantile(sampled, q) for q in self._quantiles},
+            )
+        return ages
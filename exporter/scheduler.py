@@ -0,0 +1,153 @@
+import heapq
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class _DBSchedule:
+    """Polling schedule of the queues of a single db."""
+
+    def __init__(self) -> None:
+        # (due time, queue) entries; entries whose due time no longer
+        # matches ``due`` are stale and skipped
+        self.heap: List[Tuple[float, str]] = []
+        self.due: Dict[str, float] = {}
+        self.intervals: Dict[str, float] = {}
+        self.lengths: Dict[str, int] = {}
+
+
+class AdaptiveScheduler:
+    """Heap-ordered polling schedule with a separate interval per queue.
+
+    A queue whose length changed since its last poll has its interval
+    divided by ``backoff``, down to ``min_interval``. A queue that is
+    empty or did not change has it multiplied by ``backoff``, up to
+    ``max_interval``. Each db keeps its queues in a heap ordered by due
+    time, so finding what to poll costs O(log n) per polled queue and
+    Redis commands follow queue activity rather than queue count.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 5.0,
+        max_interval: float = 300.0,
+        backoff: float = 2.0,
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            min_interval: Shortest interval between two polls of a queue
+            max_interval: Longest interval between two polls of a queue
+            backoff: Factor an interval grows or shrinks by per poll
+        """
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self._backoff = max(1.0, backoff)
+        # Queues due within this slack are polled together to batch them
+        self._slack = min_interval / 2
+        self._dbs: Dict[int, _DBSchedule] = {}
+        self._lock = threading.Lock()
+
+    def _schedule(self, db: int) -> _DBSchedule:
+        with self._lock:
+            if db not in self._dbs:
+                self._dbs[db] = _DBSchedule()
+            return self._dbs[db]
+
+    @staticmethod
+    def _push(schedule: _DBSchedule, queue: str, due: float) -> None:
+        schedule.due[queue] = due
+        heapq.heappush(schedule.heap, (due, queue))
+
+    @staticmethod
+    def _drop_stale(schedule: _DBSchedule) -> None:
+        """Pop the stale entries at the top of the heap.
+
+        Keeps the top entry a real due time for ``time_until_due``.
+        """
+        heap = schedule.heap
+        while heap and schedule.due.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    def due(
+        self, db: int, queues: Iterable[str], now: Optional[float] = None
+    ) -> List[str]:
+        """Get the queues of a db to poll now.
+
+        New queues are due immediately and queues no longer monitored are
+        dropped. Each returned queue is provisionally rescheduled at its
+        current interval, in case its poll fails and ``update`` is never
+        called for it.
+
+        Args:
+            db: Db of the queues
+            queues: Queues currently monitored in the db
+            now: Current time, defaults to ``time.monotonic()``
+
+        Returns:
+            Names of the queues to poll, sorted
+        """
+        now = time.monotonic() if now is None else now
+        schedule = self._schedule(db)
+        queues = set(queues)
+
+        for queue in queues - schedule.due.keys():
+            schedule.intervals[queue] = self.min_interval
+            self._push(schedule, queue, now)
+        for queue in schedule.due.keys() - queues:
+            del schedule.due[queue]
+            schedule.intervals.pop(queue, None)
+            schedule.lengths.pop(queue, None)
+
+        due = []
+        while schedule.heap and schedule.heap[0][0] <= now + self._slack:
+            due_at, queue = heapq.heappop(schedule.heap)
+            if schedule.due.get(queue) != due_at:
+                continue
+            due.append(queue)
+            self._push(schedule, queue, now + schedule.intervals[queue])
+        self._drop_stale(schedule)
+        return sorted(due)
+
+    def update(
+        self, db: int, lengths: Dict[str, int], now: Optional[float] = None
+    ) -> None:
+        """Reschedule polled queues of a db from their new lengths.
+
+        Args:
+            db: Db of the queues
+            lengths: Length of each polled queue
+            now: Current time, defaults to ``time.monotonic()``
+        """
+        now = time.monotonic() if now is None else now
+        schedule = self._schedule(db)
+        for queue, length in lengths.items():
+            if queue not in schedule.due:
+                continue
+            interval = schedule.intervals[queue]
+            previous = schedule.lengths.get(queue)
+            if previous is not None and length != previous and length > 0:
+                interval = max(self.min_interval, interval / self._backoff)
+            elif previous is not None:
+                interval = min(self.max_interval, interval * self._backoff)
+            schedule.intervals[queue] = interval
+            schedule.lengths[queue] = length
+            self._push(schedule, queue, now + interval)
+        # The provisional entries pushed by ``due`` are now stale
+        self._drop_stale(schedule)
+
+    def interval(self, db: int, queue: str) -> Optional[float]:
+        """Current polling interval of a queue, None if not scheduled."""
+        schedule = self._dbs.get(db)
+        return schedule.intervals.get(queue) if schedule else None
+
+    def time_until_due(self, now: Optional[float] = None) -> float:
+        """Seconds until the next queue of any db is due."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            schedules = list(self._dbs.values())
+        next_due = min(
+            (schedule.heap[0][0] for schedule in schedules if schedule.heap),
+            default=now + self.max_interval,
+        )
+        return min(self.max_interval, max(0.0, next_due - now))
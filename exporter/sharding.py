@@ -0,0 +1,67 @@
+import hashlib
+from functools import lru_cache
+from typing import Optional
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash of a 64-bit key (Lamping and Veach).
+
+    Growing from ``n`` to ``n + 1`` buckets only moves ``1 / (n + 1)`` of
+    the keys, all of them to the new bucket.
+
+    Args:
+        key: Unsigned 64-bit key
+        buckets: Number of buckets
+
+    Returns:
+        Bucket of the key, in ``[0, buckets)``
+    """
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * (float(1 << 31) / float((key >> 33) + 1)))
+    return b
+
+
+@lru_cache(maxsize=65536)
+def shard_of(db: int, queue: Optional[str], shard_count: int) -> int:
+    """Shard owning a queue of a db, or the db-wide statistics when None."""
+    name = f"{db}:{queue}" if queue is not None else f"{db}"
+    key = int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "big")
+    return jump_hash(key, shard_count)
+
+
+class Shard:
+    """Subset of the (db, queue) pairs collected by one exporter replica.
+
+    Every replica runs with the same ``shard_count`` and its own
+    ``shard_index``, and collects only the pairs hashed to its index.
+    The assignment only depends on the pair, so it is stable across
+    restarts, and adding a replica only moves the pairs that go to it.
+    """
+
+    def __init__(self, shard_index: int, shard_count: int) -> None:
+        """Initialize the shard.
+
+        Args:
+            shard_index: Index of this replica, from 0
+            shard_count: Number of replicas
+
+        Raises:
+            ValueError: If the index is not within the shard count
+        """
+        if shard_count < 1 or not 0 <= shard_index < shard_count:
+            raise ValueError(
+                f"Shard index {shard_index} is not within shard count {shard_count}"
+            )
+        self.index = shard_index
+        self.count = shard_count
+
+    def owns(self, db: int, queue: str) -> bool:
+        """Whether this replica collects a queue of a db."""
+        return shard_of(db, queue, self.count) == self.index
+
+    def owns_db(self, db: int) -> bool:
+        """Whether this replica collects the db-wide statistics of a db."""
+        return shard_of(db, None, self.count) == self.index
@@ -0,0 +1,101 @@
+import gzip
+import hashlib
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from prometheus_client import Metric
+from prometheus_client.exposition import CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.openmetrics.exposition import (
+    CONTENT_TYPE_LATEST as OPENMETRICS_CONTENT_TYPE,
+)
+from prometheus_client.openmetrics.exposition import (
+    generate_latest as generate_openmetrics,
+)
+from prometheus_client.registry import Collector
+
+# Level trading a little size for much less CPU than gzip's default of 9
+GZIP_LEVEL = 6
+
+
+class _StaticCollector(Collector):
+    """Collector replaying metrics that were already collected."""
+
+    def __init__(self, metrics: List[Metric]) -> None:
+        self._metrics = metrics
+
+    def collect(self) -> Iterable[Metric]:
+        return self._metrics
+
+
+class Snapshot:
+    """Immutable result of one collection, encoded for serving.
+
+    The registry is collected once. The plain text exposition and its
+    gzip version are encoded up front, the OpenMetrics ones on the first
+    request that negotiates them, so each encoding costs at most once per
+    snapshot no matter how many scrapers hit it.
+    """
+
+    def __init__(self, metrics: List[Metric], created_at: Optional[float] = None):
+        """Initialize the snapshot.
+
+        Args:
+            metrics: Metrics of the collection
+            created_at: Time the collection finished, defaults to now
+        """
+        self.created_at = time.time() if created_at is None else created_at
+        self.metrics = metrics
+        self._collector = _StaticCollector(metrics)
+        # Encoded bodies by (openmetrics, gzip)
+        self._bodies: Dict[Tuple[bool, bool], bytes] = {}
+        self._lock = threading.Lock()
+
+        text = generate_latest(self._collector)  # type: ignore[arg-type]
+        self._bodies[(False, False)] = text
+        self._bodies[(False, True)] = gzip.compress(
+            text, compresslevel=GZIP_LEVEL, mtime=0
+        )
+        self._digest = hashlib.sha1(text).hexdigest()[:16]
+
+    @classmethod
+    def from_registry(cls, registry: Collector) -> "Snapshot":
+        """Collect a registry into a new snapshot."""
+        return cls(list(registry.collect()))
+
+    @classmethod
+    def empty(cls) -> "Snapshot":
+        """Snapshot served before the first collection finishes."""
+        return cls([])
+
+    def age(self, now: Optional[float] = None) -> float:
+        """Seconds since the snapshot was collected."""
+        return max(0.0, (time.time() if now is None else now) - self.created_at)
+
+    def content_type(self, openmetrics: bool) -> str:
+        """Content type of the text or OpenMetrics encoding."""
+        return OPENMETRICS_CONTENT_TYPE if openmetrics else CONTENT_TYPE_LATEST
+
+    def etag(self, openmetrics: bool, compressed: bool) -> str:
+        """Entity tag of an encoding, stable while the metrics are unchanged."""
+        variant = ("om" if openmetrics else "txt") + ("-gz" if compressed else "")
+        return f'"{self._digest}-{variant}"'
+
+    def body(self, openmetrics: bool, compressed: bool) -> bytes:
+        """Get an encoding of the snapshot, encoding it on first use."""
+        key = (openmetrics, compressed)
+        body = self._bodies.get(key)
+        if body is not None:
+            return body
+
+        with self._lock:
+            if key not in self._bodies:
+                text = self._bodies.get((True, False))
+                if text is None:
+                    text = generate_openmetrics(self._collector)  # type: ignore[arg-type]
+                    self._bodies[(True, False)] = text
+                if compressed:
+                    self._bodies[key] = gzip.compress(
+                        text, compresslevel=GZIP_LEVEL, mtime=0
+                    )
+            return self._bodies[key]
@@ -1,3 +1,4 @@
+import codecs
 from typing import Dict, List
 
 
@@ -52,3 +53,94 @@ def parse_monitor_queues(mqs_config: str) -> Dict[int, List[str]]:
         queue_dict[db_num] = sorted(list(set(queue_dict[db_num])))
 
     return queue_dict
+
+
+def parse_discovery_patterns(patterns_config: str) -> Dict[int, List[str]]:
+    """
+    Parses a configuration string of queue discovery patterns per database.
+
+    The format is a semicolon-separated list of "db:pattern" entries, one
+    pattern per entry, e.g. "0:celery*;0:mail*;1:re:^a{1,3}". Only the
+    first colon separates the database, so patterns may contain commas
+    and colons.
+
+    Args:
+        patterns_config: The string containing the discovery patterns.
+
+    Returns:
+        A dictionary where keys are database numbers (int) and values are
+        lists of unique patterns (str), in configuration order.
+        Returns an empty dictionary if the config string is empty; malformed
+        entries are ignored.
+    """
+    patterns: Dict[int, List[str]] = {}
+    for entry in (patterns_config or "").split(";"):
+        db_part, separator, pattern = entry.partition(":")
+        pattern = pattern.strip()
+        if not separator or not pattern:
+            continue
+        try:
+            db_num = int(db_part)
+        except ValueError:
+            continue
+        db_patterns = patterns.setdefault(db_num, [])
+        if pattern not in db_patterns:
+            db_patterns.append(pattern)
+    return patterns
+
+
+def parse_priority_steps(steps_config: str) -> List[int]:
+    """
+    Parses a comma-separated list of Celery priority steps, e.g. "0,3,6,9".
+
+    Args:
+        steps_config: The string containing the priority steps.
+
+    Returns:
+        A sorted list of unique priority steps.
+        Returns an empty list if the config string is empty; malformed
+        steps are ignored.
+    """
+    steps = set()
+    for step in (steps_config or "").split(","):
+        try:
+            steps.add(int(step))
+        except ValueError:
+            continue
+    return sorted(steps)
+
+
+def parse_buckets(buckets_config: str) -> List[float]:
+    """
+    Parses a comma-separated list of histogram bucket bounds, e.g. "60,300".
+
+    Args:
+        buckets_config: The string containing the bucket bounds.
+
+    Returns:
+        A sorted list of unique, positive bucket bounds.
+        Returns an empty list if the config string is empty; malformed
+        bounds are ignored.
+    """
+    buckets = set()
+    for bucket in (buckets_config or "").split(","):
+        try:
+            bound = float(bucket)
+        except ValueError:
+            continue
+        if 0 < bound < float("inf"):
+            buckets.add(bound)
+    return sorted(buckets)
+
+
+def parse_separator(separator_config: str) -> str:
+    """
+    Decodes backslash escapes in a separator, e.g. "\\x06\\x16".
+
+    Args:
+        separator_config: The separator as written in the configuration.
+
+    Returns:
+        The separator with escape sequences decoded.
+    """
+    return codecs.decode(separator_config, "unicode_escape")
@@ -0,0 +1,382 @@
+"""Benchmark of collection and serving against an in-process Redis.
+
+Run from the repository root with
+``python -m scripts.benchmark --dbs 4 --queues-per-db 200``.
+Redis is simulated with fakeredis unless ``--redis-url`` points to a
+disposable server, whose dbs are flushed and filled with test queues.
+"""
+
+import argparse
+import json
+import platform
+import resource
+import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from http.client import HTTPConnection
+from typing import Any, Dict, Iterator, List, Optional
+from unittest import mock
+from urllib.parse import urlparse
+
+import redis
+import redis.asyncio
+from prometheus_client import CollectorRegistry
+from redis.asyncio.client import Pipeline as AsyncPipeline
+from redis.client import Pipeline
+
+from exporter.async_collector import AsyncCQCollector
+from exporter.collector import CQCollector
+from exporter.exporter import Exporter, MetricsHandler, MetricsServer
+from exporter.sampler import quantile
+from exporter.snapshot import Snapshot
+
+# Payload of the benchmark messages, shaped like a small Celery envelope
+MESSAGE = json.dumps(
+    {
+        "body": "W1tdLCB7fSwgeyJjYWxsYmFja3MiOiBudWxsfV0=",
+        "content-encoding": "utf-8",
+        "content-type": "application/json",
+        "headers": {"lang": "py", "task": "benchmark.task", "id": "0"},
+        "properties": {"delivery_tag": "0"},
+    }
+)
+
+
+class CommandCounter:
+    """Count the Redis commands sent by redis-py clients, pipelined or not."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _add(self) -> None:
+        with self._lock:
+            self.count += 1
+
+    @contextmanager
+    def installed(self) -> Iterator["CommandCounter"]:
+        """Count commands while the context is active."""
+        with ExitStack() as stack:
+            for pipeline_class in (Pipeline, AsyncPipeline):
+                stack.enter_context(
+                    self._count(pipeline_class, "pipeline_execute_command")
+                )
+            stack.enter_context(self._count(redis.client.Redis, "execute_command"))
+            stack.enter_context(
+                self._count(
+                    redis.asyncio.client.Redis, "execute_command", is_async=True
+                )
+            )
+            yield self
+
+    def _count(self, cls: type, name: str, is_async: bool = False) -> Any:
+        """Patch a method of a class to count its calls."""
+        method = getattr(cls, name)
+
+        if is_async:
+
+            async def counted(client, *args, **kwargs):
+                self._add()
+                return await method(client, *args, **kwargs)
+
+        else:
+
+            def counted(client, *args, **kwargs):
+                self._add()
+                return method(client, *args, **kwargs)
+
+        return mock.patch.object(cls, name, counted)
+
+
+@contextmanager
+def fake_redis() -> Iterator[None]:
+    """Route every redis-py client to a single in-process fake server."""
+    try:
+        import fakeredis
+    except ImportError:
+        raise SystemExit(
+            "fakeredis is required without --redis-url: pip install fakeredis"
+        )
+
+    server = fakeredis.FakeServer()
+
+    def create_client(*args, **kwargs):
+        return fakeredis.FakeRedis(*args, server=server, **kwargs)
+
+    def create_async_client(*args, **kwargs):
+        return fakeredis.FakeAsyncRedis(*args, server=server, **kwargs)
+
+    with (
+        mock.patch.object(redis, "Redis", create_client),
+        mock.patch.object(redis.asyncio, "Redis", create_async_client),
+    ):
+        yield
+
+
+def populate(
+    broker_config: Dict[str, Any], dbs: int, queues_per_db: int, depth: int
+) -> Dict[int, List[str]]:
+    """Fill each db with ``queues_per_db`` queues of ``depth`` messages.
+
+    Returns:
+        Queue names per db
+    """
+    queues = {
+        db: [f"queue-{index}" for index in range(queues_per_db)] for db in range(dbs)
+    }
+    for db, names in queues.items():
+        client = redis.Redis(
+            host=broker_config["host"],
+            port=broker_config["port"],
+            password=broker_config["password"],
+            db=db,
+        )
+        client.flushdb()
+        pipe = client.pipeline(transaction=False)
+        for name in names:
+            if depth:
+                pipe.rpush(name, *[MESSAGE] * depth)
+        pipe.execute()
+        client.close()
+    return queues
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    """Mean, p50, p99 and max of a list of durations."""
+    if not values:
+        return {}
+    values = sorted(values)
+    return {
+        "mean": sum(values) / len(values),
+        "p50": quantile(values, 0.5),
+        "p99": quantile(values, 0.99),
+        "max": values[-1],
+    }
+
+
+def _scrape(
+    address: Any, scrapes: int, gzip: bool, latencies: List[float], sizes: List[int]
+) -> None:
+    """Scrape ``/metrics`` repeatedly over one keep-alive connection."""
+    connection = HTTPConnection(*address, timeout=30)
+    headers = {"Accept-Encoding": "gzip"} if gzip else {}
+    for _ in range(scrapes):
+        started = time.perf_counter()
+        connection.request("GET", "/metrics", headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        latencies.append(time.perf_counter() - started)
+        sizes.append(len(body))
+    connection.close()
+
+
+def run_benchmark(
+    dbs: int = 1,
+    queues_per_db: int = 100,
+    depth: int = 10,
+    cycles: int = 10,
+    scrapers: int = 4,
+    scrapes_per_scraper: int = 50,
+    engine: str = "sync",
+    collection_concurrency: int = 1,
+    shared_pool: bool = False,
+    gzip: bool = True,
+    redis_url: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Measure collection cycles and concurrent scrapes.
+
+    Args:
+        dbs: Number of dbs to monitor
+        queues_per_db: Number of queues in each db
+        depth: Number of messages in each queue
+        cycles: Number of collection cycles to time
+        scrapers: Number of concurrent scrapers
+        scrapes_per_scraper: Number of requests sent by each scraper
+        engine: Collection engine, ``sync`` or ``async``
+        collection_concurrency: Number of dbs collected in parallel
+        shared_pool: Share one connection pool across dbs
+        gzip: Request gzip-encoded responses
+        redis_url: Disposable Redis server to use instead of fakeredis
+
+    Returns:
+        Configuration and results of the run, JSON serializable
+    """
+    config = {
+        "dbs": dbs,
+        "queues_per_db": queues_per_db,
+        "depth": depth,
+        "cycles": cycles,
+        "scrapers": scrapers,
+        "scrapes_per_scraper": scrapes_per_scraper,
+        "engine": engine,
+        "collection_concurrency": collection_concurrency,
+        "shared_pool": shared_pool,
+        "gzip": gzip,
+        "redis": "server" if redis_url else "fakeredis",
+    }
+    url = urlparse(redis_url or "redis://localhost:6379")
+    broker_config: Dict[str, Any] = {
+        "host": url.hostname or "localhost",
+        "port": url.port or 6379,
+        "password": url.password,
+        "shared_pool": shared_pool,
+        "max_connections": max(1, collection_concurrency),
+    }
+
+    if shared_pool and redis_url is None:
+        raise ValueError("A shared pool needs a Redis server, see --redis-url")
+
+    with ExitStack() as stack:
+        if redis_url is None:
+            stack.enter_context(fake_redis())
+        queues = populate(broker_config, dbs, queues_per_db, depth)
+        counter = stack.enter_context(CommandCounter().installed())
+
+        collector_class = AsyncCQCollector if engine == "async" else CQCollector
+        collector = collector_class(
+            "redis",
+            broker_config,
+            ";".join(f"{db}:{','.join(names)}" for db, names in queues.items()),
+            collection_concurrency=collection_concurrency,
+        )
+        stack.callback(collector.close)
+        registry = CollectorRegistry()
+        registry.register(collector)
+
+        cycle_times: List[float] = []
+        commands_before = counter.count
+        for _ in range(cycles):
+            started = time.perf_counter()
+            snapshot = Snapshot.from_registry(registry)
+            cycle_times.append(time.perf_counter() - started)
+        commands = counter.count - commands_before
+
+        exporter = Exporter(registry, polling_interval=3600)
+        exporter.snapshot = snapshot
+        server = MetricsServer(("127.0.0.1", 0), MetricsHandler)
+        server.metrics_server = exporter  # type: ignore[attr-defined]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        stack.callback(server.server_close)
+        stack.callback(server.shutdown)
+
+        latencies: List[float] = []
+        sizes: List[int] = []
+        threads = [
+            threading.Thread(
+                target=_scrape,
+                args=(
+                    server.server_address,
+                    scrapes_per_scraper,
+                    gzip,
+                    latencies,
+                    sizes,
+                ),
+            )
+            for _ in range(scrapers)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        scrape_wall_time = time.perf_counter() - started
+
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        peak_rss *= 1024
+
+    return {
+        "config": config,
+        "results": {
+            "cycle_seconds": _summary(cycle_times),
+            "commands_per_cycle": commands / cycles if cycles else 0,
+            "scrape_seconds": _summary(latencies),
+            "scrapes_per_second": len(latencies) / scrape_wall_time
+            if scrape_wall_time
+            else 0,
+            "response_bytes": sizes[-1] if sizes else 0,
+            "peak_rss_bytes": peak_rss,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+        },
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Celery Queue Exporter benchmark",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument("--dbs", type=int, default=1, help="Number of dbs")
+    parser.add_argument(
+        "--queues-per-db", type=int, default=100, help="Number of queues per db"
+    )
+    parser.add_argument("--depth", type=int, default=10, help="Messages per queue")
+    parser.add_argument(
+        "--cycles", type=int, default=10, help="Number of collection cycles"
+    )
+    parser.add_argument(
+        "--scrapers", type=int, default=4, help="Number of concurrent scrapers"
+    )
+    parser.add_argument(
+        "--scrapes-per-scraper",
+        type=int,
+        default=50,
+        help="Number of requests sent by each scraper",
+    )
+    parser.add_argument("--engine", type=str, choices=["sync", "async"], default="sync")
+    parser.add_argument(
+        "--collection-concurrency",
+        type=int,
+        default=1,
+        help="Number of dbs collected in parallel",
+    )
+    parser.add_argument(
+        "--shared-pool",
+        action="store_true",
+        help="Share one connection pool across dbs",
+    )
+    parser.add_argument(
+        "--no-gzip", action="store_true", help="Request uncompressed responses"
+    )
+    parser.add_argument(
+        "--redis-url",
+        type=str,
+        default=None,
+        help="Disposable Redis server to use instead of fakeredis; its dbs are flushed",
+    )
+    parser.add_argument(
+        "--output", type=str, default=None, help="File to write JSON results to"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    result = run_benchmark(
+        dbs=args.dbs,
+        queues_per_db=args.queues_per_db,
+        depth=args.depth,
+        cycles=args.cycles,
+        scrapers=args.scrapers,
+        scrapes_per_scraper=args.scrapes_per_scraper,
+        engine=args.engine,
+        collection_concurrency=args.collection_concurrency,
+        shared_pool=args.shared_pool,
+        gzip=not args.no_gzip,
+        redis_url=args.redis_url,
+    )
+    output = json.dumps(result, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
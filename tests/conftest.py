@@ -2,10 +2,11 @@
 
 import os
 import sys
+
+import fakeredis
 import pytest
 from celery import Celery
 
-
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 
@@ -35,3 +36,45 @@ def celery_config():
         "task_eager_propagates": True,
         "task_store_eager_result": True,
     }
+
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    """Patch redis-py so brokers talk to an in-process fake Redis server."""
+    import redis
+    import redis.asyncio
+
+    server = fakeredis.FakeServer()
+
+    def fake_redis(*args, **kwargs):
+        return fakeredis.FakeRedis(*args, server=server, **kwargs)
+
+    def fake_async_redis(*args, **kwargs):
+        return fakeredis.FakeAsyncRedis(*args, server=server, **kwargs)
+
+    monkeypatch.setattr(redis, "Redis", fake_redis)
+    monkeypatch.setattr(redis.asyncio, "Redis", fake_async_redis)
+    return server
+
+
+@pytest.fixture
+def make_message():
+    """Build raw Celery messages as kombu's Redis transport stores them."""
+    import base64
+    import json
+    import uuid
+
+    def make(task="app.tasks.add", body_size=64, **headers):
+        body = base64.b64encode(b"x" * body_size).decode()
+        headers = {"lang": "py", "task": task, "id": str(uuid.uuid4()), **headers}
+        return json.dumps(
+            {
+                "body": body,
+                "content-encoding": "utf-8",
+                "content-type": "application/json",
+                "headers": headers,
+                "properties": {"delivery_tag": str(uuid.uuid4())},
+            }
+        ).encode()
+
+    return make
@@ -0,0 +1,35 @@
+import fakeredis
+
+from exporter.async_collector import AsyncCQCollector
+
+
+def test_async_collect_queue_lengths(redis_server):
+    fakeredis.FakeRedis(server=redis_server, db=0).rpush("celery", "a", "b")
+    fakeredis.FakeRedis(server=redis_server, db=2).rpush("mail", "a")
+
+    collector = AsyncCQCollector(
+        "redis", {"pipeline_chunk_size": 1}, "0:celery;2:mail,cache"
+    )
+    metrics = {metric.name: metric for metric in collector.collect()}
+
+    assert {
+        tuple(sample.labels.values()): sample.value
+        for sample in metrics["celery_queue_length"].samples
+    } == {
+        ("redis", "celery", "0"): 2,
+        ("redis", "cache", "2"): 0,
+        ("redis", "mail", "2"): 1,
+    }
+    assert {
+        sample.labels["vdb"]: sample.value
+        for sample in metrics["celery_queue_collection_timeout"].samples
+    } == {"0": 0, "2": 0}
+
+
+def test_async_collector_has_no_worker_pool(redis_server):
+    collector = AsyncCQCollector("redis", {}, "0:celery")
+    list(collector.collect())
+
+    # Dbs are collected on the event loop only
+    assert collector._executor is None
+    collector.close()
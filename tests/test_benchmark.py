@@ -0,0 +1,37 @@
+import json
+
+from scripts.benchmark import main, run_benchmark
+
+
+def test_run_benchmark_reports_results():
+    result = run_benchmark(
+        dbs=2, queues_per_db=3, depth=2, cycles=2, scrapers=2, scrapes_per_scraper=3
+    )
+
+    results = result["results"]
+    # One LLEN per queue and cycle
+    assert results["commands_per_cycle"] == 6
+    assert set(results["cycle_seconds"]) == {"mean", "p50", "p99", "max"}
+    assert results["scrape_seconds"]["p99"] >= results["scrape_seconds"]["p50"]
+    assert results["peak_rss_bytes"] > 0
+
+
+def test_main_writes_json(tmp_path, capsys):
+    output = tmp_path / "result.json"
+    main(
+        [
+            "--queues-per-db",
+            "2",
+            "--cycles",
+            "1",
+            "--scrapers",
+            "1",
+            "--scrapes-per-scraper",
+            "1",
+            "--output",
+            str(output),
+        ]
+    )
+
+    assert json.loads(output.read_text())["config"]["queues_per_db"] == 2
+    assert json.loads(capsys.readouterr().out)["config"]["cycles"] == 1
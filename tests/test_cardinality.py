@@ -0,0 +1,59 @@
+from exporter.cardinality import QueueLimiter
+
+
+def test_selects_longest_queues():
+    limiter = QueueLimiter(2, hysteresis=0)
+
+    assert limiter.select(0, {"a": 5, "b": 1, "c": 9, "d": 3}) == {"a", "c"}
+
+
+def test_pinned_queues_do_not_count():
+    limiter = QueueLimiter(1, pinned=["celery", "re:priority\\."], hysteresis=0)
+
+    selected = limiter.select(0, {"celery": 0, "priority.high": 0, "a": 2, "b": 1})
+
+    assert selected == {"celery", "priority.high", "a"}
+
+
+def test_hysteresis_keeps_exported_queues_near_the_limit():
+    limiter = QueueLimiter(4, hysteresis=0.25)
+    assert limiter.select(0, {"a": 10, "b": 9, "c": 8, "d": 7, "e": 6}) == {
+        "a",
+        "b",
+        "c",
+        "d",
+    }
+
+    # e ties d and ranks above it by name, d still ranks within the margin
+    assert limiter.select(0, {"a": 10, "b": 9, "c": 8, "d": 7, "e": 7}) == {
+        "a",
+        "b",
+        "c",
+        "d",
+    }
+
+    # d falls out of limit + margin and is replaced
+    assert limiter.select(0, {"a": 10, "b": 9, "c": 8, "d": 1, "e": 8, "f": 5}) == {
+        "a",
+        "b",
+        "c",
+        "e",
+    }
+
+
+def test_longest_queue_is_always_exported():
+    # The margin rounds down, so a small limit keeps its top ranks
+    limiter = QueueLimiter(1, hysteresis=0.5)
+    assert limiter.select(0, {"a": 2, "b": 1}) == {"a"}
+    assert limiter.select(0, {"a": 2, "b": 3}) == {"b"}
+
+    limiter = QueueLimiter(2, hysteresis=1.0)
+    assert limiter.select(0, {"a": 3, "b": 2, "c": 1}) == {"a", "b"}
+    assert limiter.select(0, {"a": 1, "b": 2, "c": 3}) == {"c", "b"}
+
+
+def test_limits_are_per_db():
+    limiter = QueueLimiter(1, hysteresis=0)
+
+    assert limiter.select(0, {"a": 1, "b": 2}) == {"b"}
+    assert limiter.select(1, {"a": 3, "b": 2}) == {"a"}
@@ -0,0 +1,41 @@
+from exporter.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def test_opens_after_consecutive_failures():
+    circuit = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    circuit.record_failure(now=0)
+    assert circuit.state == CLOSED
+    circuit.record_success()
+    circuit.record_failure(now=1)
+    assert circuit.state == CLOSED
+    circuit.record_failure(now=2)
+
+    assert circuit.state == OPEN
+    assert not circuit.allow(now=10)
+
+
+def test_half_open_allows_a_single_probe():
+    circuit = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    circuit.record_failure(now=0)
+
+    assert circuit.allow(now=30)
+    assert circuit.state == HALF_OPEN
+    assert not circuit.allow(now=31)
+
+    circuit.record_success()
+    assert circuit.state == CLOSED
+    assert circuit.allow(now=32)
+
+
+def test_failed_probe_reopens():
+    circuit = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for now in range(3):
+        circuit.record_failure(now=now)
+    assert circuit.allow(now=40)
+
+    circuit.record_failure(now=40)
+
+    assert circuit.state == OPEN
+    assert not circuit.allow(now=60)
+    assert circuit.allow(now=70)
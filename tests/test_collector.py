@@ -0,0 +1,259 @@
+import threading
+
+import fakeredis
+import pytest
+from prometheus_client import CollectorRegistry
+
+from exporter.cardinality import QueueLimiter
+from exporter.collector import CQCollector
+from exporter.discovery import QueueDiscovery
+from exporter.instrumentation import ExporterMetrics
+from exporter.rates import RateEstimator
+from exporter.sampler import TaskSampler
+from exporter.scheduler import AdaptiveScheduler
+from exporter.sharding import Shard
+
+
+def _collect(collector):
+    """Run one collection and index sample values by metric and labels."""
+    return {
+        metric.name: {
+            tuple(sample.labels.values()): sample.value for sample in metric.samples
+        }
+        for metric in collector.collect()
+    }
+
+
+def test_collect_queue_lengths(redis_server):
+    fakeredis.FakeRedis(server=redis_server, db=0).rpush("celery", "a", "b")
+    fakeredis.FakeRedis(server=redis_server, db=1).rpush("mail", "a")
+
+    collector = CQCollector("redis", {}, "0:celery;1:mail,cache")
+
+    assert _collect(collector)["celery_queue_length"] == {
+        ("redis", "celery", "0"): 2,
+        ("redis", "cache", "1"): 0,
+        ("redis", "mail", "1"): 1,
+    }
+
+
+def test_collect_reports_timed_out_dbs(redis_server):
+    fakeredis.FakeRedis(server=redis_server, db=0).rpush("celery", "a")
+    collector = CQCollector(
+        "redis",
+        {},
+        "0:celery;1:mail",
+        collection_concurrency=2,
+        collection_timeout=0.2,
+    )
+    release = threading.Event()
+    slow_broker = collector._brokers[1]
+    get_queue_lengths = slow_broker.get_queue_lengths
+
+    def slow_get_queue_lengths(queue_names):
+        release.wait(5)
+        return get_queue_lengths(queue_names)
+
+    slow_broker.get_queue_lengths = slow_get_queue_lengths
+    try:
+        metrics = _collect(collector)
+    finally:
+        release.set()
+
+    assert metrics["celery_queue_length"] == {("redis", "celery", "0"): 1}
+    assert metrics["celery_queue_collection_timeout"] == {
+        ("redis", "0"): 0,
+        ("redis", "1"): 1,
+    }
+
+
+def test_collect_discovered_queues(redis_server):
+    fakeredis.FakeRedis(server=redis_server, db=0).rpush("celery", "a")
+    fakeredis.FakeRedis(server=redis_server, db=1).rpush("tasks.high", "a", "b")
+    discovery = QueueDiscovery({1: ["tasks.*"]})
+
+    collector = CQCollector("redis", {}, "0:celery", discovery=discovery)
+
+    assert _collect(collector)["celery_queue_length"] == {
+        ("redis", "celery", "0"): 1,
+        ("redis", "tasks.high", "1"): 2,
+    }
+
+
+def test_discovery_requires_a_broker_able_to_discover():
+    with pytest.raises(ValueError):
+        CQCollector(
+            "rabbitmq", {}, "0:celery", discovery=QueueDiscovery({0: ["tasks.*"]})
+        )
+
+
+def test_collect_priority_queues(redis_server):
+    client = fakeredis.FakeRedis(server=redis_server, db=0)
+    client.rpush("celery", "a")
+    client.rpush("celery:6", "a", "b")
+
+    collector = CQCollector(
+        "redis", {}, "0:celery", priority_steps=[0, 6], priority_separator=":"
+    )
+    metrics = _collect(collector)
+
+    assert metrics["celery_queue_length"] == {("redis", "celery", "0"): 3}
+    assert metrics["celery_queue_priority_length"] == {
+        ("redis", "celery", "0", "0"): 1,
+        ("redis", "celery", "0", "6"): 2,
+    }
+
+
+def test_collect_unacked(redis_server):
+    client = fakeredis.FakeRedis(server=redis_server, db=0)
+    client.hset("unacked", "a", "{}")
+    client.zadd("unacked_index", {"a": 0.0})
+
+    collector = CQCollector("redis", {}, "0:celery", unacked_buckets=[60.0])
+    metrics = _collect(collector)
+
+    assert metrics["celery_queue_unacked"] == {("redis", "0"): 1}
+    assert metrics["celery_queue_unacked_expired"] == {("redis", "0"): 1}
+    assert metrics["celery_queue_unacked_age_seconds"] == {
+        ("redis", "0", "60.0"): 0,
+        ("redis", "0", "+Inf"): 1,
+    }
+
+
+def test_collect_polls_due_queues_only(redis_server):
+    client = fakeredis.FakeRedis(server=redis_server, db=0)
+    client.rpush("celery", "a")
+    scheduler = AdaptiveScheduler(min_interval=60)
+    collector = CQCollector("redis", {}, "0:celery,mail", scheduler=scheduler)
+    _collect(collector)
+
+    # Not due yet: the last known length is reported
+    client.rpush("celery", "b")
+    assert _collect(collector)["celery_queue_length"] == {
+        ("redis", "celery", "0"): 1,
+        ("redis", "mail", "0"): 0,
+    }
+
+
+def test_partial_poll_keeps_sampler_state_of_queues_not_due(
+    redis_server, make_message, monkeypatch
+):
+    client = fakeredis.FakeRedis(server=redis_server, db=0)
+    client.rpush("celery", make_message("add"))
+    client.rpush("mail", make_message("send"))
+    scheduler = AdaptiveScheduler(min_interval=60)
+    sampler = TaskSampler()
+    collector = CQCollector(
+        "redis", {}, "0:celery,mail", scheduler=scheduler, task_sampler=sampler
+    )
+    _collect(collector)
+    assert set(sampler._message_sizes[0]) == {"celery", "mail"}
+
+    monkeypatch.setattr(scheduler, "due", lambda db, queues: ["celery"])
+    _collect(collector)
+
+    assert set(sampler._message_sizes[0]) == {"celery", "mail"}
+    assert set(sampler._ratios[0]) == {"celery", "mail"}
+
+
+def test_collect_records_instrumentation(redis_server):
+    registry = CollectorRegistry()
+    instrumentation = ExporterMetrics(registry)
+    collector = CQCollector(
+        "redis", {}, "0:celery;1:mail", instrumentation=instrumentation
+    )
+    collector._brokers[1].get_queue_lengths = lambda queue_names: 1 / 0
+    metrics = _collect(collector)
+
+    assert (
+        registry.get_sample_value("celery_exporter_collection_duration_seconds_count")
+        == 1
+    )
+    assert (
+        registry.get_sample_value(
+            "celery_exporter_broker_latency_seconds_count", {"vdb": "0"}
+        )
+        == 1
+    )
+    assert (
+        registry.get_sample_value("celery_exporter_db_errors_total", {"vdb": "1"}) == 1
+    )
+    assert metrics["celery_exporter_broker_connections"][("redis", "0", "idle")] == 1
+
+
+def test_collect_serves_stale_values_while_circuit_is_open(redis_server):
+    fakeredis.FakeRedis(server=redis_server, db=1).rpush("mail", "a", "b")
+    collector = CQCollector("redis", {}, "0:celery;1:mail", circuit_failure_threshold=1)
+    _collect(collector)
+
+    calls = []
+
+    def failing_get_queue_lengths(queue_names):
+        calls.append(queue_names)
+        raise ConnectionError("unreachable")
+
+    collector._brokers[1].get_queue_lengths = failing_get_queue_lengths
+    _collect(collector)
+    metrics = _collect(collector)
+
+    # Skipped while open, the last known length is still reported
+    assert len(calls) == 1
+    assert metrics["celery_queue_length"][("redis", "mail", "1")] == 2
+    assert metrics["celery_queue_stale"] == {("redis", "0"): 0, ("redis", "1"): 1}
+    assert metrics["celery_exporter_circuit_state"][("redis", "1", "open")] == 1
+    assert ("redis", "1") in metrics["celery_queue_last_success_timestamp_seconds"]
+
+
+def test_collect_owned_shard_only(redis_server):
+    queues = [f"queue-{index}" for index in range(20)]
+    shards = [Shard(index, 2) for index in range(2)]
+    collected = []
+    for shard in shards:
+        collector = CQCollector("redis", {}, f"0:{','.join(queues)}", shard=shard)
+        metrics = _collect(collector)
+        collected.append({labels[1] for labels in metrics["celery_queue_length"]})
+        assert metrics["celery_exporter_shard"] == {(str(shard.index), "2"): 1}
+        assert metrics["celery_exporter_shard_queues"] == {
+            ("redis", "0"): len(collected[-1])
+        }
+
+    assert collected[0] | collected[1] == set(queues)
+    assert not collected[0] & collected[1]
+
+
+def test_collect_folds_queues_beyond_the_limit(redis_server):
+    client = fakeredis.FakeRedis(server=redis_server, db=0)
+    client.rpush("big", *range(5))
+    client.rpush("medium", *range(3))
+    client.rpush("small", 1)
+    collector = CQCollector(
+        "redis",
+        {},
+        "0:big,medium,small,empty",
+        queue_limiter=QueueLimiter(1, pinned=["empty"]),
+    )
+
+    metrics = _collect(collector)
+
+    assert metrics["celery_queue_length"] == {
+        ("redis", "big", "0"): 5,
+        ("redis", "empty", "0"): 0,
+    }
+    assert metrics["celery_queue_other_count"] == {("redis", "0"): 2}
+    assert metrics["celery_queue_other_length"] == {("redis", "0"): 4}
+
+
+def test_collect_queue_rates(redis_server):
+    client = fakeredis.FakeRedis(server=redis_server, db=0)
+    client.rpush("celery", *range(10))
+    collector = CQCollector(
+        "redis", {}, "0:celery", rate_estimator=RateEstimator(window=4)
+    )
+    assert _collect(collector)["celery_queue_net_rate"] == {}
+
+    client.ltrim("celery", 0, 4)
+    metrics = _collect(collector)
+
+    assert metrics["celery_queue_net_rate"][("redis", "celery", "0")] < 0
+    assert metrics["celery_queue_drain_rate"][("redis", "celery", "0")] > 0
+    assert metrics["celery_queue_time_to_empty_seconds"][("redis", "celery", "0")] > 0
@@ -0,0 +1,96 @@
+import fakeredis
+import pytest
+
+from exporter.brokers import RedisBroker
+from exporter.discovery import QueueDiscovery, compile_pattern
+
+
+@pytest.fixture
+def client(redis_server):
+    return fakeredis.FakeRedis(server=redis_server)
+
+
+@pytest.fixture
+def broker(redis_server):
+    broker = RedisBroker(db=0)
+    broker.connect()
+    return broker
+
+
+def _run_pass(discovery, broker, now, max_steps=100):
+    for _ in range(max_steps):
+        discovery.step(0, broker, now=now)
+        if not discovery._dbs[0].cursors:
+            return
+    raise AssertionError("discovery pass did not complete")
+
+
+def test_compile_pattern():
+    assert compile_pattern("celery*").match("celery.priority")
+    assert not compile_pattern("celery*").match("mail")
+    assert compile_pattern("re:^(mail|sms)$").match("sms")
+    assert not compile_pattern("re:^(mail|sms)$").match("smsx")
+
+
+def test_discovers_pattern_queues_and_bindings(client, broker):
+    client.rpush("celery", "m")
+    client.rpush("celery.high", "m")
+    client.rpush("other", "m")
+    client.set("celery.not-a-list", "x")
+    client.sadd("_kombu.binding.mail", "mail\x06\x16\x06\x16mail")
+
+    discovery = QueueDiscovery({0: ["celery*"]}, use_bindings=True, scan_count=1)
+    _run_pass(discovery, broker, now=0)
+
+    assert discovery.queues(0) == {"celery", "celery.high", "mail"}
+
+
+def test_scan_is_spread_across_steps(client, broker):
+    for i in range(50):
+        client.rpush(f"q{i}", "m")
+
+    discovery = QueueDiscovery({0: ["q*"]}, scan_count=5)
+    discovery.step(0, broker, now=0)
+
+    assert discovery._dbs[0].cursors
+    assert len(discovery.queues(0)) < 50
+    _run_pass(discovery, broker, now=0)
+    assert len(discovery.queues(0)) == 50
+
+
+def test_vanished_queues_are_evicted_on_refresh(client, broker):
+    client.rpush("celery", "m")
+    client.rpush("celery.high", "m")
+    discovery = QueueDiscovery(
+        {0: ["re:^celery"]}, refresh_interval=60, eviction_grace=100
+    )
+    _run_pass(discovery, broker, now=0)
+    # As kombu does once the queue drains
+    client.delete("celery.high")
+
+    # Not due yet, the cache is kept
+    discovery.step(0, broker, now=30)
+    assert discovery.queues(0) == {"celery", "celery.high"}
+
+    # Within the grace period, the drained queue is still collected
+    _run_pass(discovery, broker, now=61)
+    assert discovery.queues(0) == {"celery", "celery.high"}
+    assert broker.get_queue_lengths(["celery.high"]) == {"celery.high": 0}
+
+    _run_pass(discovery, broker, now=122)
+    assert discovery.queues(0) == {"celery"}
+
+
+def test_refilled_queue_is_not_evicted(client, broker):
+    client.rpush("celery", "m")
+    discovery = QueueDiscovery({0: ["celery"]}, refresh_interval=60, eviction_grace=100)
+    _run_pass(discovery, broker, now=0)
+    client.delete("celery")
+    _run_pass(discovery, broker, now=61)
+    client.rpush("celery", "m")
+    _run_pass(discovery, broker, now=122)
+    client.delete("celery")
+
+    # Last found at 122, so kept until 222
+    _run_pass(discovery, broker, now=183)
+    assert discovery.queues(0) == {"celery"}
@@ -0,0 +1,26 @@
+import json
+
+from exporter.envelope import HeaderCache, parse_headers
+
+
+def test_parse_headers(make_message):
+    headers = parse_headers(make_message("app.tasks.mail", id="abc"))
+    assert headers["task"] == "app.tasks.mail"
+    assert headers["id"] == "abc"
+
+
+def test_parse_headers_compact_and_invalid():
+    raw = json.dumps({"body": "", "headers": {"task": "t"}}, separators=(",", ":"))
+    assert parse_headers(raw.encode()) == {"task": "t"}
+    assert parse_headers(b"not json") == {}
+    assert parse_headers(b'{"body": "x"}') == {}
+
+
+def test_header_cache_keeps_selected_fields(make_message):
+    cache = HeaderCache(("task",), maxsize=2)
+    first, second, third = (make_message(f"t{i}") for i in range(3))
+
+    assert cache.get(first) == {"task": "t0"}
+    assert cache.get(second) == {"task": "t1"}
+    assert cache.get(third) == {"task": "t2"}
+    assert len(cache) == 2
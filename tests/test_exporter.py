@@ -0,0 +1,203 @@
+import gzip
+import json
+import threading
+import time
+from http.client import HTTPConnection
+
+import pytest
+from prometheus_client import CollectorRegistry
+from prometheus_client.core import GaugeMetricFamily
+
+from exporter.exporter import Exporter, MetricsHandler, MetricsServer, accepts
+from exporter.history import QueueHistory
+from exporter.instrumentation import ExporterMetrics
+from exporter.snapshot import Snapshot
+
+
+class _Registry:
+    def __init__(self):
+        self.value = 1
+
+    def collect(self):
+        metric = GaugeMetricFamily("celery_queue_length", "Queue length")
+        metric.add_metric([], self.value)
+        return [metric]
+
+
+@pytest.fixture
+def exporter():
+    exporter = Exporter(_Registry(), polling_interval=30)
+    exporter.snapshot = Snapshot.from_registry(exporter.registry)
+    return exporter
+
+
+@pytest.fixture
+def server(exporter):
+    server = MetricsServer(("127.0.0.1", 0), MetricsHandler)
+    server.metrics_server = exporter
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _get(server, path="/metrics", **headers):
+    connection = HTTPConnection(*server.server_address, timeout=5)
+    connection.request("GET", path, headers=headers)
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response, body
+
+
+def test_accepts():
+    assert accepts("gzip, deflate", "gzip")
+    assert accepts("deflate;q=0.5, GZIP;q=0.1", "gzip")
+    assert not accepts("gzip;q=0", "gzip")
+    assert not accepts("", "gzip")
+
+
+def test_serves_plain_text(server):
+    response, body = _get(server)
+
+    assert response.status == 200
+    assert response.getheader("Content-Type").startswith("text/plain")
+    assert b"celery_queue_length 1.0" in body
+
+
+def test_serves_gzip_and_openmetrics(server):
+    response, body = _get(
+        server,
+        **{"Accept": "application/openmetrics-text", "Accept-Encoding": "gzip"},
+    )
+
+    assert response.getheader("Content-Encoding") == "gzip"
+    assert response.getheader("Content-Type").startswith("application/openmetrics")
+    assert gzip.decompress(body).endswith(b"# EOF\n")
+
+
+def test_not_modified_until_metrics_change(server, exporter):
+    etag = _get(server)[0].getheader("ETag")
+
+    response, body = _get(server, **{"If-None-Match": etag})
+    assert (response.status, body) == (304, b"")
+
+    exporter.registry.value = 2
+    exporter.snapshot = Snapshot.from_registry(exporter.registry)
+    response, _ = _get(server, **{"If-None-Match": etag})
+    assert response.status == 200
+    assert response.getheader("ETag") != etag
+
+
+def test_unknown_path(server):
+    assert _get(server, "/")[0].status == 404
+
+
+def test_collection_does_not_block_scrapes(server, exporter):
+    collecting = threading.Event()
+    release = threading.Event()
+    collect = exporter.registry.collect
+
+    def slow_collect():
+        collecting.set()
+        release.wait(5)
+        return collect()
+
+    exporter.registry.value = 2
+    exporter.registry.collect = slow_collect
+    exporter.start_collection_thread()
+    try:
+        assert collecting.wait(5)
+        response, body = _get(server)
+    finally:
+        release.set()
+
+    # The previous snapshot is served while the collection is in flight
+    assert b"celery_queue_length 1.0" in body
+    assert float(response.getheader("X-Snapshot-Age")) >= 0
+    assert response.getheader("Age") is not None
+
+
+def test_collect_on_scrape_is_single_flight(exporter):
+    exporter.collect_on_scrape = True
+    calls = []
+    release = threading.Event()
+    collect = exporter.registry.collect
+
+    def slow_collect():
+        calls.append(1)
+        release.wait(5)
+        return collect()
+
+    exporter.registry.collect = slow_collect
+    snapshots = []
+    scrapers = [
+        threading.Thread(target=lambda: snapshots.append(exporter.get_snapshot()))
+        for _ in range(5)
+    ]
+    for scraper in scrapers:
+        scraper.start()
+    release.set()
+    for scraper in scrapers:
+        scraper.join(5)
+
+    assert len(calls) == 1
+    assert len(snapshots) == 5
+    assert len({id(snapshot) for snapshot in snapshots}) == 1
+
+    # Cached until the TTL expires
+    exporter.get_snapshot()
+    assert len(calls) == 1
+    exporter.scrape_cache_ttl = 0
+    exporter._expires_at = 0
+    exporter.get_snapshot()
+    assert len(calls) == 2
+
+
+def test_scrapes_are_instrumented(server, exporter):
+    registry = CollectorRegistry()
+    exporter.instrumentation = ExporterMetrics(registry)
+    _, body = _get(server)
+
+    assert registry.get_sample_value(
+        "celery_exporter_response_bytes_total", {"encoding": "identity"}
+    ) == len(body)
+    assert registry.get_sample_value("celery_exporter_scrape_duration_seconds_count")
+
+
+def test_snapshot_carries_its_own_timestamp():
+    registry = CollectorRegistry()
+    exporter = Exporter(
+        registry, polling_interval=30, instrumentation=ExporterMetrics(registry)
+    )
+
+    for _ in range(2):
+        started = time.time()
+        snapshot = exporter._collect_snapshot()
+        (timestamp,) = [
+            sample.value
+            for metric in snapshot.metrics
+            for sample in metric.samples
+            if sample.name == "celery_exporter_snapshot_timestamp_seconds"
+        ]
+        assert started <= timestamp <= snapshot.created_at
+
+
+def test_serves_queue_history(server, exporter):
+    exporter.history = QueueHistory(retention=10)
+    metric = GaugeMetricFamily(
+        "celery_queue_length", "Queue length", labels=["broker_type", "queue", "vdb"]
+    )
+    metric.add_metric(["redis", "celery", "0"], 3)
+    exporter._record_history(Snapshot([metric], created_at=100.0))
+
+    response, body = _get(server, "/api/history?db=0&queue=celery&since=50")
+    assert response.status == 200
+    assert json.loads(body) == {"db": 0, "queue": "celery", "samples": [[100.0, 3.0]]}
+
+    assert _get(server, "/api/history?db=0&queue=celery&since=100")[1] == (
+        b'{"db": 0, "queue": "celery", "samples": []}'
+    )
+    assert _get(server, "/api/history?db=0&queue=other")[0].status == 404
+    assert _get(server, "/api/history?queue=celery")[0].status == 400
@@ -0,0 +1,55 @@
+from exporter.history import QueueHistory
+from exporter.ringbuffer import RingBuffers
+
+
+def test_ring_buffers_keep_the_latest_samples():
+    rings = RingBuffers(3)
+    slot, created = rings.slot("a")
+    assert created
+    for step in range(5):
+        rings.append(slot, step, step * 10)
+
+    assert [rings.values[p] for p in rings.positions(slot)] == [20, 30, 40]
+    assert rings.values[rings.latest(slot)] == 40
+    assert rings.nbytes == 16 * 3 + 16
+
+
+def test_query_since():
+    history = QueueHistory(retention=4)
+    for step in range(6):
+        history.record({(0, "celery"): step}, now=100.0 + step)
+
+    assert history.query(0, "celery") == [
+        (102.0, 2.0),
+        (103.0, 3.0),
+        (104.0, 4.0),
+        (105.0, 5.0),
+    ]
+    assert history.query(0, "celery", since=103.5) == [(104.0, 4.0), (105.0, 5.0)]
+    assert history.query(1, "celery") is None
+
+
+def test_stalest_queue_is_replaced_when_full():
+    history = QueueHistory(retention=2, max_queues=2)
+    history.record({(0, "a"): 1, (0, "b"): 1}, now=1)
+    history.record({(0, "b"): 2}, now=2)
+
+    history.record({(0, "c"): 3}, now=3)
+
+    assert history.query(0, "a") is None
+    assert history.query(0, "b") == [(1.0, 1.0), (2.0, 2.0)]
+    assert history.memory_ceiling == 2 * (16 * 2 + 16)
+
+
+def test_updated_queues_are_kept_over_stale_ones():
+    history = QueueHistory(retention=2, max_queues=3)
+    history.record({(0, "a"): 1, (0, "b"): 1, (0, "c"): 1}, now=1)
+    history.record({(0, "a"): 2}, now=2)
+
+    history.record({(0, "d"): 1}, now=3)
+    history.record({(0, "e"): 1}, now=4)
+
+    assert history.query(0, "a") == [(1.0, 1.0), (2.0, 2.0)]
+    assert history.query(0, "b") is None
+    assert history.query(0, "c") is None
+    assert len(history._rings) == 3
@@ -0,0 +1,108 @@
+import json
+import threading
+from http.client import HTTPConnection
+
+import fakeredis
+import pytest
+from prometheus_client import CollectorRegistry
+
+from exporter.exporter import Exporter, MetricsHandler, MetricsServer
+from exporter.models import ProbeTarget
+from exporter.probe import TargetPool, load_targets
+
+
+@pytest.fixture
+def targets(redis_server):
+    fakeredis.FakeRedis(server=redis_server, db=0).rpush("celery", "a", "b")
+    fakeredis.FakeRedis(server=redis_server, db=1).rpush("mail", "a")
+    pool = TargetPool(
+        {
+            "orders": ProbeTarget(monitor_queues="0:celery"),
+            "mailer": ProbeTarget(monitor_queues="1:mail"),
+        },
+        max_workers=2,
+        cache_ttl=0,
+    )
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def server(targets):
+    server = MetricsServer(("127.0.0.1", 0), MetricsHandler)
+    server.metrics_server = Exporter(None, polling_interval=30, targets=targets)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _get(server, path):
+    connection = HTTPConnection(*server.server_address, timeout=5)
+    connection.request("GET", path)
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response.status, body
+
+
+def test_load_targets(tmp_path):
+    path = tmp_path / "targets.json"
+    path.write_text(
+        json.dumps({"orders": {"monitor_queues": "0:celery", "broker": {"port": 1}}})
+    )
+
+    targets = load_targets(str(path))
+
+    assert targets["orders"].broker_type == "redis"
+    assert targets["orders"].broker == {"port": 1}
+
+    path.write_text("[]")
+    with pytest.raises(ValueError):
+        load_targets(str(path))
+
+
+def test_probe_serves_each_target(server):
+    status, body = _get(server, "/probe?target=orders")
+    assert status == 200
+    assert b'queue="celery",vdb="0"} 2.0' in body
+    assert b"mail" not in body
+
+    status, body = _get(server, "/probe?target=mailer")
+    assert b'queue="mail",vdb="1"} 1.0' in body
+
+
+def test_probe_rejects_missing_and_unknown_targets(server):
+    assert _get(server, "/probe")[0] == 400
+    assert _get(server, "/probe?target=nope")[0] == 404
+
+
+def test_idle_targets_are_evicted(targets):
+    targets.get_snapshot("orders")
+    targets.get_snapshot("mailer")
+    collector = targets._probes["orders"].collector
+    targets.get_snapshot("orders")
+    assert targets._probes["orders"].collector is collector
+
+    targets._probes["orders"].last_used -= targets.idle_timeout + 1
+    assert targets.evict_idle() == ["orders"]
+    assert targets.active_targets() == ["mailer"]
+
+
+def test_idle_targets_are_evicted_without_probes(targets):
+    targets.get_snapshot("orders")
+    targets._probes["orders"].last_used -= targets.idle_timeout + 1
+    closed = threading.Event()
+    close = targets._probes["orders"].collector.close
+
+    def close_collector():
+        close()
+        closed.set()
+
+    targets._probes["orders"].collector.close = close_collector
+    exporter = Exporter(CollectorRegistry(), polling_interval=30, targets=targets)
+
+    exporter.start_collection_thread()
+
+    assert closed.wait(5)
+    assert targets.active_targets() == []
@@ -0,0 +1,146 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from exporter.brokers import RabbitMQBroker
+from exporter.brokers.rabbitmq import ManagementConnectionPool, RabbitMQError
+from exporter.collector import CQCollector
+
+QUEUES = [
+    {
+        "name": "celery",
+        "messages_ready": 5,
+        "messages_unacknowledged": 2,
+        "consumers": 3,
+    },
+    {
+        "name": "other",
+        "messages_ready": 1,
+        "messages_unacknowledged": 0,
+        "consumers": 0,
+    },
+]
+
+
+class _ManagementHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.path)
+        server.clients.add(self.client_address)
+        if self.headers.get("Authorization") != "Basic Z3Vlc3Q6c2VjcmV0":
+            return self._send(401, {"error": "not_authorised"})
+        url = urlparse(self.path)
+        if url.path == "/api/overview":
+            return self._send(200, {"rabbitmq_version": "3.13.0"})
+        if url.path == "/api/queues/%2F":
+            return self._send(200, QUEUES)
+        return self._send(404, {"error": "Object Not Found"})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if self.server.drop_connections:
+            # Close without telling the client, like an idle timeout
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def management_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ManagementHandler)
+    server.requests = []
+    server.clients = set()
+    server.drop_connections = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def broker_config(management_server):
+    host, port = management_server.server_address
+    return {"host": host, "port": port, "password": "secret"}
+
+
+def test_get_queue_details_in_one_request(management_server, broker_config):
+    broker = RabbitMQBroker(**broker_config)
+    broker.connect()
+    management_server.requests.clear()
+
+    queues = broker.get_queue_details(["celery", "missing"])
+
+    assert [(q.name, q.length, q.unacked, q.consumers) for q in queues] == [
+        ("celery", 5, 2, 3),
+        ("missing", 0, 0, 0),
+    ]
+    assert len(management_server.requests) == 1
+    query = parse_qs(urlparse(management_server.requests[0]).query)
+    assert query["columns"] == ["name,messages_ready,messages_unacknowledged,consumers"]
+    assert query["disable_stats"] == ["true"]
+
+
+def test_requests_reuse_a_keep_alive_connection(management_server, broker_config):
+    broker = RabbitMQBroker(**broker_config)
+    broker.connect()
+    for _ in range(3):
+        broker.get_queue_lengths(["celery"])
+
+    assert len(management_server.clients) == 1
+    assert broker.connection_counts() == {"in_use": 0, "idle": 1}
+
+
+def test_retries_on_a_connection_closed_by_the_server(management_server, broker_config):
+    management_server.drop_connections = True
+    broker = RabbitMQBroker(**broker_config)
+    broker.connect()
+
+    assert broker.get_queue_lengths(["celery"]) == {"celery": 5}
+    assert len(management_server.clients) == 2
+
+
+def test_error_status_raises(management_server, broker_config):
+    broker_config["password"] = "wrong"
+    broker = RabbitMQBroker(**broker_config)
+
+    with pytest.raises(RabbitMQError):
+        broker.connect()
+    assert not broker.ping()
+
+
+def test_collect_rabbitmq_queues(management_server, broker_config):
+    broker_config["shared_pool"] = True
+    collector = CQCollector("rabbitmq", broker_config, "0:celery,other")
+
+    metrics = {metric.name: metric for metric in collector.collect()}
+
+    assert {
+        sample.labels["queue"]: sample.value
+        for sample in metrics["celery_queue_consumers"].samples
+    } == {"celery": 3, "other": 0}
+    assert metrics["celery_queue_unacked_messages"].samples[0].value == 2
+    assert isinstance(collector._brokers[0]._pool, ManagementConnectionPool)
+
+
+def test_dbs_of_a_cycle_share_one_listing(management_server, broker_config):
+    collector = CQCollector("rabbitmq", broker_config, "0:celery;1:other")
+    management_server.requests.clear()
+
+    metrics = {metric.name: metric for metric in collector.collect()}
+
+    assert {
+        sample.labels["queue"]: sample.value
+        for sample in metrics["celery_queue_length"].samples
+    } == {"celery": 5, "other": 1}
+    assert len(management_server.requests) == 1
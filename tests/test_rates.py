@@ -0,0 +1,63 @@
+import math
+
+import pytest
+
+from exporter.rates import RateEstimator
+
+
+def test_draining_queue():
+    estimator = RateEstimator(window=5, smoothing=0.5)
+    for step in range(8):
+        estimator.observe(0, {"celery": 100 - 2 * step}, now=10.0 * step)
+
+    rate, drain_rate, time_to_empty = estimator.estimates()[0, "celery"]
+
+    assert rate == pytest.approx(-0.2)
+    assert drain_rate == pytest.approx(0.2)
+    assert time_to_empty == pytest.approx(86 / 0.2)
+
+
+def test_time_to_empty_follows_the_net_rate():
+    # Enqueues offset part of the consumption: the queue shrinks slower
+    # than it is drained
+    estimator = RateEstimator(window=4, smoothing=1.0)
+    for step, length in enumerate([100, 90, 95, 85]):
+        estimator.observe(0, {"celery": length}, now=step)
+
+    rate, drain_rate, time_to_empty = estimator.estimates()[0, "celery"]
+
+    assert rate == pytest.approx(-4.0)
+    assert drain_rate == pytest.approx(10.0)
+    assert time_to_empty == pytest.approx(85 / 4.0)
+
+
+def test_growing_and_empty_queues():
+    estimator = RateEstimator(window=3)
+    for step in range(3):
+        estimator.observe(0, {"growing": step, "empty": 0}, now=step)
+
+    estimates = estimator.estimates()
+
+    assert estimates[0, "growing"] == (pytest.approx(1.0), 0.0, math.inf)
+    assert estimates[0, "empty"] == (0.0, 0.0, 0.0)
+
+
+def test_single_sample_has_no_estimate():
+    estimator = RateEstimator()
+    estimator.observe(0, {"celery": 5}, now=0)
+    estimator.observe(0, {"celery": 6}, now=0)
+
+    assert estimator.estimates() == {}
+
+
+def test_forgotten_queues_free_their_slot():
+    estimator = RateEstimator(window=4)
+    estimator.observe(0, {"a": 1, "b": 2}, now=0)
+    estimator.observe(1, {"a": 1}, now=0)
+    size = len(estimator._rings.times)
+
+    estimator.forget(0, ["b"])
+    estimator.observe(0, {"c": 3}, now=1)
+
+    assert len(estimator._rings.times) == size
+    assert set(estimator._rings.slots) == {(0, "b"), (0, "c"), (1, "a")}
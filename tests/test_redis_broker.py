@@ -0,0 +1,116 @@
+import fakeredis
+import pytest
+
+from exporter.brokers import RedisBroker
+
+
+@pytest.fixture
+def broker(redis_server):
+    broker = RedisBroker(db=0, pipeline_chunk_size=2)
+    broker.connect()
+    yield broker
+    broker.disconnect()
+
+
+def test_get_queue_lengths(redis_server, broker):
+    client = fakeredis.FakeRedis(server=redis_server)
+    client.rpush("celery", "a", "b", "c")
+    client.rpush("mail", "a")
+
+    assert broker.get_queue_lengths(["celery", "mail", "missing"]) == {
+        "celery": 3,
+        "mail": 1,
+        "missing": 0,
+    }
+
+
+def test_get_queue_lengths_empty(broker):
+    assert broker.get_queue_lengths([]) == {}
+
+
+def test_get_queue_lengths_not_connected():
+    with pytest.raises(RuntimeError):
+        RedisBroker().get_queue_lengths(["celery"])
+
+
+def test_shared_pool_across_dbs(redis_server):
+    fakeredis.FakeRedis(server=redis_server, db=0).rpush("celery", "a")
+    fakeredis.FakeRedis(server=redis_server, db=3).rpush("celery", "a", "b")
+
+    pool = RedisBroker.create_shared_pool(
+        max_connections=2,
+        connection_class=fakeredis.FakeRedisConnection,
+        server=redis_server,
+    )
+    brokers = [RedisBroker(db=db, connection_pool=pool) for db in (0, 3, 3)]
+    for broker in brokers:
+        broker.connect()
+
+    assert [b.get_queue_lengths(["celery"]) for b in brokers] == [
+        {"celery": 1},
+        {"celery": 2},
+        {"celery": 2},
+    ]
+    assert brokers[1].get_queue_length("celery") == 2
+    # Connections are switched back to db 0 after every batch
+    assert brokers[0].get_queue_length("celery") == 1
+    assert len(pool._connections) == 1
+
+
+def test_get_priority_queue_lengths(redis_server, broker):
+    client = fakeredis.FakeRedis(server=redis_server)
+    client.rpush("celery", "a")
+    client.rpush("celery\x06\x163", "a", "b")
+    client.rpush("celery\x06\x169", "a", "b", "c")
+
+    assert broker.get_priority_queue_lengths(
+        ["celery", "mail"], [0, 3, 6, 9], "\x06\x16"
+    ) == {
+        "celery": {0: 1, 3: 2, 6: 0, 9: 3},
+        "mail": {0: 0, 3: 0, 6: 0, 9: 0},
+    }
+
+
+def test_get_unacked(redis_server, broker):
+    client = fakeredis.FakeRedis(server=redis_server)
+    reserved = {"a": 1000.0, "b": 1900.0, "c": 1990.0}
+    client.hset("unacked", mapping={tag: "{}" for tag in reserved})
+    client.zadd("unacked_index", reserved)
+
+    unacked = broker.get_unacked([60, 300], visibility_timeout=600, now=2000.0)
+
+    assert unacked.count == 3
+    assert unacked.buckets == {60.0: 1, 300.0: 2, float("inf"): 3}
+    assert unacked.expired == 1
+
+
+def test_get_db_stats_with_script_matches_pipeline(redis_server):
+    client = fakeredis.FakeRedis(server=redis_server)
+    client.rpush("celery", "a")
+    client.rpush("celery\x06\x163", "a", "b")
+    client.hset("unacked", "a", "{}")
+    client.zadd("unacked_index", {"a": 0.0})
+
+    stats = {}
+    for use_scripts in (False, True):
+        broker = RedisBroker(db=0, use_scripts=use_scripts, pipeline_chunk_size=1)
+        broker.connect()
+        stats[use_scripts] = broker.get_db_stats(
+            ["celery", "mail"], [0, 3], "\x06\x16", age_buckets=[60.0]
+        )
+
+    assert stats[True] == stats[False]
+    assert stats[True][0] == {"celery": {0: 1, 3: 2}, "mail": {0: 0, 3: 0}}
+    assert stats[True][1].expired == 1
+
+
+def test_get_db_stats_reloads_flushed_script(redis_server):
+    fakeredis.FakeRedis(server=redis_server).rpush("celery", "a")
+    broker = RedisBroker(db=0, use_scripts=True)
+    broker.connect()
+    broker.get_db_stats(["celery"], [], "\x06\x16")
+
+    # As after a failover to a master that never loaded the script
+    broker._client.script_flush()
+
+    assert broker.get_db_stats(["celery"], [], "\x06\x16") == ({"celery": {0: 1}}, None)
@@ -0,0 +1,205 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from redis.crc import key_slot
+from redis.exceptions import AskError, ConnectionError, MovedError
+
+from exporter.brokers import RedisClusterBroker
+from exporter.brokers.redis_cluster import group_by_node
+
+
+class _Pipeline:
+    def __init__(self, node):
+        self._node = node
+        self._commands = []
+
+    def execute_command(self, *command):
+        self._commands.append(command)
+
+    def execute(self, raise_on_error=True):
+        if self._node.dead:
+            raise ConnectionError(f"Error connecting to {self._node.name}")
+        return [self._node.reply(command) for command in self._commands]
+
+
+class _Node:
+    def __init__(self, name, lengths, redirects=None, members=None):
+        self.name = name
+        self.redis_connection = self
+        self.lengths = lengths
+        self.redirects = redirects or {}
+        self.members = members or {}
+        self.asked = 0
+        self.dead = False
+
+    def scan(self, cursor=0, match=None, count=None, _type=None):
+        # One key per step, the cursor being the index of the next key
+        keys = sorted(self.lengths)
+        if not keys:
+            return 0, []
+        return (cursor + 1) % len(keys), [keys[cursor].encode()]
+
+    def pipeline(self, transaction=False):
+        return _Pipeline(self)
+
+    def reply(self, command):
+        if command == ("ASKING",):
+            self.asked += 1
+            return b"OK"
+        key = command[1]
+        if key in self.redirects:
+            return self.redirects[key]
+        if command[0] == "SMEMBERS":
+            return self.members.get(key, set())
+        return self.lengths.get(key, 0)
+
+
+class _NodesManager:
+    def __init__(self, nodes, owners, refreshed_owners):
+        self.nodes = nodes
+        self.owners = owners
+        self.refreshed_owners = refreshed_owners
+
+    def get_node_from_slot(self, slot):
+        return self.nodes[self.owners.get(slot, "a:1")]
+
+    def get_node(self, node_name=None):
+        return self.nodes.get(node_name)
+
+    def initialize(self):
+        self.owners = self.refreshed_owners
+
+
+class _Client:
+    def __init__(self, nodes_manager):
+        self.nodes_manager = nodes_manager
+
+    def get_primaries(self):
+        return list(self.nodes_manager.nodes.values())
+
+
+def _broker(nodes, owners=None, refreshed_owners=None):
+    broker = RedisClusterBroker()
+    broker._client = _Client(_NodesManager(nodes, owners or {}, refreshed_owners))
+    broker._executor = ThreadPoolExecutor(max_workers=2)
+    return broker
+
+
+def test_cluster_broker_requires_db_0():
+    with pytest.raises(ValueError):
+        RedisClusterBroker(db=1)
+
+
+def test_group_by_node():
+    commands = [("LLEN", "a"), ("LLEN", "b"), ("LLEN", "a")]
+    owner = {key_slot(b"a"): "n1", key_slot(b"b"): "n2"}
+
+    assert group_by_node(commands, owner.__getitem__) == {"n1": [0, 2], "n2": [1]}
+
+
+def test_moved_refreshes_slot_map():
+    slot = key_slot(b"moved")
+    nodes = {
+        "a:1": _Node("a:1", {"celery": 1}, {"moved": MovedError(f"{slot} b:2")}),
+        "b:2": _Node("b:2", {"moved": 5}),
+    }
+    broker = _broker(nodes, refreshed_owners={slot: "b:2"})
+
+    assert broker.get_queue_lengths(["celery", "moved"]) == {"celery": 1, "moved": 5}
+
+
+def test_ask_is_followed_without_refresh():
+    slot = key_slot(b"migrating")
+    nodes = {
+        "a:1": _Node("a:1", {}, {"migrating": AskError(f"{slot} b:2")}),
+        "b:2": _Node("b:2", {"migrating": 3}),
+    }
+    broker = _broker(nodes)
+
+    assert broker.get_queue_lengths(["migrating"]) == {"migrating": 3}
+    assert nodes["b:2"].asked == 1
+    assert broker._client.nodes_manager.owners == {}
+
+
+def test_unreachable_node_refreshes_slot_map():
+    slot = key_slot(b"failed-over")
+    nodes = {
+        "a:1": _Node("a:1", {"failed-over": 1}),
+        "b:2": _Node("b:2", {"failed-over": 4}),
+    }
+    nodes["a:1"].dead = True
+    broker = _broker(nodes, refreshed_owners={slot: "b:2"})
+
+    assert broker.get_queue_lengths(["failed-over"]) == {"failed-over": 4}
+    assert broker._client.nodes_manager.owners == {slot: "b:2"}
+
+
+def test_node_still_unreachable_after_refresh_fails():
+    nodes = {"a:1": _Node("a:1", {"celery": 1})}
+    nodes["a:1"].dead = True
+    broker = _broker(nodes, refreshed_owners={})
+
+    with pytest.raises(ConnectionError):
+        broker.get_queue_lengths(["celery"])
+
+
+def test_scan_keys_walks_every_primary():
+    nodes = {
+        "b:1": _Node("b:1", {"celery": 1, "default": 2}),
+        "a:1": _Node("a:1", {"emails": 3}),
+        "c:1": _Node("c:1", {}),
+    }
+    broker = _broker(nodes)
+
+    cursor, keys = broker.scan_keys()
+    found = list(keys)
+    steps = 1
+    while cursor:
+        cursor, keys = broker.scan_keys(cursor, match="*", key_type="list")
+        found.extend(keys)
+        steps += 1
+
+    assert found == ["emails", "celery", "default"]
+    assert steps == 4
+
+
+def test_get_kombu_binding_queues_reads_the_owning_nodes():
+    nodes = {
+        "a:1": _Node(
+            "a:1",
+            {},
+            members={"_kombu.binding.celery": {b"celery\x06\x16\x06\x16celery"}},
+        ),
+        "b:1": _Node(
+            "b:1",
+            {},
+            members={"_kombu.binding.emails": {b"emails\x06\x16\x06\x16emails"}},
+        ),
+    }
+    owners = {key_slot(b"_kombu.binding.emails"): "b:1"}
+    broker = _broker(nodes, owners)
+
+    queues = broker.get_kombu_binding_queues(
+        ["_kombu.binding.celery", "_kombu.binding.emails"]
+    )
+
+    assert queues == {"celery", "emails"}
+    assert broker.get_kombu_binding_queues([]) == set()
+
+
+def test_scan_keys_restarts_when_primaries_change():
+    nodes = {
+        "a:1": _Node("a:1", {"celery": 1, "emails": 2}),
+        "b:1": _Node("b:1", {"default": 3}),
+    }
+    broker = _broker(nodes)
+    cursor, keys = broker.scan_keys()
+    assert keys == ["celery"]
+
+    # a:1 failed over to c:1, the cursor of a:1 must not reach c:1
+    nodes["c:1"] = _Node("c:1", {"reports": 4, "zebra": 5})
+    del nodes["a:1"]
+    cursor, keys = broker.scan_keys(cursor)
+
+    assert keys == ["default"]
+    assert cursor
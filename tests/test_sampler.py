@@ -0,0 +1,213 @@
+import fakeredis
+import pytest
+
+from exporter.brokers import RedisBroker
+from exporter.sampler import AgeSampler, TaskSampler, parse_timestamp
+
+
+@pytest.fixture
+def client(redis_server):
+    return fakeredis.FakeRedis(server=redis_server)
+
+
+@pytest.fixture
+def broker(redis_server):
+    broker = RedisBroker(db=0)
+    broker.connect()
+    return broker
+
+
+def _counts(breakdown):
+    return {
+        queue: {task.name: task.count for task in tasks}
+        for queue, tasks in breakdown.items()
+    }
+
+
+def test_sample_scales_to_queue_length(client, broker, make_message):
+    # Oldest messages, at the consumer end, are all "add"
+    client.lpush("celery", *[make_message("add") for _ in range(10)])
+    client.lpush("celery", *[make_message("mul") for _ in range(30)])
+
+    sampler = TaskSampler(sample_size=10)
+    breakdown = sampler.sample(0, broker, {"celery": 40, "empty": 0})
+
+    assert _counts(breakdown) == {"celery": {"add": 40}, "empty": {}}
+
+
+def _count_bytes_read(broker, monkeypatch):
+    """Count the bytes of the messages the broker reads."""
+    read = []
+    get_queue_samples, get_queue_messages = (
+        broker.get_queue_samples,
+        broker.get_queue_messages,
+    )
+
+    def samples(windows):
+        result = get_queue_samples(windows)
+        read.extend(len(raw) for messages in result.values() for raw in messages)
+        return result
+
+    def messages(positions):
+        result = get_queue_messages(positions)
+        read.extend(len(raw) for raws in result.values() for raw in raws if raw)
+        return result
+
+    monkeypatch.setattr(broker, "get_queue_samples", samples)
+    monkeypatch.setattr(broker, "get_queue_messages", messages)
+    return read
+
+
+def test_sample_respects_byte_budget(client, broker, make_message, monkeypatch):
+    message = make_message("add", body_size=1000)
+    for queue in ("a", "b", "c"):
+        client.lpush(queue, *[message] * 5)
+    read = _count_bytes_read(broker, monkeypatch)
+
+    sampler = TaskSampler(sample_size=5, byte_budget=len(message) * 6)
+    for _ in range(3):
+        read.clear()
+        sampler.sample(0, broker, {"a": 5, "b": 5, "c": 5})
+        assert 0 < sum(read) <= len(message) * 6
+
+
+def test_unknown_message_size_is_read_before_sampling(
+    client, broker, make_message, monkeypatch
+):
+    # Far larger than the budget assumes of a typical message
+    message = make_message("add", body_size=100_000)
+    client.lpush("celery", *[message] * 100)
+    read = _count_bytes_read(broker, monkeypatch)
+
+    sampler = TaskSampler(sample_size=100, byte_budget=len(message) * 3)
+    breakdown = sampler.sample(0, broker, {"celery": 100})
+
+    # The next message, then a window of what the budget has left
+    assert sum(read) <= len(message) * 3
+    assert _counts(breakdown) == {"celery": {"add": 100}}
+
+
+def test_first_cycle_reads_new_queues_within_budget(
+    client, broker, make_message, monkeypatch
+):
+    message = make_message("add", body_size=10_000)
+    queues = [f"queue{index}" for index in range(200)]
+    for queue in queues:
+        client.lpush(queue, message)
+    read = _count_bytes_read(broker, monkeypatch)
+
+    sampler = TaskSampler(byte_budget=20_000)
+    breakdown = sampler.sample(0, broker, {queue: 1 for queue in queues})
+
+    assert 0 < sum(read) <= 20_000
+    learned = set(sampler._message_sizes[0])
+    assert learned and len(learned) < len(queues)
+
+    # The queues left over are learned in later cycles
+    for _ in range(len(queues)):
+        read.clear()
+        breakdown = sampler.sample(0, broker, {queue: 1 for queue in queues})
+        assert sum(read) <= 20_000
+    assert all(breakdown[queue] for queue in queues)
+
+
+def test_sample_spans_priority_lists(client, broker, make_message):
+    # Step 0 is consumed first, then step 3
+    client.lpush("celery", *[make_message("add") for _ in range(2)])
+    client.lpush("celery\x06\x163", *[make_message("mul") for _ in range(6)])
+
+    sampler = TaskSampler(sample_size=4)
+    breakdown = sampler.sample(
+        0, broker, {"celery": 8}, priorities={"celery": {0: 2, 3: 6}}
+    )
+
+    assert _counts(breakdown) == {"celery": {"add": 4, "mul": 4}}
+
+
+def test_skipped_queues_reuse_last_breakdown(client, broker, make_message):
+    client.lpush("celery", *[make_message("add") for _ in range(4)])
+    sampler = TaskSampler(sample_size=4)
+    sampler.sample(0, broker, {"celery": 4})
+
+    # No budget left: the previous ratios are scaled to the new length
+    sampler._byte_budget = 0
+    breakdown = sampler.sample(0, broker, {"celery": 8})
+
+    assert _counts(breakdown) == {"celery": {"add": 8}}
+
+
+def test_vanished_queues_are_pruned(client, broker, make_message):
+    client.lpush("celery", make_message("add"))
+    sampler = TaskSampler()
+    sampler.sample(0, broker, {"celery": 1})
+    sampler.prune(0, ["mail"])
+
+    assert sampler._ratios[0] == {}
+    assert sampler._message_sizes[0] == {}
+
+
+def test_age_positions_start_at_oldest():
+    sampler = AgeSampler(sample_size=3)
+
+    assert sampler.positions(0) == []
+    assert sampler.positions(1) == [-1]
+    assert sampler.positions(101) == [-1, -51, -101]
+
+
+def test_parse_timestamp():
+    assert parse_timestamp(1700000000) == 1700000000.0
+    assert parse_timestamp("1700000000.5") == 1700000000.5
+    assert parse_timestamp("2023-11-14T22:13:20Z") == 1700000000.0
+    assert parse_timestamp("2023-11-14T22:13:20") == 1700000000.0
+    assert parse_timestamp("yesterday") is None
+    assert parse_timestamp(None) is None
+
+
+def test_age_from_timestamp_header(client, broker, make_message):
+    # Oldest message is pushed first and sits at the consumer end
+    for enqueued_at in (100.0, 150.0, 190.0):
+        client.lpush("celery", make_message("add", enqueued_at=enqueued_at))
+
+    sampler = AgeSampler(sample_size=3, timestamp_header="enqueued_at")
+    ages = sampler.sample(0, broker, {"celery": 3, "empty": 0}, now=200.0)
+
+    oldest, quantiles = ages["celery"]
+    assert oldest == 100.0
+    assert quantiles[0.5] == 50.0
+    assert ages["empty"] == (None, {})
+
+
+def test_age_falls_back_to_first_seen(client, broker, make_message):
+    client.lpush("celery", make_message("add"), make_message("add"))
+
+    sampler = AgeSampler(sample_size=2)
+    assert sampler.sample(0, broker, {"celery": 2}, now=100.0)["celery"][0] == 0.0
+
+    client.lpush("celery", make_message("add"))
+    oldest, quantiles = sampler.sample(0, broker, {"celery": 3}, now=130.0)["celery"]
+
+    assert oldest == 30.0
+    assert quantiles[0.5] in (0.0, 30.0)
+
+
+def test_age_reads_the_oldest_message_of_every_priority_list(
+    client, broker, make_message
+):
+    client.lpush("celery", make_message("add", enqueued_at=190.0))
+    client.lpush(
+        "celery\x06\x169",
+        make_message("add", enqueued_at=100.0),
+        make_message("add", enqueued_at=180.0),
+    )
+
+    sampler = AgeSampler(sample_size=1, timestamp_header="enqueued_at")
+    ages = sampler.sample(
+        0,
+        broker,
+        {"celery": 3},
+        now=200.0,
+        priorities={"celery": {0: 1, 9: 2}},
+    )
+
+    # The oldest message waits in the lowest priority list
+    assert ages["celery"][0] == 100.0
@@ -0,0 +1,57 @@
+from exporter.scheduler import AdaptiveScheduler
+
+
+def test_new_queues_are_due_immediately():
+    scheduler = AdaptiveScheduler(min_interval=5, max_interval=60)
+
+    assert scheduler.due(0, ["celery", "mail"], now=0) == ["celery", "mail"]
+    assert scheduler.due(0, ["celery", "mail"], now=1) == []
+
+
+def test_intervals_follow_activity():
+    scheduler = AdaptiveScheduler(min_interval=5, max_interval=40, backoff=2)
+    now = 0.0
+    for length in (0, 0, 0, 0, 0):
+        scheduler.due(0, ["idle"], now=now)
+        scheduler.update(0, {"idle": length}, now=now)
+        now += 100
+    assert scheduler.interval(0, "idle") == 40
+
+    for length in (1, 2, 3, 4):
+        scheduler.due(0, ["idle"], now=now)
+        scheduler.update(0, {"idle": length}, now=now)
+        now += 100
+    assert scheduler.interval(0, "idle") == 5
+
+
+def test_queues_are_polled_in_due_order():
+    scheduler = AdaptiveScheduler(min_interval=4, max_interval=64)
+    scheduler.due(0, ["hot", "idle"], now=0)
+    scheduler.update(0, {"hot": 1, "idle": 0}, now=0)
+    scheduler.due(0, ["hot", "idle"], now=4)
+    scheduler.update(0, {"hot": 5, "idle": 0}, now=4)
+
+    # hot stays at 4s while idle backs off to 8s
+    assert scheduler.due(0, ["hot", "idle"], now=8) == ["hot"]
+    assert scheduler.time_until_due(now=8) == 4
+    assert scheduler.due(0, ["hot", "idle"], now=12) == ["hot", "idle"]
+
+
+def test_replaced_due_times_do_not_wake_up_early():
+    scheduler = AdaptiveScheduler(min_interval=5, max_interval=60, backoff=2)
+    scheduler.due(0, ["idle"], now=0)
+    scheduler.update(0, {"idle": 0}, now=0)
+    scheduler.due(0, ["idle"], now=5)
+    scheduler.update(0, {"idle": 0}, now=5)
+
+    # The provisional entry due() pushed at 10s was replaced by 15s
+    assert scheduler.time_until_due(now=5) == 10
+    assert len(scheduler._dbs[0].heap) == 1
+
+
+def test_removed_queues_are_dropped():
+    scheduler = AdaptiveScheduler(min_interval=5)
+    scheduler.due(0, ["celery", "mail"], now=0)
+
+    assert scheduler.due(0, ["celery"], now=100) == ["celery"]
+    assert scheduler.interval(0, "mail") is None
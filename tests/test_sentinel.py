@@ -0,0 +1,200 @@
+import threading
+
+import pytest
+import redis
+from redis.sentinel import SentinelConnectionPool
+
+from exporter.brokers import RedisBroker
+from exporter.brokers.sentinel import BlockingSentinelConnectionPool, SharedSentinel
+
+
+def _switch(name, host, port):
+    return {
+        "type": "message",
+        "channel": b"+switch-master",
+        "data": f"{name} 10.0.0.1 6379 {host} {port}".encode(),
+    }
+
+
+def test_for_config_shares_one_client():
+    first = SharedSentinel.for_config("sentinel-a:26379", socket_timeout=1.0)
+    second = SharedSentinel.for_config("sentinel-a:26379", socket_timeout=1.0)
+    other = SharedSentinel.for_config("sentinel-b:26379", socket_timeout=1.0)
+
+    assert first is second
+    assert first is not other
+
+
+def test_discover_master_is_cached(monkeypatch):
+    shared = SharedSentinel("sentinel:26379")
+    calls = []
+
+    def discover_master(name):
+        calls.append(name)
+        return ("10.0.0.1", 6379)
+
+    monkeypatch.setattr(shared.sentinel, "discover_master", discover_master)
+
+    assert shared.discover_master("mymaster") == ("10.0.0.1", 6379)
+    assert shared.discover_master("mymaster") == ("10.0.0.1", 6379)
+    assert calls == ["mymaster"]
+
+    shared.invalidate("mymaster")
+    shared.discover_master("mymaster")
+    assert calls == ["mymaster", "mymaster"]
+
+
+def test_switch_master_repoints_pools(monkeypatch):
+    shared = SharedSentinel("sentinel:26379")
+    monkeypatch.setattr(shared, "watch", lambda: None)
+    monkeypatch.setattr(
+        shared.sentinel, "discover_master", lambda name: ("10.0.0.1", 6379)
+    )
+    pool = shared.connection_pool("mymaster", db=3)
+    assert isinstance(pool, SentinelConnectionPool)
+    assert pool.get_master_address() == ("10.0.0.1", 6379)
+
+    shared.handle_message(_switch("mymaster", "10.0.0.2", 6380))
+
+    assert shared.discover_master("mymaster") == ("10.0.0.2", 6380)
+    assert pool.master_address == ("10.0.0.2", 6380)
+
+
+def test_switch_master_ignores_unknown_and_malformed():
+    shared = SharedSentinel("sentinel:26379")
+
+    shared.handle_message(_switch("other", "10.0.0.2", 6380))
+    shared.handle_message({"type": "message", "data": b"garbage"})
+    shared.handle_message({"type": "message", "data": b"a b c d not-a-port"})
+
+    assert shared._masters == {}
+
+
+def test_redis_brokers_share_the_sentinel(monkeypatch):
+    monkeypatch.setattr(SharedSentinel, "watch", lambda self: None)
+    config = dict(
+        host="localhost",
+        port=6379,
+        use_sentinel=True,
+        sentinel_hosts="sentinel-shared:26379",
+        sentinel_master_name="mymaster",
+    )
+    first = RedisBroker(db=0, **config)
+    second = RedisBroker(db=1, **config)
+
+    assert first._get_sentinel() is second._get_sentinel()
+
+
+class _Connection:
+    def __init__(self):
+        self.disconnected = False
+
+    def disconnect(self):
+        self.disconnected = True
+
+
+def test_shared_sentinel_pool_blocks_when_exhausted(monkeypatch):
+    monkeypatch.setattr(SharedSentinel, "watch", lambda self: None)
+    pool = RedisBroker.create_shared_pool(
+        max_connections=1,
+        socket_timeout=0.1,
+        use_sentinel=True,
+        sentinel_hosts="sentinel-blocking:26379",
+        sentinel_master_name="mymaster",
+    )
+    assert isinstance(pool, BlockingSentinelConnectionPool)
+    assert isinstance(pool, redis.BlockingConnectionPool)
+    assert pool.timeout == 0.1
+
+    # The only slot is taken, the next caller waits then gives up
+    pool.pool.get_nowait()
+    with pytest.raises(redis.ConnectionError, match="No connection available"):
+        pool.get_connection()
+
+
+def test_blocking_sentinel_pool_disconnects_idle_connections_only():
+    pool = BlockingSentinelConnectionPool(
+        "mymaster", SharedSentinel("sentinel:26379"), max_connections=2
+    )
+    idle, busy = _Connection(), _Connection()
+    pool._connections.extend([idle, busy])
+    pool.pool.get_nowait()
+    pool.pool.put_nowait(idle)
+
+    pool.disconnect(inuse_connections=False)
+    assert idle.disconnected
+    assert not busy.disconnected
+
+    pool.disconnect()
+    assert busy.disconnected
+
+
+class _PubSub:
+    def __init__(self, messages, stop):
+        self.messages = list(messages)
+        self.stop = stop
+        self.timeouts = []
+        self.closed = False
+
+    def subscribe(self, channel):
+        self.channel = channel
+
+    def get_message(self, timeout=0.0):
+        # A quiet channel returns None instead of raising a socket timeout
+        self.timeouts.append(timeout)
+        if not self.messages:
+            self.stop.set()
+            return None
+        return self.messages.pop(0)
+
+    def close(self):
+        self.closed = True
+
+
+def test_watcher_polls_quiet_channel_until_stopped(monkeypatch):
+    shared = SharedSentinel("sentinel:26379")
+    monkeypatch.setattr(
+        shared.sentinel, "discover_master", lambda name: ("10.0.0.1", 6379)
+    )
+    shared.discover_master("mymaster")
+    stop = threading.Event()
+    pubsub = _PubSub([None, _switch("mymaster", "10.0.0.2", 6380), None], stop)
+    monkeypatch.setattr(shared.sentinel.sentinels[0], "pubsub", lambda **kwargs: pubsub)
+
+    shared._watch_forever(stop)
+
+    assert shared.discover_master("mymaster") == ("10.0.0.2", 6380)
+    assert pubsub.channel == "+switch-master"
+    assert all(timeout > 0 for timeout in pubsub.timeouts)
+    assert pubsub.closed
+
+
+def test_releasing_the_last_pool_closes_the_shared_client(monkeypatch):
+    monkeypatch.setattr(SharedSentinel, "watch", lambda self: None)
+    shared = SharedSentinel.for_config("sentinel-release:26379")
+    first = shared.connection_pool("mymaster", db=0)
+    second = shared.connection_pool("mymaster", db=1)
+
+    shared.release(first)
+    assert SharedSentinel.for_config("sentinel-release:26379") is shared
+
+    shared.release(second)
+    assert SharedSentinel.for_config("sentinel-release:26379") is not shared
+    assert shared._stop.is_set()
+
+
+def test_broker_disconnect_releases_its_sentinel_pool(monkeypatch):
+    monkeypatch.setattr(SharedSentinel, "watch", lambda self: None)
+    broker = RedisBroker(
+        db=2,
+        use_sentinel=True,
+        sentinel_hosts="sentinel-broker:26379",
+        sentinel_master_name="mymaster",
+    )
+    shared = broker._get_sentinel()
+    broker._client = broker._get_sentinel_connection()
+
+    broker.disconnect()
+
+    assert not shared._pools
+    assert SharedSentinel.for_config("sentinel-broker:26379") is not shared
@@ -0,0 +1,35 @@
+import pytest
+
+from exporter.sharding import Shard, jump_hash, shard_of
+
+
+def test_jump_hash_moves_keys_only_to_new_buckets():
+    keys = range(0, 10_000 * 7919, 7919)
+    before = [jump_hash(key, 4) for key in keys]
+    after = [jump_hash(key, 5) for key in keys]
+
+    assert set(before) == {0, 1, 2, 3}
+    moved = [new for old, new in zip(before, after) if old != new]
+    assert set(moved) == {4}
+    assert 0.15 < len(moved) / len(before) < 0.25
+
+
+def test_shards_partition_queues():
+    pairs = [(db, f"queue-{index}") for db in range(3) for index in range(300)]
+    shards = [Shard(index, 3) for index in range(3)]
+
+    owners = [[shard.owns(db, queue) for shard in shards] for db, queue in pairs]
+
+    assert all(sum(owned) == 1 for owned in owners)
+    assert all(sum(owned[i] for owned in owners) > 200 for i in range(3))
+    assert sum(shard.owns_db(0) for shard in shards) == 1
+
+
+def test_shard_is_stable():
+    assert shard_of(0, "celery", 8) == shard_of(0, "celery", 8)
+    assert Shard(0, 1).owns(5, "anything")
+
+
+def test_invalid_shard():
+    with pytest.raises(ValueError):
+        Shard(3, 3)
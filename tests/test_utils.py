@@ -1,4 +1,10 @@
-from exporter.utils import parse_monitor_queues
+from exporter.utils import (
+    parse_buckets,
+    parse_discovery_patterns,
+    parse_monitor_queues,
+    parse_priority_steps,
+    parse_separator,
+)
 
 
 def test_parse_monitor_queues_valid_string():
@@ -69,3 +75,28 @@ def test_parse_monitor_queues_no_queue():
     config = "0:"
     expected = {}
     assert parse_monitor_queues(config) == expected
+
+
+def test_parse_priority_steps():
+    assert parse_priority_steps("9,0, 3,6,3") == [0, 3, 6, 9]
+
+
+def test_parse_priority_steps_empty_and_malformed():
+    assert parse_priority_steps("") == []
+    assert parse_priority_steps("0,x,5") == [0, 5]
+
+
+def test_parse_separator():
+    assert parse_separator("\\x06\\x16") == "\x06\x16"
+    assert parse_separator(":") == ":"
+
+
+def test_parse_buckets():
+    assert parse_buckets("300, 60,x,-1,60,inf") == [60.0, 300.0]
+    assert parse_buckets("") == []
+
+
+def test_parse_discovery_patterns_keeps_commas_and_colons():
+    config = "0:celery*;1:re:^a{1,3};0:mail*; 2 : re:^x:y ;bad;3:"
+    expected = {0: ["celery*", "mail*"], 1: ["re:^a{1,3}"], 2: ["re:^x:y"]}
+    assert parse_discovery_patterns(config) == expected